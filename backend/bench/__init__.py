@@ -0,0 +1,7 @@
+"""
+性能基准脚本：在 backend 目录下以模块方式运行，例如
+
+    python -m bench.bench_topomap
+
+各脚本使用合成数据，分别计时原先的实现与现在的实现并打印结果，不依赖数据库、Redis 及模型权重
+"""
@@ -0,0 +1,63 @@
+"""
+AD 输入准备：加载并滤波整段记录再逐秒拼接 与 AD.prepare（只截取分析窗口及滤波余量）
+4 小时、19 通道、1000 Hz 的合成记录，输出耗时、内存峰值及两者模型输入的最大差异
+
+    python -m bench.bench_ad_prepare
+"""
+from os import path
+from tempfile import TemporaryDirectory
+
+from bench.bench_util import make_edf, peak_memory, report
+from numpy import abs as np_abs, array
+
+from config.env import EAVizConfig, EdfCacheConfig
+from eaviz.AD import setdata
+from eaviz.AD.ad import AD
+from utils.edf_cache_util import EdfCacheUtil
+from utils.edf_util import EdfUtil
+
+MINUTES = 240
+SFREQ = 1000
+START_TIME = 2 * 3600  # 分析窗口起点（秒）
+
+
+def prepare_by_full(raw, start_time):
+    """
+    原先 AD.ad 的输入准备
+    """
+    raw.load_data()
+    raw_filtered = EdfUtil.normal_filter(raw)
+    selected_indices = [0, 1, 10, 11, 12, 13, 14, 15, 8, 9]
+    s_freq = int(raw_filtered.info['sfreq'])
+    time = int(raw_filtered.n_times / s_freq)
+    raw_data = raw_filtered.get_data()
+
+    three_dim_array = []
+    for i in range(time):
+        three_dim_array.append(raw_data[:, i * 1000:(i + 1) * 1000])
+    re_data = array(three_dim_array)
+
+    Hdl_Var = re_data[start_time:start_time + EAVizConfig.ModelConfig.AD_DURATION]
+    return setdata.dataset(Hdl_Var[:, selected_indices, :] * 1000000)
+
+
+def main():
+    # 两种方式都实际滤波，不使用滤波缓存
+    EdfCacheConfig.FILTER_CACHE_ENABLED = False
+    with TemporaryDirectory() as tmp:
+        edf_path = make_edf(path.join(tmp, 'bench.edf'), MINUTES, ch_names=EAVizConfig.ChannelEnum.CH19.value,
+                            sfreq=SFREQ, label='{}')
+        EdfCacheUtil.build_sidecar(edf_path)
+
+        result = {}
+        old, old_peak = peak_memory(lambda: result.update(old=prepare_by_full(EdfCacheUtil.read_raw(edf_path),
+                                                                              START_TIME)))
+        new, new_peak = peak_memory(lambda: result.update(new=AD.prepare(EdfCacheUtil.read_raw(edf_path),
+                                                                         START_TIME)[2]))
+        report(f'{MINUTES} 分钟记录中的 {EAVizConfig.ModelConfig.AD_DURATION} 秒窗口', old, new)
+        print(f'    内存峰值: 原实现 {old_peak / 2 ** 20:.1f} MiB，新实现 {new_peak / 2 ** 20:.1f} MiB')
+        print(f'    模型输入最大差异（标准化后）: {float(np_abs(result["old"] - result["new"]).max()):.2e}')
+
+
+if __name__ == '__main__':
+    main()
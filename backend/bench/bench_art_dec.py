@@ -0,0 +1,95 @@
+"""
+Art_Dec 各阶段：原先的 Python 循环 与 向量化实现
+插值（21 通道的 11 秒窗口）、异常检测阈值判定及检出时间点合并（11 个窗口及 1 小时扫描的 3600 个窗口）
+
+    python -m bench.bench_art_dec
+"""
+from bench.bench_util import measure, report
+from numpy import arange, flatnonzero, interp, zeros
+from numpy.random import default_rng
+from numpy.testing import assert_allclose, assert_array_equal
+from torch import cat, from_numpy, tensor, float64
+
+from eaviz.AD.gogogo import AE_NORMAL, AE_FRONTAL, AE_TEMPORAL, AE_FRONTAL_TEMPORAL, AE_GLOBAL, \
+    area_to_ae_preds, interp_1024, merge_times
+
+N_CHANNELS = 21
+N_WINDOWS = (11, 3600)
+
+
+def interp_by_loop(X):
+    """
+    原先逐窗口、逐通道调用 numpy.interp
+    """
+    X1 = zeros((X.shape[0], X.shape[1], X.shape[2] + 24))
+    a = arange(0, 1000) + 1
+    b = arange(0, 999, 1000 / 1025) + 1
+    for i in range(X.shape[0]):
+        X1[i, :, :] = [interp(b, a, X[i, j, :].numpy()) for j in range(X.shape[1])]
+    return from_numpy(X1)
+
+
+def area_to_ae_preds_by_sort(Area):
+    """
+    原先逐窗口拼接阈值后排序，按阈值所在位置分支
+    """
+    AE_preds = []
+    for i in range(Area.shape[0]):
+        aa = Area[i, :].tolist()
+        aa.append(0.95)
+        index = tensor(aa).sort(0, True).indices.numpy()
+        if index[0] == 3:
+            tempa = AE_NORMAL
+        elif index[1] == 3:
+            tempa = AE_FRONTAL if index[0] == 0 else AE_TEMPORAL if index[0] == 1 else AE_GLOBAL
+        elif index[2] == 3:
+            tempa = AE_FRONTAL_TEMPORAL if index[3] == 0 else AE_TEMPORAL if index[3] == 1 else AE_GLOBAL
+        else:
+            tempa = AE_GLOBAL
+        AE_preds.append(tensor(tempa, dtype=float64).unsqueeze(0))
+    return cat(AE_preds, 0)
+
+
+def merge_times_by_search(a_times):
+    """
+    原先先找连续部分，再对每个时间点遍历所有连续部分
+    """
+    segments = []
+    start_time = None
+    for i in range(len(a_times) - 1):
+        if a_times[i + 1] - a_times[i] > 1:
+            if start_time is not None:
+                segments.append((start_time, a_times[i]))
+                start_time = None
+        elif start_time is None:
+            start_time = a_times[i]
+    if start_time is not None:
+        segments.append((start_time, a_times[-1]))
+
+    n_segments = [time for time in a_times if not any(start <= time <= end for start, end in segments)]
+    return segments, n_segments
+
+
+def main():
+    rng = default_rng(0)
+
+    X = from_numpy(rng.standard_normal((N_WINDOWS[0], N_CHANNELS, 1000)))
+    assert_allclose(interp_1024(X).numpy(), interp_by_loop(X).numpy(), rtol=0, atol=1e-12)
+    report(f'插值 ({N_WINDOWS[0]},{N_CHANNELS},1000) -> 1024', measure(lambda: interp_by_loop(X)),
+           measure(lambda: interp_1024(X)))
+
+    for n_windows in N_WINDOWS:
+        Area = from_numpy(rng.uniform(0.5, 1.4, (n_windows, 3)))
+        assert_array_equal(area_to_ae_preds(Area).numpy(), area_to_ae_preds_by_sort(Area).numpy())
+        report(f'阈值判定（{n_windows} 个窗口）', measure(lambda: area_to_ae_preds_by_sort(Area)),
+               measure(lambda: area_to_ae_preds(Area)))
+
+        # 约 40% 的窗口检出
+        a_times = flatnonzero(rng.random(n_windows) < 0.4).tolist()
+        assert merge_times(a_times) == merge_times_by_search(a_times)
+        report(f'检出时间点合并（{n_windows} 个窗口，{len(a_times)} 个检出）',
+               measure(lambda: merge_times_by_search(a_times)), measure(lambda: merge_times(a_times)))
+
+
+if __name__ == '__main__':
+    main()
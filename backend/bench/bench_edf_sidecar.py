@@ -0,0 +1,44 @@
+"""
+EDF 读取：每次 mne.io.read_raw_edf 重新解码 与 EdfCacheUtil.read_raw（sidecar memmap）
+1 小时、21 通道、1000 Hz 的合成记录
+
+    python -m bench.bench_edf_sidecar
+"""
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from bench.bench_util import make_edf, measure, report
+from mne import io
+
+from utils.edf_cache_util import EdfCacheUtil
+
+MINUTES = 60
+SFREQ = 1000
+WINDOW_SECOND = 30  # 单个分析窗口
+
+
+def main():
+    with TemporaryDirectory() as tmp:
+        edf_path = make_edf(path.join(tmp, 'bench.edf'), MINUTES, sfreq=SFREQ)
+        stop = WINDOW_SECOND * SFREQ
+
+        begin = perf_counter()
+        EdfCacheUtil.build_sidecar(edf_path)
+        print(f'生成 sidecar（每个 edf 一次）: {(perf_counter() - begin) * 1000:.1f} ms')
+
+        old = measure(lambda: io.read_raw_edf(edf_path, preload=False, verbose='error'), repeat=3)
+        new = measure(lambda: EdfCacheUtil.read_raw(edf_path), repeat=3)
+        report('打开（不读取数据）', old, new)
+
+        old = measure(lambda: io.read_raw_edf(edf_path, preload=False, verbose='error').get_data(stop=stop), repeat=3)
+        new = measure(lambda: EdfCacheUtil.read_raw(edf_path).get_data(stop=stop), repeat=3)
+        report(f'打开并读取 {WINDOW_SECOND} 秒窗口', old, new)
+
+        old = measure(lambda: io.read_raw_edf(edf_path, preload=True, verbose='error'), repeat=3)
+        new = measure(lambda: EdfCacheUtil.read_raw(edf_path).load_data(verbose='error'), repeat=3)
+        report(f'打开并读取全部 {MINUTES} 分钟', old, new)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+/system/edf/getData：读取整段记录再切片 与 只读取所请求的样本窗口（sidecar memmap）
+4 小时、21 通道、500 Hz 的合成记录，窗口从 10 秒到 1 小时
+
+    python -m bench.bench_edf_window
+"""
+from os import path
+from tempfile import TemporaryDirectory
+
+from bench.bench_util import make_edf, peak_memory, report
+from mne import io
+
+from utils.edf_cache_util import EdfCacheUtil
+
+MINUTES = 240
+SFREQ = 500
+WINDOW_SECONDS = (10, 60, 600, 3600)
+START_SECOND = 3600  # 窗口起点（位于记录中段）
+
+
+def read_by_full(edf_path, start, stop):
+    """
+    原先 get_edf_data_by_id_services 的读取方式
+    """
+    raw = io.read_raw_edf(edf_path, verbose='error')
+    return raw.get_data()[:, start:stop]
+
+
+def read_by_window(edf_path, start, stop):
+    raw = EdfCacheUtil.read_raw(edf_path)
+    return raw.get_data(start=start, stop=stop)
+
+
+def main():
+    with TemporaryDirectory() as tmp:
+        edf_path = make_edf(path.join(tmp, 'bench.edf'), MINUTES, sfreq=SFREQ)
+        EdfCacheUtil.build_sidecar(edf_path)
+
+        start = START_SECOND * SFREQ
+        for seconds in WINDOW_SECONDS:
+            stop = start + seconds * SFREQ
+            old, old_peak = peak_memory(lambda: read_by_full(edf_path, start, stop))
+            new, new_peak = peak_memory(lambda: read_by_window(edf_path, start, stop))
+            report(f'{seconds} 秒窗口', old, new)
+            print(f'    内存峰值: 原实现 {old_peak / 2 ** 20:.1f} MiB，新实现 {new_peak / 2 ** 20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+巴特沃斯滤波：原先每次调用重新设计滤波器并逐通道 filtfilt 与 FilterUtil（设计结果缓存、整个通道矩阵一次滤波、按通道分块并行）
+SpiD 的 filter_2sIIR（0.5-50Hz 6 阶，高通 + 低通）及 SRD 特征提取的 12 阶 80-450Hz 带通
+
+    python -m bench.bench_filter_bank
+"""
+from os import cpu_count
+
+from bench.bench_util import measure, report
+from numpy import zeros_like
+from numpy.random import default_rng
+from numpy.testing import assert_allclose
+from scipy.signal import butter, filtfilt
+
+from config.env import EAVizConfig
+from eaviz.SpiD.edf2mat import filter_2sIIR
+from utils.filter_util import FilterUtil
+
+SPID_MINUTES = (10, 60)
+SPID_SFREQ = 500
+SRD_WINDOWS = 64  # SRD 每批的窗口数
+SRD_SFREQ = 1000
+
+
+def filter_2sIIR_by_loop(sig, f, fs, n):
+    """
+    原先的 filter_2sIIR（带通：高通 + 低通，逐通道）
+    """
+    b, a = butter(n, f[0] / (fs / 2), 'high')
+    sigfilter = zeros_like(sig)
+    for i in range(sig.shape[0]):
+        sigfilter[i, :] = filtfilt(b, a, sig[i, :], padtype='odd', padlen=3 * (max(len(b), len(a)) - 1))
+    b, a = butter(n, f[-1] / (fs / 2), 'low')
+    for i in range(sigfilter.shape[0]):
+        sigfilter[i, :] = filtfilt(b, a, sigfilter[i, :], padtype='odd', padlen=3 * (max(len(b), len(a)) - 1))
+    return sigfilter
+
+
+def bandpass_by_design(x, fs):
+    """
+    原先 SRD getPsdFeature 等每次前向传播都重新设计 12 阶带通
+    """
+    nyq = 0.5 * fs
+    c, d = butter(12, [80 / nyq, 450 / nyq], btype='bandpass')
+    return filtfilt(c, d, x)
+
+
+def main():
+    # 滤波本身的计算量不变，加速主要来自按通道分块并行，单核上两者相近
+    print(f'CPU 核数 {cpu_count()}，滤波线程数 {EAVizConfig.FilterConfig.MAX_WORKERS}')
+    rng = default_rng(0)
+    for minutes in SPID_MINUTES:
+        sig = rng.standard_normal((19, minutes * 60 * SPID_SFREQ)) * 30
+        assert_allclose(filter_2sIIR(sig, [0.5, 50], SPID_SFREQ, 6, 'bandpass'),
+                        filter_2sIIR_by_loop(sig, [0.5, 50], SPID_SFREQ, 6), rtol=0, atol=1e-6 * abs(sig).max())
+        report(f'SpiD filter_2sIIR（19 通道，{minutes} 分钟）',
+               measure(lambda: filter_2sIIR_by_loop(sig, [0.5, 50], SPID_SFREQ, 6), repeat=3),
+               measure(lambda: filter_2sIIR(sig, [0.5, 50], SPID_SFREQ, 6, 'bandpass'), repeat=3))
+
+    x = rng.standard_normal((SRD_WINDOWS, SRD_SFREQ))
+    report(f'SRD 12 阶带通（{SRD_WINDOWS} 个 1 秒窗口）', measure(lambda: bandpass_by_design(x, SRD_SFREQ)),
+           measure(lambda: FilterUtil.filtfilt_ba(x, 12, (80, 450), SRD_SFREQ, 'bandpass')))
+
+
+if __name__ == '__main__':
+    main()
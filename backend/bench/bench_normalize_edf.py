@@ -0,0 +1,55 @@
+"""
+上传后的 edf 规范化：read_raw_edf(preload) + 重排/重命名 + raw.export 与 只改写头并按字节拷贝数据记录
+30 分钟及 8 小时、23 通道（CH21 + ECG、EMG，通道名形如 'EEG Fp1-REF'）、500 Hz 的合成记录
+
+    python -m bench.bench_normalize_edf
+"""
+from os import path
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from bench.bench_util import make_edf, report
+from mne import io
+
+from config.env import EAVizConfig
+from utils.edf_util import EdfUtil
+
+MINUTES = (30, 480)
+SFREQ = 500
+
+
+def normalize_by_export(edf_path, selected_channels):
+    """
+    原先 normalize_edf 的流程（现为快速路径不适用时的回退）
+    """
+    raw = io.read_raw_edf(edf_path, preload=True, verbose='error')
+    selected_channels, mapping_list = EdfUtil.map_channels(selected_channels, raw.info['ch_names'])
+    raw.reorder_channels(mapping_list)
+    raw.rename_channels(dict(zip(mapping_list, selected_channels)))
+    raw.export(edf_path, overwrite=True, verbose='error')
+
+
+def run_once(func, source_path, target_path):
+    """
+    两种路径都会原地改写文件，每次先拷贝一份原始文件（不计入耗时）
+    """
+    copyfile(source_path, target_path)
+    begin = perf_counter()
+    func(target_path, EAVizConfig.ChannelEnum.CH21.value.copy())
+    return perf_counter() - begin
+
+
+def main():
+    ch_names = EAVizConfig.ChannelEnum.CH21.value + ['ECG', 'EMG']
+    with TemporaryDirectory() as tmp:
+        for minutes in MINUTES:
+            source_path = make_edf(path.join(tmp, f'{minutes}min.edf'), minutes, ch_names=ch_names, sfreq=SFREQ)
+            target_path = path.join(tmp, 'target.edf')
+            old = run_once(normalize_by_export, source_path, target_path)
+            new = run_once(EdfUtil.normalize_edf_header_only, source_path, target_path)
+            report(f'{minutes} 分钟（{path.getsize(source_path) / 2 ** 20:.0f} MiB）', old, new)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+AD 窗口标准化：原先逐窗口、逐通道标准化再堆叠 float64 Tensor 与 setdata.dataset 一次广播得到连续的 float32 Tensor
+单次分析的 11 个窗口及 1 小时扫描的 3600 个窗口
+
+    python -m bench.bench_setdata
+"""
+from bench.bench_util import measure, report
+from numpy.random import default_rng
+from numpy.testing import assert_array_equal
+from torch import from_numpy, stack
+
+from config.env import EAVizConfig
+from eaviz.AD import setdata
+
+N_WINDOWS = (11, 3600)
+
+
+def dataset_by_loop(data):
+    """
+    原先的 setdata.dataset（原地修改 data），以及 Art_Dec 中随后的 .float()
+    """
+    cfg = EAVizConfig.ADConfig
+    s_data_list = []
+    for t in range(data.shape[0]):
+        slice_data = data[t]
+        for i in range(slice_data.shape[0]):
+            slice_data[i] = (slice_data[i] - cfg.MEAN[i]) / cfg.STD[i]
+        s_data_list.append(from_numpy(slice_data))
+    return stack(s_data_list).float()
+
+
+def main():
+    rng = default_rng(0)
+    for n_windows in N_WINDOWS:
+        data = rng.standard_normal((n_windows, len(EAVizConfig.ADConfig.MEAN), 1000)) * 30
+        assert_array_equal(setdata.dataset(data).numpy(), dataset_by_loop(data.copy()).numpy())
+        # 原实现会原地修改输入，两者都在副本上计时
+        report(f'标准化 ({n_windows},{data.shape[1]},1000)', measure(lambda: dataset_by_loop(data.copy())),
+               measure(lambda: setdata.dataset(data.copy())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+SPID.tm 的滑动窗口匹配：原先逐窗口 raw.get_data + corrcoef 与 sliding_corr 一次性计算
+10、60、480 分钟的 19 通道 500 Hz 合成记录（窗口 150 点，步长 5 点）。
+逐窗口循环在长记录上过慢，只计时前 LOOP_WINDOWS 个窗口并按窗口数线性外推
+
+    python -m bench.bench_sliding_corr
+"""
+from time import perf_counter
+
+from bench.bench_util import report
+from mne import create_info
+from mne.io import RawArray
+from numpy import arange, corrcoef
+from numpy.random import default_rng
+from numpy.testing import assert_allclose
+
+from config.env import EAVizConfig
+from eaviz.SpiD.spid import sliding_corr
+
+MINUTES = (10, 60, 480)
+SFREQ = 500
+WIDTH = 150
+STEP = 5
+LOOP_WINDOWS = 20000
+
+
+def corr_by_loop(raw, offsets, template_data):
+    """
+    原先 SPID.tm 的逐窗口计算（只取 [0, 1]，即窗口内第 0、1 通道的相关系数）
+    """
+    return [corrcoef(raw.get_data(start=i, stop=i + WIDTH), template_data)[0, 1] for i in offsets]
+
+
+def main():
+    rng = default_rng(0)
+    ch_names = EAVizConfig.ChannelEnum.TPM.value
+    template_data = rng.standard_normal((len(ch_names), WIDTH))
+    for minutes in MINUTES:
+        n_times = minutes * 60 * SFREQ
+        offsets = arange(0, n_times - WIDTH, STEP)
+        # 新实现只需要第 0、1 通道的整段数据；原实现只在前 LOOP_WINDOWS 个窗口所覆盖的数据上计时
+        data = rng.standard_normal((2, n_times)) * 2e-5
+        data[1] += data[0] * 0.5
+        loop_offsets = offsets[:LOOP_WINDOWS]
+        loop_data = rng.standard_normal((len(ch_names), int(loop_offsets[-1]) + WIDTH)) * 2e-5
+        loop_data[:2] = data[:, :loop_data.shape[1]]
+        raw = RawArray(loop_data, create_info(ch_names, SFREQ, 'eeg'), verbose='error')
+
+        begin = perf_counter()
+        expected = corr_by_loop(raw, loop_offsets, template_data)
+        old = (perf_counter() - begin) * len(offsets) / len(loop_offsets)
+
+        begin = perf_counter()
+        actual = sliding_corr(data[0], data[1], offsets, WIDTH)
+        new = perf_counter() - begin
+
+        assert_allclose(actual[:len(loop_offsets)], expected, rtol=0, atol=1e-9)
+        extrapolated = '（外推）' if len(loop_offsets) < len(offsets) else ''
+        report(f'{minutes} 分钟，{len(offsets)} 个窗口{extrapolated}', old, new)
+
+
+if __name__ == '__main__':
+    main()
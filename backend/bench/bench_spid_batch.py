@@ -0,0 +1,43 @@
+"""
+SpiD-SS 分段推理：每秒处理的 30 秒片段数随批大小的变化（CPU，Unet34 随机初始化权重）
+8 小时记录为 960 段，CPU 上逐一推理过慢，只推理前 N_SEGMENTS 段并按段数外推 8 小时的耗时；批大小 1 即原先的逐段推理
+
+    python -m bench.bench_spid_batch
+"""
+from time import perf_counter
+
+from numpy import float32
+from numpy.random import default_rng
+from torch import manual_seed
+
+from config.env import EAVizConfig
+from eaviz.SpiD.Premodel import getlabel_from_segments, split_segments
+from eaviz.SpiD.Unet34 import Unet34
+
+N_SEGMENTS = 32
+TOTAL_SEGMENTS = 8 * 3600 // 30
+BATCH_SIZES = (1, 2, 4, 8, 16)
+
+
+def main():
+    cfg = EAVizConfig.SpiDConfig
+    manual_seed(0)
+    model = Unet34(n_channels=cfg.CHANNEL, SA=cfg.SA).float().eval()
+    data = (default_rng(0).standard_normal((len(cfg.MEAN), N_SEGMENTS * cfg.DURATION)) * 30).astype(float32)
+    segments = split_segments(data)
+
+    getlabel_from_segments(model, segments[:1], batch_size=1)  # 预热
+    expected = None
+    for batch_size in BATCH_SIZES:
+        begin = perf_counter()
+        result = getlabel_from_segments(model, segments, batch_size=batch_size)
+        seconds = perf_counter() - begin
+        # 各段的结果应与批大小无关
+        expected = result if expected is None else expected
+        print(f'批大小 {batch_size}: {N_SEGMENTS / seconds:.2f} 段/秒，'
+              f'8 小时（{TOTAL_SEGMENTS} 段）约 {seconds * TOTAL_SEGMENTS / N_SEGMENTS:.0f} 秒，'
+              f'结果与批大小 {BATCH_SIZES[0]} {"一致" if result == expected else "不一致"}')
+
+
+if __name__ == '__main__':
+    main()
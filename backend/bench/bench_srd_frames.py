@@ -0,0 +1,80 @@
+"""
+SRD 流式输出的数据帧：每行一个 JSON（含三路 times） 与 二进制帧（data2stream_frame，float32 / int16）
+5 秒、1000 Hz 的窗口（raw / low / high 三路），对比每帧字节数及编码耗时，抽取倍数 1 / 4
+
+    python -m bench.bench_srd_frames
+"""
+from json import dumps
+
+from bench.bench_util import measure
+from numpy import arange, pi, sin, stack
+from numpy.random import default_rng
+
+from utils.common_util import data2stream_frame
+
+WINDOW_SIZE = 5.0
+SFREQ = 1000
+DECIMATIONS = (1, 4)
+
+
+def make_window():
+    """
+    三路微伏值：α 节律 + 噪声、其低频部分、高频噪声
+    """
+    rng = default_rng(0)
+    times = (60 * SFREQ + arange(int(WINDOW_SIZE * SFREQ))) / SFREQ
+    low = 30 * sin(2 * pi * 10 * times) + 5 * rng.standard_normal(times.size)
+    high = 2 * rng.standard_normal(times.size)
+    return times, low + high, low, high
+
+
+def encode_json(times, raw_data, low_data, high_data):
+    """
+    stream_srd_data 的 json 格式（原先唯一的格式）
+    """
+    window_data = {
+        'type': 'data',
+        'time': float(times[0]),
+        'windowSize': WINDOW_SIZE,
+        'sfreq': float(SFREQ),
+        'raw': {'times': times.tolist(), 'data': raw_data.tolist()},
+        'low': {'times': times.tolist(), 'data': low_data.tolist()},
+        'high': {'times': times.tolist(), 'data': high_data.tolist()},
+        'bias': {'lower': -4.0, 'upper': 4.0}
+    }
+    return dumps(window_data).encode('utf-8') + b'\n'
+
+
+def encode_framed(times, raw_data, low_data, high_data, dtype, decimation):
+    header = {
+        'type': 'data',
+        'time': float(times[0]),
+        'windowSize': WINDOW_SIZE,
+        'sfreq': float(SFREQ),
+        'decimation': decimation,
+        't0': float(times[0]),
+        'dt': decimation / float(SFREQ),
+        'streams': ['raw', 'low', 'high'],
+        'bias': {'lower': -4.0, 'upper': 4.0}
+    }
+    return data2stream_frame(header, stack([raw_data, low_data, high_data]), dtype)
+
+
+def main():
+    window = make_window()
+    for decimation in DECIMATIONS:
+        times, raw_data, low_data, high_data = (values[::decimation] for values in window)
+        print(f'抽取 {decimation}（每路 {times.size} 个样本点）')
+        encoders = (('json', lambda: encode_json(times, raw_data, low_data, high_data)),
+                    ('framed float32', lambda: encode_framed(times, raw_data, low_data, high_data, 'float32', decimation)),
+                    ('framed int16', lambda: encode_framed(times, raw_data, low_data, high_data, 'int16', decimation)))
+        json_bytes = json_time = None
+        for name, encode in encoders:
+            size, seconds = len(encode()), measure(encode, repeat=20)
+            json_bytes, json_time = json_bytes or size, json_time or seconds
+            print(f'    {name:<15} {size / 1024:6.1f} KiB/帧（json 的 {size / json_bytes:6.1%}），'
+                  f'编码 {seconds * 1000:7.3f} ms/帧（加速 {json_time / seconds:.1f}x）')
+
+
+if __name__ == '__main__':
+    main()
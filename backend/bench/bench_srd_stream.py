@@ -0,0 +1,98 @@
+"""
+SRD 流式输出：原先先对整段记录滤波并分类全部窗口、再输出标注与数据 与 按窗口读取滤波结果并逐块分类
+对比首个标注帧的延迟（原实现为最先发送的 summary，新实现为第一个 events 帧）及输出全部帧的总耗时
+
+30 分钟、4 通道、1000 Hz 的合成记录，分析第 1 通道的 [60, 660) 秒；滤波缓存分别为冷（空目录）和热（已填充）。
+eaviz/SRD/modules.py 在 numpy 2 下无法导入，预训练模型以一个固定规模的小型 1D CNN 代替（各实现分类的窗口相同）
+
+    python -m bench.bench_srd_stream
+"""
+from json import dumps
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from bench.bench_util import make_edf
+from mne import io
+from torch import manual_seed, nn
+
+from config.env import EdfCacheConfig
+from eaviz.SRD.hfo import get_bias, merged, predicted, preprocess
+from eaviz.SRD.srd import SRD
+from utils.edf_cache_util import EdfCacheUtil
+from utils.edf_util import EdfUtil
+
+MINUTES = 30
+SFREQ = 1000
+CH_NAMES = ['Fp1', 'Fp2', 'F3', 'F4']
+START_TIME, STOP_TIME = 60, 660
+
+
+def make_model():
+    manual_seed(0)
+    return nn.Sequential(nn.Conv1d(1, 32, 7, padding=3), nn.ReLU(), nn.Conv1d(32, 32, 7, padding=3), nn.ReLU(),
+                         nn.AdaptiveAvgPool1d(1), nn.Flatten(), nn.Linear(32, 2)).eval()
+
+
+def stream_by_whole_range(raw, model, start_time, stop_time, ch_idx, window_size=5.0):
+    """
+    原先（分块流式输出之前）的 stream_srd_data：整段滤波、分类后先发送汇总，再逐窗口发送数据
+    """
+    raw.pick(ch_idx)
+    raw.load_data()
+    raw_low = EdfUtil.normal_filter(raw.copy())
+    raw_high = EdfUtil.filter_by_spec(raw.copy(), EdfUtil.HFO_FILTER_SPEC)
+    EdfUtil.filter_by_spec(raw, EdfUtil.NOTCH_FILTER_SPEC)
+    raw_notch, sliced_data = preprocess(raw, start_time, stop_time)
+    merged_raw = merged(raw_notch, predicted(model, sliced_data), start_time)
+    annotations = [dict(onset=float(ann['onset']), duration=float(ann['duration']),
+                        description=str(ann['description'])) for ann in merged_raw.annotations]
+    yield dumps(dict(type='summary', totalAnnotations=len(annotations), annotations=annotations,
+                     timeRange=dict(start=float(start_time), stop=float(stop_time)))).encode('utf-8') + b'\n'
+
+    cur_time = start_time
+    while cur_time < stop_time:
+        window_end = min(cur_time + window_size, stop_time)
+        t_idx = raw.time_as_index([cur_time, window_end])
+        raw_data, raw_times = raw[:, t_idx[0]:t_idx[1]]
+        low_data, low_times = raw_low[:, t_idx[0]:t_idx[1]]
+        high_data, high_times = raw_high[:, t_idx[0]:t_idx[1]]
+        bias_lower, bias_upper = get_bias(high_data[0] * 1e6)
+        yield dumps(dict(type='data', time=cur_time, windowSize=window_size, sfreq=float(raw.info['sfreq']),
+                         raw=dict(times=raw_times.tolist(), data=(raw_data[0] * 1e6).tolist()),
+                         low=dict(times=low_times.tolist(), data=(low_data[0] * 1e6).tolist()),
+                         high=dict(times=high_times.tolist(), data=(high_data[0] * 1e6).tolist()),
+                         bias=dict(lower=float(bias_lower), upper=float(bias_upper)))).encode('utf-8') + b'\n'
+        cur_time = window_end
+
+
+def run(stream, raw, model):
+    """
+    :return: (首个标注帧的延迟（秒）, 总耗时（秒）)
+    """
+    begin = perf_counter()
+    first_event = None
+    for frame in stream(raw, model, START_TIME, STOP_TIME, [0]):
+        if first_event is None and (frame.startswith(b'{"type": "summary"') or frame.startswith(b'{"type": "events"')):
+            first_event = perf_counter() - begin
+    return first_event, perf_counter() - begin
+
+
+def main():
+    model = make_model()
+    with TemporaryDirectory() as tmp:
+        edf_path = make_edf(path.join(tmp, 'bench.edf'), MINUTES, ch_names=CH_NAMES, sfreq=SFREQ)
+        EdfCacheUtil.build_sidecar(edf_path)
+        print(f'{MINUTES} 分钟记录，分析 [{START_TIME}, {STOP_TIME}) 秒')
+
+        for name, stream in (('原实现（整段预处理）', stream_by_whole_range), ('新实现（逐块）', SRD.stream_srd_data)):
+            EdfCacheConfig.FILTER_CACHE_PATH = path.join(tmp, f'filtered-{stream.__name__}')
+            for cache in ('冷', '热'):
+                first_event, total = run(stream, EdfCacheUtil.read_raw(edf_path), model)
+                print(f'{name}，sidecar + {cache}滤波缓存: 首个标注帧 {first_event:.2f} s，总耗时 {total:.2f} s')
+            first_event, total = run(stream, io.read_raw_edf(edf_path, verbose='error'), model)
+            print(f'{name}，edf 解码（不经过滤波缓存）: 首个标注帧 {first_event:.2f} s，总耗时 {total:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
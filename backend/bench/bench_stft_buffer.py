@@ -0,0 +1,29 @@
+"""
+ESC/SD 模型输入：每个通道渲染一张 seaborn 热力图 PNG 再解码缩放（stft_to_buffer_by_heatmap）与数值计算（stft_to_buffer）
+单个 4 秒窗口（21 通道，1000 Hz）的 STFT 幅值 -> (1,3,21,32,32)
+
+    python -m bench.bench_stft_buffer
+"""
+from bench.bench_util import measure, report
+from mne import time_frequency
+from numpy.random import default_rng
+
+from eaviz.ESC_SD.offline_process import stft_to_buffer, stft_to_buffer_by_heatmap
+
+N_CHANNELS = 21
+SFREQ = 1000
+WINDOW_SECOND = 4
+
+
+def main():
+    data = default_rng(0).standard_normal((N_CHANNELS, WINDOW_SECOND * SFREQ)) * 10
+    power = abs(time_frequency.stft(data, 200, verbose='error'))[:, 0:16, :]  # 同 get_stft_feature
+
+    error = (stft_to_buffer(power) - stft_to_buffer_by_heatmap(power)).abs()
+    print(f'与热力图实现的差异: 平均 {error.mean().item():.4f}，最大 {error.max().item():.4f}（取值范围 [0, 1]）')
+    report(f'每个窗口（{N_CHANNELS} 通道）', measure(lambda: stft_to_buffer_by_heatmap(power), repeat=3),
+           measure(lambda: stft_to_buffer(power)))
+
+
+if __name__ == '__main__':
+    main()
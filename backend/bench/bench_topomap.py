@@ -0,0 +1,51 @@
+"""
+AD 地形图：EvokedArray.plot_topomap（每次重新插值）与 TopomapUtil.plot_topomaps（缓存插值矩阵）
+
+    python -m bench.bench_topomap
+"""
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from bench.bench_util import measure, report
+from matplotlib.pyplot import close, gcf
+from mne import EvokedArray, create_info
+from numpy import arange
+from numpy.random import default_rng
+
+from config.env import EAVizConfig
+from utils.topomap_util import TopomapUtil
+
+N_TIMES = 11  # AD 每次绘制的时刻数
+
+
+def plot_by_evoked(data, save_path):
+    """
+    原先 APSD 的绘图方式
+    """
+    info = create_info(ch_names=EAVizConfig.ChannelEnum.TPM.value, sfreq=1000., ch_types='eeg')
+    evoked = EvokedArray(data, info, tmin=0.)
+    evoked.set_montage(TopomapUtil.get_montage())
+    tpm = evoked.plot_topomap(arange(N_TIMES), ch_type='eeg', show=False, nrows=3, ncols=4)
+    fig = tpm if hasattr(tpm, 'axes') else gcf()
+    fig.savefig(save_path, format='png', dpi=300)
+    close(fig)
+
+
+def main():
+    data = default_rng(0).standard_normal((len(EAVizConfig.ChannelEnum.TPM.value), N_TIMES * 1000)) * 2e-5
+    titles = [f'{t:0.3f} s' for t in range(N_TIMES)]
+    samples = data[:, arange(N_TIMES) * 1000] * 1e6
+
+    with TemporaryDirectory() as tmp:
+        begin = perf_counter()
+        TopomapUtil.get_interpolator()
+        print(f'插值矩阵预热（启动时一次）: {(perf_counter() - begin) * 1000:.1f} ms')
+
+        old = measure(lambda: plot_by_evoked(data, path.join(tmp, 'old.png')), repeat=3)
+        new = measure(lambda: TopomapUtil.plot_topomaps(samples, titles, path.join(tmp, 'new.png')), repeat=3)
+        report(f'{N_TIMES} 个时刻的地形图（含 300dpi 保存）', old, new)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+/system/edf/getData 的传输格式：原先的 float64 逐块发送（整体转置拷贝） 与 带帧头的 float32 / int16 + 可选压缩
+10 分钟、21 通道、500 Hz 的合成信号，输出吞吐量（按原始 float64 数据量计）及传输字节数
+
+    python -m bench.bench_wire_format
+"""
+from bench.bench_util import measure
+from numpy import arange, pi, sin
+from numpy.random import default_rng
+
+from config.env import EAVizConfig
+from utils.common_util import data2bytes_response, data2frames_response
+
+SECONDS = 600
+SFREQ = 500
+
+
+def data2bytes_response_by_flatten(data):
+    """
+    原先的 data2bytes_response：先生成整个数组的转置副本再分块
+    """
+    chunk_size = 3072 * data.shape[0]
+    data = data.T.flatten()
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size].tobytes()
+
+
+def make_data():
+    """
+    α 节律 + 低频漂移 + 噪声（伏特），比纯随机噪声更接近真实 EEG 的可压缩性
+    """
+    ch_names = EAVizConfig.ChannelEnum.CH21.value
+    rng = default_rng(0)
+    t = arange(SECONDS * SFREQ) / SFREQ
+    data = rng.standard_normal((len(ch_names), t.size)) * 5e-6
+    data += 2e-5 * sin(2 * pi * 10 * t + rng.uniform(0, 2 * pi, (len(ch_names), 1)))
+    data += 3e-5 * sin(2 * pi * 0.3 * t + rng.uniform(0, 2 * pi, (len(ch_names), 1)))
+    return data, ch_names
+
+
+def consume(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    data, ch_names = make_data()
+    cases = [('float64（原格式，整体转置）', lambda: data2bytes_response_by_flatten(data)),
+             ('float64（原格式，切片）', lambda: data2bytes_response(data))]
+    for dtype in ('float32', 'int16'):
+        for compression in ('none', 'lz4', 'zstd'):
+            try:
+                data2frames_response(data[:, :1], SFREQ, ch_names, dtype, compression)
+            except ValueError as e:
+                print(f'跳过 {dtype}/{compression}: {e}')
+                continue
+            cases.append((f'{dtype}/{compression}',
+                          lambda d=dtype, c=compression: data2frames_response(data, SFREQ, ch_names, d, c)))
+
+    print(f'原始数据 {data.nbytes / 2 ** 20:.1f} MiB（float64）')
+    for title, make_chunks in cases:
+        seconds = measure(lambda: consume(make_chunks()), repeat=3)
+        wire_bytes = consume(make_chunks())
+        print(f'{title}: {seconds * 1000:.1f} ms，{data.nbytes / 2 ** 20 / seconds:.0f} MiB/s，'
+              f'传输 {wire_bytes / 2 ** 20:.2f} MiB（{wire_bytes / data.nbytes:.1%}）')
+
+
+if __name__ == '__main__':
+    main()
@@ -105,6 +105,7 @@ class UploadSettings:
     DOWNLOAD_PREFIX = '/download'
     DOWNLOAD_PATH = 'EAViz Files/download_path'
     STREAM_WINDOW_SIZE_SECOND = 30
+    EDF_EXECUTOR_MAX_WORKERS = 2  # 上传后在后台规范化edf的线程池大小
 
     def __init__(self):
         if not path.exists(self.UPLOAD_PATH):
@@ -121,6 +122,35 @@ class CachePathConfig:
     PATHSTR = 'caches'
 
 
+class EdfCacheConfig:
+    """
+    EDF解码缓存配置
+
+    sidecar：与上传的edf同目录的解码结果（float32，按通道连续存储），首次读取时生成，之后直接以 np.memmap 打开，
+    跳过 edf 解码。以 edf 文件的 mtime、size 判断是否失效（重新规范化/覆盖上传后自动重建）。
+    """
+    SIDECAR_ENABLED = getenv('EDF_SIDECAR_ENABLED', 'true').lower() == 'true'
+    SIDECAR_SUFFIX = '.sig'  # demo.edf -> demo.edf.sig/{header.json, data.f32}
+    SIDECAR_BLOCK_SECOND = 60  # 生成 sidecar 时每次从 edf 解码的时长，限制生成过程的峰值内存
+
+    # 进程内 Raw 缓存（LRU）：以 (edf_id, mtime, selected_channels) 为键缓存已 load_data 的 raw，超出字节预算时淘汰最久未使用的
+    RAW_CACHE_MAX_BYTES = int(getenv('EDF_RAW_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+    # min/max 金字塔：第 k 层每个 bin 覆盖 2**k 个样本点，供波形浏览在缩小视图时按像素数取包络
+    PYRAMID_SUFFIX = '.pyr'  # demo.edf -> demo.edf.pyr/{meta.json, L4.npy, L5.npy, ...}
+    PYRAMID_BASE_LEVEL = 4  # 最底层每个 bin 覆盖 16 个样本点，更精细的视图直接读取原始样本
+    PYRAMID_MIN_BINS = 512  # bin 数量小于该值时不再生成更高的层
+    PYRAMID_EAGER_BUILD = getenv('EDF_PYRAMID_EAGER_BUILD', 'false').lower() == 'true'  # 上传后立即生成，否则首次请求时生成
+
+    # 滤波结果缓存：以 (edf, 通道集合, 滤波链) 为键，按块（含前后 margin）滤波后以 float32 memmap 存储，超出磁盘预算时淘汰最久未使用的
+    FILTER_CACHE_ENABLED = getenv('EDF_FILTER_CACHE_ENABLED', 'true').lower() == 'true'
+    FILTER_CACHE_PATH = path.join(CachePathConfig.PATH, 'filtered')
+    FILTER_CACHE_MAX_BYTES = int(getenv('EDF_FILTER_CACHE_MAX_BYTES', str(10 * 1024 * 1024 * 1024)))
+    FILTER_BLOCK_SECOND = 60  # 缓存的最小填充单位
+    FILTER_MARGIN_SECOND = 10  # 块前后额外读取的时长，需大于滤波链的总影响范围（50Hz陷波约 ±3.3s，1Hz高通约 ±1.7s）
+    FILTER_FILL_MAX_BLOCKS = 10  # 每次滤波最多处理的块数，限制峰值内存
+
+
 class RedisInitKeyConfig:
     """
     系统内置Redis键名
@@ -154,6 +184,14 @@ class EAVizSettings:
         SpiD_MODEL = ['Template Matching', 'Unet+ResNet34']
         SRD_MODEL = ['MKCNN']
         VD_MODEL = ['YOLOv5l_3DResNet']
+
+        # 各模型对输入edf的要求（分析前据此校验数据库中保存的edf元信息，不满足时直接返回，不读取edf）
+        ESC_SD_SFREQ = 1000
+        ESC_SD_DURATION = 4
+        AD_SFREQ = 1000
+        AD_DURATION = 11
+        SpiD_SFREQ = 500
+        SRD_SFREQ = 1000
         MODEL_NUM = len(ESC_SD_MODEL) + len(AD_MODEL) / 2 + len(SpiD_MODEL) - 1 + len(SRD_MODEL) + len(
             VD_MODEL) * 2  # 14
 
@@ -242,8 +280,8 @@ class EAVizSettings:
         BASE_ROOT = UploadSettings.DOWNLOAD_PATH
         BASE_CP_ROOT = path.join(path.abspath(getcwd()), 'eaviz')
         FOLDER = {
-            "ESC_SD/ESC": ["feature_map", "stft_feature", "res"],
-            "ESC_SD/SD": ["feature_map", "stft_feature", "res"],
+            "ESC_SD/ESC": ["feature_map", "stft_feature", "res", "cache"],
+            "ESC_SD/SD": ["feature_map", "stft_feature", "res", "cache"],
             "AD": ["index", "topomap", "res"],
             "SpiD": ["index", "family", "res", "mat", "npz"],
             "SRD": [],
@@ -264,8 +302,10 @@ class EAVizSettings:
                 )
 
         @classmethod
-        def get_esc_adr(cls, name):
+        def get_esc_adr(cls, name, key=None):
             base = path.join(cls.BASE_ROOT, "ESC_SD", "ESC")
+            if key is not None:
+                return cls.get_escsd_cache_adr(base, name, key)
             hashtable = {
                 'fm': path.join(base, "feature_map", "feature_map.png"),
                 'stft': path.join(base, "stft_feature", "stft_feature.png"),
@@ -274,8 +314,10 @@ class EAVizSettings:
             return path.abspath(hashtable.get(name, ''))
 
         @classmethod
-        def get_sd_adr(cls, name):
+        def get_sd_adr(cls, name, key=None):
             base = path.join(cls.BASE_ROOT, "ESC_SD", "SD")
+            if key is not None:
+                return cls.get_escsd_cache_adr(base, name, key)
             hashtable = {
                 'fm': path.join(base, "feature_map", "feature_map.png"),
                 'stft': path.join(base, "stft_feature", "stft_feature.png"),
@@ -283,6 +325,19 @@ class EAVizSettings:
             }
             return path.abspath(hashtable.get(name, ''))
 
+        @staticmethod
+        def get_escsd_cache_adr(base, name, key):
+            """
+            按 (edf_id, 窗口, 方法) 缓存的 ESC/SD 结果：cache/<key>/ 下的结果图及预测结果
+            """
+            hashtable = {
+                'fm': "feature_map.png",
+                'stft': "stft_feature.png",
+                'res': "res.png",
+                'result': "result.json",
+            }
+            return path.abspath(path.join(base, "cache", key, hashtable.get(name, '')))
+
         @classmethod
         def get_ad_adr(cls, name, model_name=None):
             base = path.join(cls.BASE_ROOT, "AD")
@@ -294,9 +349,17 @@ class EAVizSettings:
             return path.abspath(hashtable.get(name, ''))
 
         @classmethod
-        def get_spid_adr(cls, name):
+        def get_spid_adr(cls, name, run_id=None):
+            """
+            :param run_id: 单次分析的编号；指定时结果图按该次分析隔离，并发分析互不覆盖
+            """
             base = path.join(cls.BASE_ROOT, "SpiD")
             base_cp_root = path.join(cls.BASE_CP_ROOT, "SpiD")
+            if run_id is not None:
+                hashtable = {
+                    'res': path.join(base, "res", f"{run_id}.png"),
+                }
+                return path.abspath(hashtable.get(name, ''))
             hashtable = {
                 'idx': path.join(base, "index", "idx_light.html"),
                 'fam': path.join(base, "family", "fam_light.png"),
@@ -369,7 +432,27 @@ class EAVizSettings:
         # # files/upload_path/upload/2024/07/05/demo_edf_20240705132949A605.edf
         # filepath = path.join(dir_path, filename)
 
+    class ESCSDConfig:
+        ESC_LABELS = ['BECT', 'CAE', 'CSWS', 'EIEE', 'Else', 'FS', 'Normal', 'WEST']
+        SD_TYPE_LABELS = ['EIEE', 'WEST', 'CAE', 'FS+', 'BECT', 'CSWS']
+        SD_STATE_LABELS = ['interictal', 'seizure']
+
+        # 整段扫描
+        SCAN_STRIDE = 2  # 默认窗口步长（秒）
+        SCAN_BATCH_SIZE = int(getenv('ESCSD_SCAN_BATCH_SIZE', '16'))  # 每批送入模型的窗口数
+        SCAN_MAX_WINDOWS = 20000  # 单次扫描的窗口数上限
+        SCAN_MARGIN = 4  # 扫描范围前后额外读取用于滤波的时长（秒），同 crop_tactic
+        SEIZURE_THRESHOLD = 0.5  # SD 模型 seizure 概率不低于该值的窗口合并为发作事件
+
+        # 单窗口分析结果缓存（ESC_SD/<ESC|SD>/cache/<key>/）：超过有效期或超出磁盘预算时淘汰最久未使用的
+        CACHE_MAX_BYTES = int(getenv('ESCSD_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+        CACHE_MAX_AGE_SECONDS = int(getenv('ESCSD_CACHE_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+
     class ADConfig:
+        # 为 True 时使用上传时统计的该edf各通道均值/标准差（未滤波信号，微伏）代替下面固定的 MEAN/STD
+        USE_RECORDING_STATS = getenv('AD_USE_RECORDING_STATS', 'false').lower() == 'true'
+        CHANNELS = ['Fp1', 'Fp2', 'F7', 'F8', 'T3', 'T4', 'T5', 'T6', 'O1', 'O2']  # MEAN/STD 对应的通道
+        FILTER_MARGIN = 10  # 分析窗口前后额外读取用于滤波的时长（秒），需覆盖 50Hz 陷波、1-70Hz 及 APSD 频带滤波的长度
         MEAN = [-0.019813645741049712, -0.08832978649691134, -0.17852094982207156, -0.141283147662929,
                 -0.164364199798768, -0.10493702302254725, 0.0069039257850445224, 0.053706128833827776,
                 -0.07108375609375886, -0.036934718124703704]
@@ -379,6 +462,7 @@ class EAVizSettings:
     class SpiDConfig:
         # template matching
         CORR_THRESHOLD = 0.985
+        CORR_CHUNK_BYTES = 32 * 1024 * 1024  # 滑动相关系数按块计算时每块临时数组的内存预算
 
         # model
         CHANNEL = 1
@@ -390,6 +474,14 @@ class EAVizSettings:
         SAMPLE_RATE = 500  # 采样频率
         STAGE_DICT = {'NREM1': 1, 'NREM2': 1, 'NREM3': 1, 'WAKE': 0, 'REM': 2}
         FILLNUM = 5  # 在编码数字前自动补到5位，用0填充 (00001 00002 ...)
+        BATCH_SIZE = int(getenv('SPID_BATCH_SIZE', '8'))  # 每批送入 Unet34 的 30s 片段数
+        STREAM_CHUNK_SECONDS = 60  # 流式模板匹配每次输出部分结果的时长（秒）
+        RES_EXPIRE_SECONDS = 3600  # 每次分析的结果图单独保存，超过该时长的结果图在下次分析时删除
+        # 为 True 时额外按原流程将 mat/npz 文件导出到临时目录，从 npz 再推理一次与内存中的结果比对，结束后删除（仅用于调试，SpiD-SS 直接在内存中切段）
+        DEBUG_EXPORT = getenv('SPID_DEBUG_EXPORT', 'false').lower() == 'true'
+
+        # 为 True 时使用上传时统计的该edf各通道均值/标准差（未滤波信号，微伏）代替下面固定的 MEAN/STD
+        USE_RECORDING_STATS = getenv('SPID_USE_RECORDING_STATS', 'false').lower() == 'true'
 
         # 对于19个通道，每个通道的均值和方差
         MEAN = [0.0011932824351784102, 0.0011390994131762048, 0.002174121577085201, 0.002013172372939422,
@@ -404,6 +496,17 @@ class EAVizSettings:
                26.68113085331614, 24.673989932452198, 31.562467510679348, 26.17375310899985, 30.13404382066629,
                28.180303034702355, 36.66892740731378, 32.64965539572045, 30.10440133194577]
 
+    class SRDConfig:
+        # 流式分块在滤波缓存不可用时按块滤波并保留该块，之后的窗口落在块内时直接切片
+        FILTER_BLOCK = 60  # 每次滤波的时长（秒）
+        FILTER_MARGIN = 10  # 每块前后额外读取用于滤波的时长（秒），需覆盖两次 50Hz 陷波及各频带滤波的长度
+
+    class FilterConfig:
+        # 共享滤波器组（utils/filter_util.py）
+        MAX_WORKERS = int(getenv('EAVIZ_FILTER_MAX_WORKERS', '4'))  # 按通道分块并行滤波的线程数，1 表示不并行
+        BLOCK_CHANNELS = 8  # 每个并行任务处理的通道数，通道数不超过该值时不并行
+        SOS_CACHE_SIZE = 64  # 缓存的滤波器设计数
+
     class VDConfig:
         VD_EXECUTOR_MAX_WORKERS = 5
         DEVICE = 0
@@ -528,7 +631,8 @@ class GetConfig:
             parser = ArgumentParser(description='命令行参数')
             parser.add_argument('--env', type=str, default='', help='运行环境')
             # 解析命令行参数
-            args = parser.parse_args()  # Namespace(env='') Namespace(env='dev')
+            # 只解析自定义参数，忽略其他程序（如 pytest）的命令行参数
+            args, _ = parser.parse_known_args()  # Namespace(env='') Namespace(env='dev')
             # 设置环境变量，如果未设置命令行参数，默认APP_ENV为dev
             environ['APP_ENV'] = args.env if args.env else 'dev'
         # 读取运行环境
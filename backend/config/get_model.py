@@ -75,12 +75,13 @@ class ModelUtil:
                 model = GoogLeNet(loss=classLoss())
             else:
                 raise NotImplementedError
+            use_device = device("cuda" if cuda.is_available() else "cpu")
             if test:
-                state_dict = load(test_weight)['state_dict']
+                state_dict = load(test_weight, map_location=use_device)['state_dict']
                 model.load_state_dict(state_dict)
                 print(' Weight_path: ' + test_weight)
             print(printout)
-            return model.float().cuda().eval()
+            return model.float().to(use_device).eval()
 
         def _prepare_model2(model, test_weight=None):  # AE 的模型
             assert model in ['AE', 'SkipAE', 'MemAE', 'EstimatorAutoEncoder', 'VAE', 'Resnet_Encoder']
@@ -102,13 +103,14 @@ class ModelUtil:
                 print('***************************************** Using VAE *****************************************')
             else:
                 raise NotImplementedError
+            use_device = device("cuda" if cuda.is_available() else "cpu")
             if test_weight:
-                state_dict = load(test_weight)['state_dict']
+                state_dict = load(test_weight, map_location=use_device)['state_dict']
                 model.load_state_dict(state_dict)
                 print(f'loading model {model} with weight {test_weight}')
             else:
                 print(f'loading model {model}')
-            return model.float().cuda().eval()
+            return model.float().to(use_device).eval()
 
         try:
             model = None
@@ -130,9 +132,10 @@ class ModelUtil:
         def _prepare_model(test_weight):
             cfg = EAVizConfig.SpiDConfig
             model = Unet34(n_channels=cfg.CHANNEL, SA=cfg.SA)  # 带SA channel=1 all in：19  注意SA
-            state_dict = load(test_weight)['state_dict']
+            use_device = device("cuda" if cuda.is_available() else "cpu")
+            state_dict = load(test_weight, map_location=use_device)['state_dict']
             model.load_state_dict(state_dict)
-            return model.float().cuda().eval()
+            return model.float().to(use_device).eval()
 
         try:
             logger.info(EAVizConfig.AddressConfig.get_cp_adr('SpiD'))
@@ -0,0 +1,17 @@
+-- ----------------------------
+-- EDF表（sys_edf）升级脚本
+-- 用于已部署的数据库：启动时的 create_all 只会新建缺失的表，不会为已有的表补充字段
+-- 新部署直接使用 ../sql/eaviz.sql 即可，无需执行本脚本
+-- 注意：本目录不挂载到 /docker-entrypoint-initdb.d，需手动执行，例如：
+--   mysql -uroot -p eaviz < upgrade_sys_edf.sql
+-- ----------------------------
+use `eaviz`;
+
+-- EDF状态（上传后后台异步处理）
+alter table sys_edf
+    add column edf_status varchar(16) default 'ready' comment 'EDF状态（processing处理中 ready就绪 failed失败）' after valid_channels;
+
+-- EDF样本点数及元信息（上传时解析并缓存，打开时无需再读取 EDF 头）
+alter table sys_edf
+    add column edf_n_samples int default null comment 'EDF样本点数' after edf_time,
+    add column edf_meta text default null comment 'EDF元信息（JSON：记录布局、各通道物理量范围及均值/标准差）' after edf_n_samples;
@@ -1344,8 +1344,11 @@ create table sys_edf
     edf_name       varchar(255) default '' comment 'EDF文件名',
     edf_sfreq      float        default 0.0 comment 'EDF采样频率',
     edf_time       float        default 0.0 comment 'EDF采样时长',
+    edf_n_samples  int          default null comment 'EDF样本点数',
+    edf_meta       text         default null comment 'EDF元信息（JSON：记录布局、各通道物理量范围及均值/标准差）',
     edf_path       varchar(255) default '' comment 'EDF文件路径',
     valid_channels varchar(255) default '' comment '有效通道',
+    edf_status     varchar(16)  default 'ready' comment 'EDF状态（processing处理中 ready就绪 failed失败）',
     upload_by      varchar(64)  default '' comment '上传者',
     upload_time    datetime     default CURRENT_TIMESTAMP comment '上传时间',
     remark         varchar(500) default null comment '备注',
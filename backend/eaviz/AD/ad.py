@@ -1,8 +1,8 @@
 from torch import from_numpy
-from numpy import array
+from config.env import EAVizConfig
 from eaviz.AD import setdata
 from eaviz.AD.APSD import APSD
-from eaviz.AD.gogogo import Art_Dec
+from eaviz.AD.gogogo import Art_Dec, ae_predict, arti_masks, combine_preds, dp_predict
 from utils.edf_util import EdfUtil
 
 
@@ -12,7 +12,23 @@ class AD:
     """
 
     @staticmethod
-    def ad(raw, start_time, fb_idx, arti_list, mod1, mod2, mod2_name):
+    def prepare(raw, start_time, mean=None, std=None):
+        """
+        截取分析窗口 [start_time, start_time + 11) 及前后的滤波余量，加载、滤波并生成模型输入
+        :param raw: 可为未加载数据的 raw
+        :return: raw_filtered, raw_data (19,n_times), X (11,10,1000), crop_start
+        """
+        s_freq = int(raw.info['sfreq'])
+        stop_time = start_time + EAVizConfig.ModelConfig.AD_DURATION
+
+        # 只截取分析窗口及前后滤波余量后再加载、滤波（余量足够时与对整段记录滤波的结果一致）
+        margin = EAVizConfig.ADConfig.FILTER_MARGIN
+        crop_start = max(start_time - margin, 0)
+        crop_stop = stop_time + margin
+        if crop_stop < raw.times[-1]:
+            raw.crop(tmin=crop_start, tmax=crop_stop, include_tmax=False)  # [crop_start, crop_stop)
+        else:
+            raw.crop(tmin=crop_start)  # 余量超出记录末尾时截取到最后一个样本点
         raw.load_data()
 
         # 滤波
@@ -21,27 +37,64 @@ class AD:
         # channels = ['Fp1', 'Fp2', 'F7', 'F8', 'T3', 'T4', 'T5', 'T6', 'O1', 'O2']
         selected_indices = [0, 1, 10, 11, 12, 13, 14, 15, 8, 9]
 
-        s_freq = int(raw_filtered.info['sfreq'])
-        time = int(raw_filtered.n_times / s_freq)  # 1200 int 向下取整
+        raw_data = raw_filtered.get_data()  # (19,(11+2*margin)*1000)
+        n_ch = raw_data.shape[0]
 
-        raw_data = raw_filtered.get_data()  # (19,1200000) 1200s
-        # re_data = raw_data.reshape(time, 19, s_freq)  # (1200,19,1000) (总时长,通道数,采样频率)
+        # 按秒切分分析窗口 (11,19,1000) (秒,通道数,采样频率)
+        offset = int(round((start_time - crop_start) * s_freq))
+        n_sec = stop_time - start_time
+        Hdl_Var = raw_data[:, offset:offset + n_sec * s_freq].reshape(n_ch, n_sec, s_freq).transpose(1, 0, 2)
+        s_data = (Hdl_Var[:, selected_indices, :] * 1000000)  # (11,10,1000)
+        X = setdata.dataset(s_data, mean, std)  # (11,10,1000)
+        return raw_filtered, raw_data, X, crop_start
 
-        three_dim_array = []
-        for i in range(time):
-            start_index = i * 1000  # 计算起始索引
-            end_index = (i + 1) * 1000  # 计算结束索引
-            data_to_add = raw_data[:, start_index:end_index]
-            three_dim_array.append(data_to_add)
+    @classmethod
+    def ad(cls, raw, start_time, fb_idx, arti_list, mod1, mod2, mod2_name, mean=None, std=None):
+        """
+        :param raw: 可为未加载数据的 raw，只读取分析窗口 [start_time, start_time + 11) 及前后的滤波余量
+        """
+        stop_time = start_time + EAVizConfig.ModelConfig.AD_DURATION
+        raw_filtered, raw_data, X, crop_start = cls.prepare(raw, start_time, mean, std)
 
-        re_data = array(three_dim_array)
+        n_data = from_numpy(raw_data)
 
-        stop_time = start_time + 11
-        Hdl_Var = re_data[start_time:stop_time]  # (11,19,1000)
-        s_data = (Hdl_Var[:, selected_indices, :] * 1000000)  # (11,10,1000)
-        X = setdata.dataset(s_data)  # (11,10,1000)
+        APSD(n_data, start_time, stop_time, fb_idx, first_time=crop_start)  # toposize
+        # 截取后 raw 的时间从 0 开始，传入相对于截取起点的开始时间
+        annotations_list, des_list = Art_Dec(X, arti_list, raw_filtered, start_time - crop_start, mod1, mod2,
+                                             mod2_name)
 
-        n_data = from_numpy(raw_data)
+    @classmethod
+    def ensemble(cls, raw, start_time, arti_list, methods, models, mean=None, std=None):
+        """
+        多个 特征/分类头 组合的伪迹检测：窗口只准备一次，每个深度模型与异常检测模型各只推理一次，
+        各组合的预测由两者相乘得到，并对各组合的结果做多数投票
+        :param methods: AD_MODEL 中的组合名称列表，如 ['Resnet34_AE_BCELoss', 'VGG16_VAE_BCELoss']
+        :param models: {模型名称: 已加载的模型}
+        :return: dict(times, combinations={组合: {伪迹: [0/1...]}}, vote={伪迹: [0/1...]})
+        """
+        _, _, X, _ = cls.prepare(raw, start_time, mean, std)
+        X = X.float()
+
+        dp_preds, ae_preds = {}, {}
+        combinations = {}
+        for method in methods:
+            model1, model2 = method.split('_')[:2]
+            if model1 not in dp_preds:
+                mod1 = models[model1]
+                dp_preds[model1] = dp_predict(X.to(next(mod1.parameters()).device), mod1)
+            if model2 not in ae_preds:
+                mod2 = models[model2]
+                ae_preds[model2] = ae_predict(X.to(next(mod2.parameters()).device), mod2, model2)
+            y_pred = combine_preds(dp_preds[model1], ae_preds[model2])
+            combinations[method] = arti_masks(y_pred, arti_list)
+
+        # 多数投票：超过半数组合检出即视为检出
+        vote = {}
+        for description in (combinations[methods[0]] if methods else {}):
+            votes = sum(masks[description].astype(int) for masks in combinations.values())
+            vote[description] = (votes * 2 > len(methods)).astype(int).tolist()
+        combinations = {method: {description: mask.astype(int).tolist() for description, mask in masks.items()}
+                        for method, masks in combinations.items()}
 
-        APSD(n_data, start_time, stop_time, fb_idx)  # toposize
-        annotations_list, des_list = Art_Dec(X, arti_list, raw_filtered, start_time, mod1, mod2, mod2_name)
+        n_sec = EAVizConfig.ModelConfig.AD_DURATION
+        return dict(times=list(range(start_time, start_time + n_sec)), combinations=combinations, vote=vote)
@@ -1,38 +1,98 @@
-from torch import no_grad, from_numpy, mean, sigmoid, tensor, float64, cat, zeros as t_zeros
+from torch import no_grad, from_numpy, mean, sigmoid, tensor, float64, stack, where
 from torch.nn.functional import mse_loss
-from numpy import interp, arange, zeros, concatenate, multiply
+from numpy import arange, array, flatnonzero, multiply
 from config.env import EAVizConfig
 from mne import Annotations
 from mne.viz import plot_raw
-from matplotlib.pyplot import savefig, close
+from matplotlib.pyplot import close
+from utils.log_util import logger
+
+
+# 插值：1~1000 的采样点线性插值到 1024 个点，b 落在 [a[lo], a[lo + 1]] 之间
+AE_INTERP_POS = arange(0, 999, 1000 / 1025)  # b - 1 (1024,)
+AE_INTERP_LO = AE_INTERP_POS.astype(int)
+AE_INTERP_FRAC = AE_INTERP_POS - AE_INTERP_LO
+
+# 阈值在 [Area, 0.95] 降序排列中的位置 -> (位置, 最大/最小分区) 对应的预测标签
+AE_THRESHOLD = 0.95
+AE_NORMAL = [0, 0, 0, 0, 0, 1]  # 正常数据   000001
+AE_FRONTAL = [1, 1, 0, 0, 0, 0]  # 额区异常 110000
+AE_TEMPORAL = [0, 0, 1, 1, 0, 0]  # 颞区异常001100
+AE_FRONTAL_TEMPORAL = [1, 1, 1, 1, 0, 0]  # 额区颞区均异常111100
+AE_GLOBAL = [0, 0, 0, 0, 1, 0]  # 全局异常000010
+AE_PRED_TABLE = tensor([
+    [AE_NORMAL, AE_NORMAL, AE_NORMAL],  # 阈值最大的情况
+    [AE_FRONTAL, AE_TEMPORAL, AE_GLOBAL],  # 阈值第二大的情况，按最大的分区
+    [AE_FRONTAL_TEMPORAL, AE_TEMPORAL, AE_GLOBAL],  # 阈值第三大的情况，按最小的分区（颞区强异常001100）
+    [AE_GLOBAL, AE_GLOBAL, AE_GLOBAL],  # 阈值最小的情况 全局异常000010
+], dtype=float64)
+
+# 各伪迹类型：(描述, 判定条件, 未检出时的提示)
+ARTI_RULES = {
+    1: ('EB', lambda y: (y[:, 0] == 1) & (y[:, 5] == 0), '无眨眼伪迹！'),
+    2: ('FE', lambda y: (y[:, 1] == 1) & (y[:, 2] == 0) & (y[:, 5] == 0), '无额区肌电！'),
+    3: ('CE', lambda y: y[:, 2] == 1, '无咀嚼伪迹！'),
+    4: ('TE', lambda y: (y[:, 3] == 1) & (y[:, 2] == 0) & (y[:, 5] == 0), '无颞区肌电！'),
+    5: ('Unclear', lambda y: (y == array(AE_GLOBAL)).all(axis=1), '无异常脑电！'),
+    0: ('Normal', lambda y: (y[:, 5] == 1) & (y[:, 2] == 0), '无正常脑电！'),
+}
+
+
+def interp_1024(X):
+    """
+    对 (窗口数,通道数,1000) 的数据沿最后一维一次性线性插值到 1024 个点（float64 计算，同 numpy.interp）
+    """
+    X = X.double()
+    lo = from_numpy(AE_INTERP_LO).to(X.device)
+    frac = from_numpy(AE_INTERP_FRAC).to(X.device)
+    return X[..., lo] * (1 - frac) + X[..., lo + 1] * frac
+
+
+def area_to_ae_preds(Area):
+    """
+    根据阈值在 [三个分区的 Area, 0.95] 降序排列中的位置得到每个窗口的异常检测预测标签
+    :param Area: (窗口数,3)
+    :return: (窗口数,6)
+    """
+    rank = (Area > AE_THRESHOLD).sum(dim=1)  # 阈值在降序排列中的位置
+    region = where(rank == 1, Area.argmax(dim=1), Area.argmin(dim=1))
+    return AE_PRED_TABLE[rank, region]
+
+
+def merge_times(a_times):
+    """
+    将检测到的时间点（每个时间点持续 1s）按游程合并：连续部分为 (start, end)，其余为单独的时间点
+    :return: segments, n_segments
+    """
+    segments = []  # 存储连续部分的起始值和终止值 [5,6]，dur为end-start+1s
+    n_segments = []  # 不在连续部分中的值，dur为1s
+    run_start = 0
+    for i in range(1, len(a_times) + 1):
+        if i == len(a_times) or a_times[i] - a_times[i - 1] > 1:
+            if i - run_start > 1:
+                segments.append((a_times[run_start], a_times[i - 1]))
+            else:
+                n_segments.append(a_times[run_start])
+            run_start = i
+    return segments, n_segments
 
 
-def Art_Dec(Hdl_Var, arti_list, raw, st, mod1, mod2, mod2_name, auto=False):
-    Preds = []
-    AE_index = []
+def dp_predict(X, mod1):
+    """
+    深度模型（分类头）预测：(窗口数,6) 的概率
+    """
+    with no_grad():
+        return sigmoid(mod1(X)).cpu().numpy()
 
+
+def ae_predict(X, mod2, mod2_name):
+    """
+    异常检测模型预测：(窗口数,6) 的预测标签
+    """
     with no_grad():
         outAE = 0
-        X = Hdl_Var  # (11,10,1000)
-        batch_size = len(X)  # 11
-        X = X.float().cuda()
-
-        # 深度模型
-        pred = mod1(X)  # (11,6)
-        # 异常检测
-        X = X.float().cuda()
         if mod2_name != 'VAE':
-            X1 = zeros((X.shape[0], X.shape[1], X.shape[2] + 24))  # (11,10,1024)
-            for i in range(X.shape[0]):
-                Y = []
-                for j in range(X[i].shape[0]):
-                    a = arange(0, 1000) + 1  # 1~1000 (1000,)
-                    b = arange(0, 999, 1000 / 1025) + 1  # 1~1000 (1024,)
-                    N = X[i, j, :].cpu().numpy()  # (1000,)
-                    c = interp(b, a, N)  # 线性插值得到b在(a,N)上的y值 (1024,)
-                    Y.append(c)
-                X1[i, :, :] = Y
-            X1 = from_numpy(X1).float().cuda()  # (11,10,1024)
+            X1 = interp_1024(X).float()  # (11,10,1024)
             outAE = mod2(X1)  # (11,10,1024)
             # 求不同的Mse
             MSE = mean(mse_loss(X1, outAE[0], reduction='none'), dim=2)  # (11,10)
@@ -43,176 +103,55 @@ def Art_Dec(Hdl_Var, arti_list, raw, st, mod1, mod2, mod2_name, auto=False):
             outAE = outAE / 5
             MSE = mean(mse_loss(X, outAE, reduction='none'), dim=2)
         # 映射
+        MSE = MSE.cpu()
+        Area = stack([(MSE[:, 0] + MSE[:, 1]) / 2,
+                      (MSE[:, 2] + MSE[:, 3] + MSE[:, 4] + MSE[:, 5]) / 4,
+                      (MSE[:, 6] + MSE[:, 7] + MSE[:, 8] + MSE[:, 9]) / 4], dim=1)  # (11,3)
+        # 原实现中的 sigmoid(Area) 未使用其返回值，按未经 sigmoid 的 Area 与阈值比较
+        return area_to_ae_preds(Area).numpy()
+
+
+def combine_preds(dp_pred, ae_pred):
+    """
+    深度模型与异常检测模型的预测相乘后二值化：(窗口数,6)
+    """
+    y_pred = multiply(ae_pred, dp_pred)
+    return (y_pred > 0.1).astype(int)
 
-        Area = t_zeros(batch_size, 3)  # (11,3)
-        Area[:, 0] = (MSE[:, 0] + MSE[:, 1]) / 2
-        Area[:, 1] = (MSE[:, 2] + MSE[:, 3] + MSE[:, 4] + MSE[:, 5]) / 4
-        Area[:, 2] = (MSE[:, 6] + MSE[:, 7] + MSE[:, 8] + MSE[:, 9]) / 4
-        AE_preds = []
-        for i in range(batch_size):
-            sigmoid(Area)
-            aa = Area[i, :].tolist()  # 类型转换
-            aa.append(0.95)  # 将阈值拼接到一起  阈值所在位置为 3
-            Temp = tensor(aa)
-            index = Temp.sort(0, True).indices.numpy()  # 排序数据  并得到其下标
-            # 阈值最大的情况
-            if index[0] == 3:  # 正常数据   000001
-                tempa = tensor([0, 0, 0, 0, 0, 1], dtype=float64)
-            elif index[1] == 3:  # 阈值第二大的情况
-                if index[0] == 0:  # 额区异常 110000
-                    tempa = tensor([1, 1, 0, 0, 0, 0], dtype=float64)
-                elif index[0] == 1:  # 颞区异常001100
-                    tempa = tensor([0, 0, 1, 1, 0, 0], dtype=float64)
-                else:  # 全局异常000010
-                    tempa = tensor([0, 0, 0, 0, 1, 0], dtype=float64)
-            elif index[2] == 3:  # 阈值第三大的情况
-                if index[3] == 0:  # 额区颞区均异常111100
-                    tempa = tensor([1, 1, 1, 1, 0, 0], dtype=float64)
-                elif index[3] == 1:  # 颞区强异常001100
-                    tempa = tensor([0, 0, 1, 1, 0, 0], dtype=float64)
-                else:  # 全局异常000010
-                    tempa = tensor([0, 0, 0, 0, 1, 0], dtype=float64)
-            elif index[3] == 3:  # 阈值最小的情况 全局异常000010
-                tempa = tensor([0, 0, 0, 0, 1, 0], dtype=float64)
-            AE_preds.append(tempa.unsqueeze(0))
-        # 合并每次数据
-        AE_preds = cat(AE_preds, 0)
-        # Labels.append(label.cpu().numpy())  # 真实标签累计
-        Preds.append(sigmoid(pred).cpu().numpy())  # 深度模型预估标签累计 tensor to list
-        AE_index.append(AE_preds.cpu().numpy())  # 异常检测模型预估标签累计
 
-    dp_pred = concatenate(Preds, 0)  # 深度模型预测
-    ae_pred = concatenate(AE_index, 0)  # Ae生成
+def arti_masks(y_pred, arti_list):
+    """
+    各伪迹类型在每个窗口（1s）上是否检出：{描述: (窗口数,) bool}
+    """
+    return {ARTI_RULES[num][0]: ARTI_RULES[num][1](y_pred) for num in arti_list if num in ARTI_RULES}
 
-    # y_true = np.concatenate(Labels, 0)  # 真实标签
-    y_pred = multiply(ae_pred, dp_pred)
 
-    y_pred = (y_pred > 0.1).astype(int)
+def Art_Dec(Hdl_Var, arti_list, raw, st, mod1, mod2, mod2_name, auto=False):
+    X = Hdl_Var.float()  # (11,10,1000)
+
+    # 输入放到各模型所在的设备上（无 GPU 时模型加载在 CPU 上）
+    dp_pred = dp_predict(X.to(next(mod1.parameters()).device), mod1)  # 深度模型预测
+    ae_pred = ae_predict(X.to(next(mod2.parameters()).device), mod2, mod2_name)  # Ae生成
+    y_pred = combine_preds(dp_pred, ae_pred)
 
     # 模型检测结果不变，只要遍历arti_list即可
     all_merged_annotations = []
     des_list = []
-    for i, num in enumerate(arti_list):
+    for num in arti_list:
         a_times = []
         description = None
-        if num == 1:
-            description = 'EB'
-            des_list.append(description)
-            for y in range(y_pred.shape[0]):
-                data = tuple(y_pred[y])  # 获取当前时间点的数据
-
-                if data[0] == 1 and data[5] == 0:
-                    a_times.append(y)
-            if a_times == []:
-                print('无眨眼伪迹！')
-
-        elif num == 2:
-            description = 'FE'
-            des_list.append(description)
-            for y in range(y_pred.shape[0]):
-                data = tuple(y_pred[y])  # 获取当前时间点的数据
-
-                if data[1] == 1 and data[2] == 0 and data[5] == 0:
-                    a_times.append(y)
-            if a_times == []:
-                print('无额区肌电！')
-
-        elif num == 3:
-            description = 'CE'
-            des_list.append(description)
-            for y in range(y_pred.shape[0]):
-                data = tuple(y_pred[y])  # 获取当前时间点的数据
-
-                if data[2] == 1:
-                    a_times.append(y)
-            if a_times == []:
-                print('无咀嚼伪迹！')
-
-        elif num == 4:
-            description = 'TE'
+        if num in ARTI_RULES:
+            description, rule, empty_msg = ARTI_RULES[num]
             des_list.append(description)
-            for y in range(y_pred.shape[0]):
-                data = tuple(y_pred[y])  # 获取当前时间点的数据
-
-                if data[3] == 1 and data[2] == 0 and data[5] == 0:
-                    a_times.append(y)
-            if a_times == []:
-                print('无颞区肌电！')
-
-        elif num == 5:
-            description = 'Unclear'
-            des_list.append(description)
-            for y in range(y_pred.shape[0]):
-                data = tuple(y_pred[y])  # 获取当前时间点的数据
-
-                if data == (0, 0, 0, 0, 1, 0):
-                    a_times.append(y)
-            if a_times == []:
-                print('无异常脑电！')
-
-        elif num == 0:
-            description = 'Normal'
-            des_list.append(description)
-            for y in range(y_pred.shape[0]):
-                data = tuple(y_pred[y])  # 获取当前时间点的数据
-
-                if data[5] == 1 and data[2] == 0:
-                    a_times.append(y)
-            if a_times == []:
-                print('无正常脑电！')
-
-        n_segments = []  # 不在连续部分中的值，dur为1s
-        segments = []  # 存储连续部分的起始值和终止值 [5,6]，dur为end-start+1s
-        start_time = None  # 连续部分的起始值 5
-
-        for i in range(len(a_times) - 1):  # [1,3,5,6]
-            if a_times[i + 1] - a_times[i] > 1:  # 每个检测到的时间点持续事件为1s，所以将时间间隔为1s的时间点视为连续部分
-                if start_time is not None:
-                    end_time = a_times[i]
-                    segments.append((start_time, end_time))
-                    start_time = None
-            else:
-                if start_time is None:
-                    start_time = a_times[i]
-
-        # 检查最后一个连续部分
-        if start_time is not None:
-            end_time = a_times[-1]
-            segments.append((start_time, end_time))
-
-        # 打印结果
-        for segment in segments:
-            start, end = segment
-            print(f"起始值: {start}, 终止值: {end}")
-
-        # 找出不在 segment 中的值，标记为 'n_segments'
-        for time in a_times:
-            found = False
-            for segment in segments:
-                start, end = segment
-                if start <= time <= end:
-                    found = True
-                    break
-            if not found:
-                n_segments.append(time)
-
-        # 打印不在 segment 中的 'a_times'
-        for time in n_segments:
-            print(f"'a_times' 中不在 'segments' 中的值: {time}")
-
-        merged_onsets = []
-        merged_durations = []
-
-        for start, end in segments:  # 事件
-            duration = end - start + 1  # 眨眼伪迹的持续时间（秒）
+            a_times = flatnonzero(rule(y_pred)).tolist()
+            if not a_times:
+                logger.info(empty_msg)
 
-            merged_onsets.append(start)
-            merged_durations.append(duration)
+        segments, n_segments = merge_times(a_times)
 
-        merged_onsets.extend(n_segments)
+        merged_onsets = [start for start, _ in segments] + n_segments
         merged_onsets = [i + st for i in merged_onsets]
-        for time in n_segments:
-            merged_durations.append(1)
+        merged_durations = [end - start + 1 for start, end in segments] + [1] * len(n_segments)
         # list, list, str
         merged_annotation = Annotations(onset=merged_onsets, duration=merged_durations, description=description)
         all_merged_annotations.append(merged_annotation)
@@ -228,7 +167,9 @@ def Art_Dec(Hdl_Var, arti_list, raw, st, mod1, mod2, mod2_name, auto=False):
     text_size = 16
     font_family = "Microsoft YaHei"
 
-    eeg_plot = plot_raw(raw, duration=11, scalings=300e-6, show=False, show_scrollbars=False, start=st)
+    # st 相对于 raw 的开始；raw 为截取后的片段时，横轴仍按原记录的时间显示
+    eeg_plot = plot_raw(raw, duration=11, scalings=300e-6, show=False, show_scrollbars=False, start=st,
+                        show_first_samp=True)
     # bgcolor = rcParams['axes.facecolor']
     # 获取第一个轴对象，通常包含图表的标题和注释
     ax = eeg_plot.mne.ax_main
@@ -249,14 +190,14 @@ def Art_Dec(Hdl_Var, arti_list, raw, st, mod1, mod2, mod2_name, auto=False):
 
     # Save the figure
     eeg_plot.tight_layout()
-    savefig(EAVizConfig.AddressConfig.get_ad_adr('res'), format='png', dpi=300)
-    close()
+    eeg_plot.savefig(EAVizConfig.AddressConfig.get_ad_adr('res'), format='png', dpi=300)
+    close(eeg_plot)
 
     annotations_list = []
     if auto:
         if len(merged_annotations.onset) > 0:
             for onset, duration, des in zip(merged_annotations.onset, merged_annotations.duration,
                                             merged_annotations.description):
-                annotations_list.append([onset, duration, des])
+                annotations_list.append([onset + raw.first_time, duration, des])
 
     return annotations_list, des_list
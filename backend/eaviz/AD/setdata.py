@@ -1,22 +1,23 @@
-from torch import from_numpy, stack
+from numpy import asarray, ascontiguousarray, float32, float64
+from torch import from_numpy
 from config.env import EAVizConfig
 
 
-def dataset(data):
-    # 对data做z-score标准化后转换为Tensor并还原回原始维度
-    s_data_list = []
-    for t in range(data.shape[0]):
-        slice_data = data[t]  # 提取时间点 t 的二维子数组  (10,1000)
-        processed_data = norm(slice_data)  # 调用 norm 函数处理二维子数组
-        s_data_list.append(from_numpy(processed_data))  # 将处理后的数据添加到列表中 Tensor
-    s_data = stack(s_data_list)  # 在第一维度对list内的张量进行堆叠 二—>三维 (11,10,1000)
-    return s_data
+def dataset(data, mean=None, std=None):
+    # 对data做z-score标准化后转换为Tensor（一次广播运算，支持任意批量维度）
+    # mean/std 为 None 时使用 ADConfig 中固定的统计量
+    # data: (..., 通道数, 采样点数)，如 (11,10,1000) 或多个窗口 (N,11,10,1000)
+    # 返回连续存储的 float32 Tensor，可直接送入分类器
+    s_data = norm(data, mean, std)
+    return from_numpy(ascontiguousarray(s_data, dtype=float32))
 
 
-def norm(slice_data):
+def norm(data, mean=None, std=None):
     cfg = EAVizConfig.ADConfig
+    mean = cfg.MEAN if mean is None else mean
+    std = cfg.STD if std is None else std
 
-    # z-score标准化
-    for i in range(slice_data.shape[0]):
-        slice_data[i] = (slice_data[i] - cfg.MEAN[i]) / cfg.STD[i]
-    return slice_data
+    # z-score标准化（按 float64 计算，与逐通道计算的结果一致）
+    mean = asarray(mean, dtype=float64)[:, None]  # (通道数,1)
+    std = asarray(std, dtype=float64)[:, None]
+    return (asarray(data, dtype=float64) - mean) / std
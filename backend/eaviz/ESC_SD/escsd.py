@@ -1,7 +1,16 @@
-from torch import tensor
+from glob import glob
+from json import dump, load
+from numpy import arange, stack
+from os import listdir, makedirs, path, utime
+from shutil import rmtree
+from time import time
+from torch import tensor, inference_mode
+from torch.nn.functional import softmax
+from config.env import EAVizConfig
 from eaviz.ESC_SD.offline_process import *
 from eaviz.ESC_SD.plot_result import plot_sd_res, plot_esc_res
 from utils.edf_util import EdfUtil
+from utils.log_util import logger
 
 
 class ESCSD:
@@ -22,25 +31,39 @@ class ESCSD:
         return raw
 
     @classmethod
-    def esc(cls, raw, model, start_time):
+    def esc(cls, raw, model, start_time, render=False, key=None):
+        """
+        :param render: 是否绘制特征图/STFT/结果图（绘图耗时往往高于推理，默认只返回预测结果）
+        :param key: 结果图的缓存键，为 None 时保存到共享路径
+        :return: dict(type_labels, type)
+        """
         raw = cls.preprocess(raw, start_time)
 
         stft_buffer, power, _ = get_stft_feature(raw)
         out, feature_map = model(stft_buffer)
 
-        # feature map
-        layer_label = ['input', 'conv1', 'conv2', 'conv3', 'conv4', 'conv5']
-        feature_map.insert(0, stft_buffer)
-        plot_feature_map('ESC', layer_label, feature_map)
+        if render:
+            # feature map
+            layer_label = ['input', 'conv1', 'conv2', 'conv3', 'conv4', 'conv5']
+            feature_map.insert(0, stft_buffer)
+            plot_feature_map('ESC', layer_label, feature_map, key)
 
-        # feature
-        plot_feature('ESC', power[2])  # 只取索引为2用于绘图
+            # feature
+            plot_feature('ESC', power[2], key)  # 只取索引为2用于绘图
 
-        # result
-        plot_esc_res(out)
+            # result
+            plot_esc_res(out, key)
+
+        return dict(type_labels=EAVizConfig.ESCSDConfig.ESC_LABELS,
+                    type=softmax(out.detach()[0], dim=0).tolist())
 
     @classmethod
-    def sd(cls, raw, model, start_time):
+    def sd(cls, raw, model, start_time, render=False, key=None):
+        """
+        :param render: 是否绘制特征图/STFT/结果图（绘图耗时往往高于推理，默认只返回预测结果）
+        :param key: 结果图的缓存键，为 None 时保存到共享路径
+        :return: dict(type_labels, state_labels, type, state)
+        """
         raw = cls.preprocess(raw, start_time)
 
         # tmp3
@@ -53,14 +76,168 @@ class ESCSD:
 
         out1, out2, feature_map = model(tmp1, tmp3)
 
-        # feature map
-        layer_label = ['input', 'conv1', 'block1', 'block2', 'block3', 'block4']
-        feature_map.insert(0, tmp3)
-        plot_feature_map('SD', layer_label, feature_map)
+        if render:
+            # feature map
+            layer_label = ['input', 'conv1', 'block1', 'block2', 'block3', 'block4']
+            feature_map.insert(0, tmp3)
+            plot_feature_map('SD', layer_label, feature_map, key)
+
+            # feature
+            plot_feature('SD', power[2], key)
+            plot_sd_res(out1, out2, key)
+
+        return dict(type_labels=EAVizConfig.ESCSDConfig.SD_TYPE_LABELS,
+                    state_labels=EAVizConfig.ESCSDConfig.SD_STATE_LABELS,
+                    type=softmax(out1.detach()[0], dim=0).tolist(),
+                    state=softmax(out2.detach()[0], dim=0).tolist())
+
+    @staticmethod
+    def get_adr(model_name, name, key=None):
+        if model_name == 'DSMN-ESS':
+            return EAVizConfig.AddressConfig.get_sd_adr(name, key)
+        return EAVizConfig.AddressConfig.get_esc_adr(name, key)
+
+    @staticmethod
+    def make_cache_key(edf_id, start_time, model_name):
+        return f'{edf_id}_{start_time:g}_{model_name}'
+
+    @classmethod
+    def load_cached_result(cls, model_name, key, render=False):
+        """
+        读取缓存的预测结果；需要结果图而缓存中没有时返回 None
+        """
+        result_path = cls.get_adr(model_name, 'result', key)
+        if not path.exists(result_path):
+            return None
+        if render and not all(path.exists(cls.get_adr(model_name, name, key)) for name in ('fm', 'stft', 'res')):
+            return None
+        try:
+            with open(result_path, 'r', encoding='utf-8') as f:
+                result = load(f)
+            utime(result_path)  # 以 result.json 的 mtime 作为最近使用时间
+            return result
+        except (OSError, ValueError):
+            return None
 
-        # feature
-        plot_feature('SD', power[2])
-        plot_sd_res(out1, out2)
+    @classmethod
+    def analyse(cls, raw, model, model_name, start_time, render=False, key=None):
+        """
+        分析单个窗口并缓存预测结果（及结果图）
+        """
+        makedirs(path.dirname(cls.get_adr(model_name, 'result', key)), exist_ok=True)
+        if model_name == 'DSMN-ESS':
+            result = cls.sd(raw, model, start_time, render, key)
+        else:
+            result = cls.esc(raw, model, start_time, render, key)
+        with open(cls.get_adr(model_name, 'result', key), 'w', encoding='utf-8') as f:
+            dump(result, f)
+        cls.evict_cache()
+        return result
+
+    @staticmethod
+    def evict_cache():
+        """
+        淘汰超过 ESCSDConfig.CACHE_MAX_AGE_SECONDS 未使用的缓存项，超出 CACHE_MAX_BYTES 时再按最近使用时间淘汰
+        """
+        cfg = EAVizConfig.ESCSDConfig
+        entries = []
+        for model_name in EAVizConfig.ModelConfig.ESC_SD_MODEL:
+            cache_root = path.dirname(path.dirname(ESCSD.get_adr(model_name, 'result', 'key')))
+            if not path.isdir(cache_root):
+                continue
+            for entry in listdir(cache_root):
+                entry_dir = path.join(cache_root, entry)
+                try:
+                    size = sum(path.getsize(path.join(entry_dir, name)) for name in listdir(entry_dir))
+                    entries.append((path.getmtime(ESCSD.get_adr(model_name, 'result', entry)), size, entry_dir))
+                except OSError:  # 正在写入（尚无 result.json）或已被并发的请求删除
+                    continue
+        total = sum(size for _, size, _ in entries)
+        expire_time = time() - cfg.CACHE_MAX_AGE_SECONDS
+        for mtime, size, entry_dir in sorted(entries):
+            if mtime >= expire_time and total <= cfg.CACHE_MAX_BYTES:
+                break
+            rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            logger.info(f'ESC/SD 结果缓存已淘汰: {entry_dir}')
+
+    @staticmethod
+    def remove_cache(edf_id):
+        """
+        删除某个edf的所有缓存结果（edf被删除时调用）
+        """
+        for model_name in EAVizConfig.ModelConfig.ESC_SD_MODEL:
+            cache_root = path.dirname(path.dirname(ESCSD.get_adr(model_name, 'result', 'key')))
+            for entry in glob(path.join(cache_root, f'{edf_id}_*')):
+                rmtree(entry, ignore_errors=True)
+
+    @staticmethod
+    def scan(raw, model, model_name, start_time=None, stop_time=None, stride=None, batch_size=None,
+             merge_events=True, threshold=None):
+        """
+        整段扫描：对 [start_time, stop_time) 只滤波一次，按 stride 滑动 4s 窗口，分批送入模型
+        :param raw: 未加载数据的 raw（21 通道）
+        :param model_name: 'R3DClassifier'（ESC）| 'DSMN-ESS'（SD）
+        :return: dict(windows=[{start, probs...}], events=[{start, stop, label, prob}])
+        """
+        cfg = EAVizConfig.ESCSDConfig
+        dur = EAVizConfig.ModelConfig.ESC_SD_DURATION
+        stride = stride or cfg.SCAN_STRIDE
+        batch_size = batch_size or cfg.SCAN_BATCH_SIZE
+        threshold = cfg.SEIZURE_THRESHOLD if threshold is None else threshold
+        sfreq = raw.info['sfreq']
+        t_max = raw.times[-1]
+        start_time = 0 if start_time is None else start_time
+        stop_time = t_max + 1 / sfreq if stop_time is None else stop_time
+
+        starts = arange(start_time, stop_time - dur + 1e-9, stride)
+        if len(starts) == 0:
+            raise ValueError(f'扫描范围不足一个窗口（{dur}s）')
+        if len(starts) > cfg.SCAN_MAX_WINDOWS:
+            raise ValueError(f'窗口数 {len(starts)} 超过上限 {cfg.SCAN_MAX_WINDOWS}，请增大步长或缩小扫描范围')
+
+        # 一次性读取并滤波整个扫描范围（前后带 margin）
+        crop_start = max(start_time - cfg.SCAN_MARGIN, 0)
+        raw.crop(tmin=crop_start, tmax=min(stop_time + cfg.SCAN_MARGIN, t_max))
+        raw.load_data()
+        raw = EdfUtil.normal_filter(raw)
+        data = raw.get_data() * 10 ** 6  # (21, n_times) 微伏
+        win = int(round(dur * sfreq))
+        offsets = ((starts - crop_start) * sfreq).round().astype('int64')
+
+        device = next(model.parameters()).device
+        windows = []
+        with inference_mode():
+            for i in range(0, len(starts), batch_size):
+                batch = stack([data[:, o:o + win] for o in offsets[i:i + batch_size]])  # (B,21,4000)
+                n_batch, n_ch = batch.shape[:2]
+                power = abs(time_frequency.stft(batch.reshape(n_batch * n_ch, win), 200, verbose=False))[:, 0:16, :]
+                # 各通道独立归一化，可将所有窗口的通道合并后一次计算
+                stft = stft_to_buffer(power).reshape(3, n_batch, n_ch, 32, 32).permute(1, 0, 2, 3, 4).to(device)
+
+                if model_name == 'DSMN-ESS':
+                    signal = tensor(batch.transpose((0, 2, 1)).astype('float32')).to(device)  # (B,4000,21)
+                    out1, out2, _ = model(signal, stft)
+                    probs = [dict(type=softmax(p1, dim=0).tolist(), state=softmax(p2, dim=0).tolist())
+                             for p1, p2 in zip(out1.cpu(), out2.cpu())]
+                else:
+                    out, _ = model(stft)
+                    probs = [dict(type=softmax(p, dim=0).tolist()) for p in out.cpu()]
+                for t, p in zip(starts[i:i + batch_size], probs):
+                    windows.append(dict(start=round(float(t), 6), **p))
+
+        result = dict(duration=dur, stride=stride, sfreq=sfreq, windows=windows)
+        if model_name == 'DSMN-ESS':
+            result.update(type_labels=cfg.SD_TYPE_LABELS, state_labels=cfg.SD_STATE_LABELS)
+            labels = ['seizure' if w['state'][1] >= threshold else None for w in windows]
+            scores = [w['state'][1] for w in windows]
+        else:
+            result.update(type_labels=cfg.ESC_LABELS)
+            labels = [cfg.ESC_LABELS[max(range(len(w['type'])), key=w['type'].__getitem__)] for w in windows]
+            scores = [max(w['type']) for w in windows]
+        if merge_events:
+            result['events'] = merge_window_events(starts, labels, scores, dur)
+        return result
 
 
 def crop_tactic(raw, start_time, dur):
@@ -86,3 +263,24 @@ def crop_tactic(raw, start_time, dur):
         crop_stop = stop_time + margin
     raw.crop(tmin=crop_start, tmax=crop_stop)
     return raw, start_time - crop_start
+
+
+def merge_window_events(starts, labels, scores, dur):
+    """
+    将相邻（有重叠或首尾相接）且标签相同的窗口合并为事件，标签为 None 的窗口不参与合并
+    :return: [{start, stop, label, prob}]，prob 为事件内各窗口得分的最大值
+    """
+    events = []
+    for t, label, score in zip(starts, labels, scores):
+        if label is None:
+            continue
+        t = float(t)
+        last = events[-1] if events else None
+        if last and last['label'] == label and t <= last['stop'] + 1e-9:
+            last['stop'] = t + dur
+            last['prob'] = max(last['prob'], score)
+        else:
+            events.append(dict(start=t, stop=t + dur, label=label, prob=score))
+    for event in events:
+        event['start'], event['stop'] = round(event['start'], 6), round(event['stop'], 6)
+    return events
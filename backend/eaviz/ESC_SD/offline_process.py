@@ -1,28 +1,37 @@
 from io import BytesIO
 from cv2 import imdecode, IMREAD_COLOR, resize
 from mne import time_frequency
-from numpy import asarray, uint8, squeeze, transpose, flipud
+from numpy import arange, asarray, uint8, squeeze, transpose, flipud
 from seaborn import heatmap
 from torchvision.transforms import transforms
-from matplotlib.pyplot import subplot, figure, imshow, title, xlabel, colorbar, axis, tight_layout, savefig, close, \
-    xticks, ylabel, yticks
-from torch import float32, empty
+from matplotlib import colormaps
+from matplotlib.pyplot import figure, subplots, close, setp
+from torch import float32, empty, from_numpy
+from torch.nn.functional import interpolate
 from config.env import EAVizConfig
 
+# 与原先 seaborn 热力图渲染一致的各级图像尺寸：热力图 256x256 -> cv2.resize 112x112 -> transforms.Resize 32x32
+STFT_IMAGE_SIZE = 256
+STFT_RESIZE_SIZE = 112
+STFT_INPUT_SIZE = 32
+# jet 颜色表（matplotlib 默认 256 级），按 BGR 顺序排列（原先经 cv2.imdecode 解码得到的是 BGR 图像）
+STFT_JET_LUT_BGR = colormaps['jet'](arange(256), bytes=True)[:, 2::-1].copy()
 
-def plot_feature_map(item_name, layer_label, feature_map):
+
+def plot_feature_map(item_name, layer_label, feature_map, key=None):
     """
     Plot the feature map results of each convolutional layer during the detection process to show.
     :param item_name: the name of the item (ESC/SD)
     :param layer_label: list of each layer
     :param feature_map: list[list] of the result of each layer
+    :param key: cache key of the result (None: save to the shared path)
     """
     text_size = 20
     font_family = "Microsoft YaHei"
 
-    figure(figsize=(12, 8))
+    fig = figure(figsize=(12, 8))
     for i in range(len(layer_label)):
-        ax = subplot(2, 3, i + 1)
+        ax = fig.add_subplot(2, 3, i + 1)
         im = feature_map[i]
         # [N, C, D, H, W] -> [C, D, H, W] 将batch维度压缩掉，detach阻断反向梯度传播
         # Batch C（RGB通道） D（EEG通道） H（时间） W（频率）
@@ -35,30 +44,31 @@ def plot_feature_map(item_name, layer_label, feature_map):
         # (6, 5, 5, 128)
         # (3, 3, 3, 256)
         # (2, 2, 2, 512)
-        imshow(flipud(im[1, :, :, 1]), origin='lower')  # 垂直翻转图像数据再与y轴一起翻转
-        title(f'{layer_label[i]}', fontproperties=font_family, fontsize=text_size)
+        ax.imshow(flipud(im[1, :, :, 1]), origin='lower')  # 垂直翻转图像数据再与y轴一起翻转
+        ax.set_title(f'{layer_label[i]}', fontproperties=font_family, fontsize=text_size)
         # y轴已在get_stft_feature中经过了翻转，此处不需要再翻转
 
         # 设置坐标轴字体大小
-        xticks(fontsize=text_size, rotation=20)  # x轴刻度字体大小
-        yticks(fontsize=text_size)  # y轴刻度字体大小
+        setp(ax.get_xticklabels(), fontsize=text_size, rotation=20)  # x轴刻度字体大小
+        setp(ax.get_yticklabels(), fontsize=text_size)  # y轴刻度字体大小
 
-    tight_layout()
+    fig.tight_layout()
     if item_name == 'SD':
-        savefig(EAVizConfig.AddressConfig.get_sd_adr('fm'), format='png', dpi=300)
+        fig.savefig(EAVizConfig.AddressConfig.get_sd_adr('fm', key), format='png', dpi=300)
     elif item_name == 'ESC':
-        savefig(EAVizConfig.AddressConfig.get_esc_adr('fm'), format='png', dpi=300)
-    close()
+        fig.savefig(EAVizConfig.AddressConfig.get_esc_adr('fm', key), format='png', dpi=300)
+    close(fig)
 
 
-def plot_feature(item_name, power_slice):
+def plot_feature(item_name, power_slice, key=None):
     """
     Plot one STFT figure to show.
     :param item_name: the name of the item (ESC/SD)
     :param power_slice: power in one channel
+    :param key: cache key of the result (None: save to the shared path)
     """
-    figure()
-    sns_plot = heatmap(power_slice, cmap='jet', cbar=False)
+    fig, ax = subplots()
+    sns_plot = heatmap(power_slice, cmap='jet', cbar=False, ax=ax)
     sns_plot.invert_yaxis()  # 反转Y轴坐标，即将最高值置于顶部，最低值置于底部
     # 获取当前的 x 轴刻度位置
     # xtick_positions = sns_plot.get_xticks()
@@ -78,19 +88,19 @@ def plot_feature(item_name, power_slice):
     ytick_labels = [f'{i * 5}' for i in range(len(ytick_positions))]  # 将刻度位置乘以5
     sns_plot.set_yticklabels(ytick_labels)
 
-    xlabel('Time [s]')
-    ylabel('Frequency [Hz]')
+    ax.set_xlabel('Time [s]')
+    ax.set_ylabel('Frequency [Hz]')
 
     # 获取热力图对象的所有子对象，然后找到与热力图相关的映射对象
     mappable = sns_plot.get_children()[0]
-    cbar = colorbar(mappable, label='Magnitude')
+    cbar = fig.colorbar(mappable, ax=ax, label='Magnitude')
     cbar.outline.set_visible(False)
 
     if item_name == 'SD':
-        savefig(EAVizConfig.AddressConfig.get_sd_adr('stft'), format='png', dpi=300)
+        fig.savefig(EAVizConfig.AddressConfig.get_sd_adr('stft', key), format='png', dpi=300)
     elif item_name == 'ESC':
-        savefig(EAVizConfig.AddressConfig.get_esc_adr('stft'), format='png', dpi=300)
-    close()
+        fig.savefig(EAVizConfig.AddressConfig.get_esc_adr('stft', key), format='png', dpi=300)
+    close(fig)
 
 
 def get_stft_feature(raw):
@@ -130,39 +140,7 @@ def get_stft_feature(raw):
     # plt.colorbar(label='Magnitude')
     # plt.savefig('./STFT_3.png')
 
-    # A3D-EEG_epoch-1.pth.tar  (64,1,3,7,7) - input: input[1, 1, 21, 32, 32]
-    # A3D-EEG_epoch-19.pth.tar (64,3,3,7,7) - input: input[1, 3, 21, 32, 32]
-    # 预处理
-    guiyihua = transforms.ToTensor()
-    suofang = transforms.Resize([32, 32])
-    # zuhe
-    zuhe_transform = transforms.Compose([  # 定义一个预处理方法组合
-        transforms.ToPILImage(),  # 将样本数据张量转换为PIL图像，以便使用PIL库进行图像处理
-        suofang,  # 按照比例把图像最小的一个边长放缩到32，另一边按照相同比例放缩。
-        guiyihua,  # 转换为tensor格式，这个格式可以直接输入进神经网络了
-    ])
-
-    stft_buffer = empty((21, 3, 32, 32), dtype=float32)
-    for i in range(21):
-        figure(figsize=(256 / 80, 256 / 80))
-        # plt.pcolormesh(times, frequencies[0:16], Zxx[i], shading='auto', cmap='jet')
-        sns_plot = heatmap(power[i], cmap='jet', cbar=False)
-        sns_plot.invert_yaxis()  # 反转Y轴坐标，即将最高值置于顶部，最低值置于底部
-        buffer = BytesIO()
-        axis('off')
-        tight_layout(pad=0)
-        savefig(buffer, format='png', dpi=80)
-        buffer.seek(0)
-        # 从内存缓冲区读取数据 —> 将数据转换为字节数组 —> 转换为 NumPy 数组 —> 从这些字节数据中解码出图像
-        im_data = imdecode(asarray(bytearray(buffer.read()), dtype=uint8), IMREAD_COLOR)  # (256,256,3)
-        im_data_resized = resize(im_data, (112, 112))  # (112,112,3)
-        close()
-        im_data = zuhe_transform(im_data_resized)  # (3,32,32)
-        # im_data = im_data.numpy()  # (3,32,32)
-        stft_buffer[i] = im_data
-    # stft_buffer = stft_buffer.transpose((1, 0, 2, 3))
-    # stft_buffer = tensor(stft_buffer.astype('float32')).reshape(1, 3, 21, 32, 32)
-    stft_buffer = stft_buffer.permute(1, 0, 2, 3).unsqueeze(0)  # tensor (1,3,21,32,32)
+    stft_buffer = stft_to_buffer(power)  # tensor (1,3,21,32,32)
 
     # 1
     # img = img.reshape(1, 1, 21, 32, 32)
@@ -191,3 +169,76 @@ def get_stft_feature(raw):
     #     total_img[i, :, :, :] = img.numpy()  # (21,32,32)
     # total_img = total_img.transpose((1, 0, 2, 3))
     # return total_img
+
+
+def stft_to_buffer(power):
+    """
+    直接由 STFT 幅值计算模型输入（数值方式复现原先的 seaborn 热力图 -> PNG -> 缩放 流程，不经过 matplotlib 渲染，可并发调用）：
+    每个通道按自身最小/最大值归一化后查 jet 颜色表（BGR）-> 最近邻放大为 256x256（低频在下）
+    -> 双线性缩放到 112x112（同 cv2.resize）-> 抗锯齿双线性缩放到 32x32（同 PIL）-> 除以 255
+    :param power: STFT 幅值 (通道，频率点，时间点)
+    :return: tensor (1,3,通道,32,32)
+    """
+    n_ch, n_freq, n_time = power.shape
+    p_min = power.min(axis=(1, 2), keepdims=True)
+    p_range = power.max(axis=(1, 2), keepdims=True) - p_min
+    p_range[p_range == 0] = 1  # 常数通道归一化后全为 0，与 matplotlib Normalize 一致
+    lut_size = len(STFT_JET_LUT_BGR)
+    idx = ((power - p_min) / p_range * lut_size).astype('int64').clip(0, lut_size - 1)
+
+    # 热力图经 invert_yaxis 后低频在下，因此行方向先翻转；每个单元格按像素中心最近邻填充
+    pixel = arange(STFT_IMAGE_SIZE) + 0.5
+    rows = (pixel * n_freq / STFT_IMAGE_SIZE).astype('int64')
+    cols = (pixel * n_time / STFT_IMAGE_SIZE).astype('int64')
+    idx = idx[:, ::-1, :][:, rows][:, :, cols]  # (通道,256,256)
+    image = from_numpy(STFT_JET_LUT_BGR[idx]).permute(0, 3, 1, 2).to(float32)  # (通道,3,256,256)
+
+    image = interpolate(image, size=(STFT_RESIZE_SIZE, STFT_RESIZE_SIZE), mode='bilinear', align_corners=False)
+    image = image.round().clamp(0, 255)
+    image = interpolate(image, size=(STFT_INPUT_SIZE, STFT_INPUT_SIZE), mode='bilinear', align_corners=False,
+                        antialias=True)
+    image = image.round().clamp(0, 255) / 255
+    return image.permute(1, 0, 2, 3).unsqueeze(0).contiguous()
+
+
+def stft_to_buffer_by_heatmap(power):
+    """
+    原先基于 seaborn 热力图渲染的实现（每个通道渲染一张 PNG，较慢），保留用于与 stft_to_buffer 比对
+    :param power: STFT 幅值 (通道，频率点，时间点)
+    :return: tensor (1,3,通道,32,32)
+    """
+    # A3D-EEG_epoch-1.pth.tar  (64,1,3,7,7) - input: input[1, 1, 21, 32, 32]
+    # A3D-EEG_epoch-19.pth.tar (64,3,3,7,7) - input: input[1, 3, 21, 32, 32]
+    # 预处理
+    guiyihua = transforms.ToTensor()
+    suofang = transforms.Resize([32, 32])
+    # zuhe
+    zuhe_transform = transforms.Compose([  # 定义一个预处理方法组合
+        transforms.ToPILImage(),  # 将样本数据张量转换为PIL图像，以便使用PIL库进行图像处理
+        suofang,  # 按照比例把图像最小的一个边长放缩到32，另一边按照相同比例放缩。
+        guiyihua,  # 转换为tensor格式，这个格式可以直接输入进神经网络了
+    ])
+
+    stft_buffer = empty((power.shape[0], 3, 32, 32), dtype=float32)
+    for i in range(power.shape[0]):
+        fig, ax = subplots(figsize=(256 / 80, 256 / 80))
+        # plt.pcolormesh(times, frequencies[0:16], Zxx[i], shading='auto', cmap='jet')
+        sns_plot = heatmap(power[i], cmap='jet', cbar=False, ax=ax)
+        sns_plot.invert_yaxis()  # 反转Y轴坐标，即将最高值置于顶部，最低值置于底部
+        buffer = BytesIO()
+        ax.axis('off')
+        fig.tight_layout(pad=0)
+        fig.savefig(buffer, format='png', dpi=80)
+        buffer.seek(0)
+        # 从内存缓冲区读取数据 —> 将数据转换为字节数组 —> 转换为 NumPy 数组 —> 从这些字节数据中解码出图像
+        im_data = imdecode(asarray(bytearray(buffer.read()), dtype=uint8), IMREAD_COLOR)  # (256,256,3)
+        im_data_resized = resize(im_data, (112, 112))  # (112,112,3)
+        close(fig)
+        im_data = zuhe_transform(im_data_resized)  # (3,32,32)
+        # im_data = im_data.numpy()  # (3,32,32)
+        stft_buffer[i] = im_data
+    # stft_buffer = stft_buffer.transpose((1, 0, 2, 3))
+    # stft_buffer = tensor(stft_buffer.astype('float32')).reshape(1, 3, 21, 32, 32)
+    stft_buffer = stft_buffer.permute(1, 0, 2, 3).unsqueeze(0)  # tensor (1,3,21,32,32)
+    return stft_buffer
+
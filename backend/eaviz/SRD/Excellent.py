@@ -4,7 +4,7 @@ from torch.nn.init import xavier_uniform_, zeros_, ones_
 from eaviz.SRD.modules import getESDFeature, getDEFeature, getPsdFeature, getPsdValue
 from eaviz.SRD.timFeature import downSample, SEBasicBlock, makeLayer
 from eaviz.SRD.Attention0 import TransformerAEClassifier
-from scipy.signal import butter, filtfilt
+from utils.filter_util import FilterUtil
 
 device = device("cuda" if cuda.is_available() else "cpu")
 
@@ -21,18 +21,8 @@ class NLEO(Module):
         return nleo
 
 
-def butter_bandpass(lowcut, highcut, fs, order=5):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    b, a = butter(order, [low, high], btype='band')
-    return b, a
-
-
 def bandpass_filter(data, lowcut=1.0, highcut=70.0, fs=1000, order=2):
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = filtfilt(b, a, data, axis=-1)
-    return y
+    return FilterUtil.filtfilt_ba(data, order, (lowcut, highcut), fs, 'bandpass')
 
 
 def pad_signal(signal, pad_length=1):
@@ -62,6 +62,32 @@ def merged(raw, predicted_data, start_time):
     return raw
 
 
+class HfoMerger:
+    """
+    merged 的增量版本：按顺序推入预测为 1 的窗口序号，跨分块仍未结束的区间保存在状态中
+    依次收集 push 返回的区间及最后 flush 的区间，结果与 merged 得到的标注一致
+    """
+
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.current = None
+
+    def push(self, n):
+        """
+        :return: 因当前窗口不重叠而结束的区间 [start, end]，否则为 None
+        """
+        start, end = 0.05 * n + self.start_time, 0.05 * n + 0.1 + self.start_time
+        if self.current is not None and self.current[1] >= start:
+            self.current[1] = end
+            return None
+        closed, self.current = self.current, [start, end]
+        return closed
+
+    def flush(self):
+        closed, self.current = self.current, None
+        return closed
+
+
 def get_bias(high_data):
     mean_val = mean(high_data)
     std_val = std(high_data)
@@ -2,8 +2,8 @@ from torch import device, from_numpy, stack, tensor, float32
 from torch.nn import Module, AdaptiveAvgPool1d, Sequential, Linear, ReLU, Sigmoid, Conv1d, BatchNorm1d, MaxPool1d
 from torch.nn.init import xavier_uniform_, zeros_, ones_
 from scipy.signal import welch
-from scipy import signal
 from numpy import ndarray, finfo, where, log, mean, trapz
+from utils.filter_util import FilterUtil
 
 
 class psdWeight(Module):
@@ -109,9 +109,6 @@ class getPsdFeature(Module):
         torch.Tensor: 通过卷积神经网络后的输出特征。
         """
         order_r = 12  # 滤波器阶数
-        nyq = 0.5 * self.fs  # 奈奎斯特频率
-        # 设计带通巴特沃斯滤波器
-        c, d = signal.butter(order_r, [self.lowFr / nyq, self.higFr / nyq], btype='bandpass')
 
         # 将输入张量重塑为二维数组（batch_size, num_samples）
         x = x.view(-1, x.shape[-1])
@@ -122,18 +119,11 @@ class getPsdFeature(Module):
         assert isinstance(x, ndarray), "x应该是NumPy ndarray"
 
         # 对输入信号应用带通滤波器
-        x = signal.filtfilt(c, d, x)
+        x = FilterUtil.filtfilt_ba(x, order_r, (self.lowFr, self.higFr), self.fs, 'bandpass')
 
-        all_Pxx = []  # 用于存储功率谱密度的列表
-        for data in x:
-            # 使用Welch方法计算功率谱密度
-            _, Pxx = welch(data, fs=self.fs, nperseg=self.nperseg)
-            # 将功率谱密度转换为PyTorch张量
-            Pxx_tensor = from_numpy(Pxx).float().to(self.device)
-            all_Pxx.append(Pxx_tensor)
-
-        # 将所有功率谱密度张量堆叠成一个张量
-        all_Pxx = stack(all_Pxx)
+        # 使用Welch方法对所有信号一次性计算功率谱密度，并转换为PyTorch张量
+        _, Pxx = welch(x, fs=self.fs, nperseg=self.nperseg, axis=-1)
+        all_Pxx = from_numpy(Pxx).float().to(self.device)
         all_Pxx = all_Pxx.unsqueeze(1)  # 添加一个通道维度
         x = self.features1(all_Pxx)  # 将张量传递通过卷积神经网络
 
@@ -176,12 +166,7 @@ class getDEFeature(Module):
         返回:
         - de_features: 提取的DE特征，形状为(batch_size, 1)。
         """
-        # 定义滤波器的阶数和奈奎斯特频率
         order_r = 12  # 滤波器阶数
-        nyq = 0.5 * self.fs  # 奈奎斯特频率
-
-        # 设计带通巴特沃斯滤波器
-        c, d = signal.butter(order_r, [self.lowFr / nyq, self.higFr / nyq], btype='bandpass')
 
         # 调整输入信号的形状，准备进行滤波
         x = x.view(-1, x.shape[-1])
@@ -194,7 +179,7 @@ class getDEFeature(Module):
         assert isinstance(x, ndarray), "x应该是NumPy ndarray"
 
         # 应用带通滤波器
-        x = signal.filtfilt(c, d, x, axis=-1)
+        x = FilterUtil.filtfilt_ba(x, order_r, (self.lowFr, self.higFr), self.fs, 'bandpass')
 
         # 初始化存储差分熵的列表
         de_features = []
@@ -242,9 +227,6 @@ class getPsdValue(Module):
 
     def forward(self, x):
         order_r = 12  # 滤波器阶数
-        nyq = 0.5 * self.fs  # 奈奎斯特频率
-        # 设计带通巴特沃斯滤波器
-        c, d = signal.butter(order_r, [self.lowFr / nyq, self.higFr / nyq], btype='bandpass')
 
         # 将输入张量重塑为二维数组（batch_size, num_samples）
         x = x.view(-1, x.shape[-1])
@@ -255,7 +237,7 @@ class getPsdValue(Module):
         assert isinstance(x, ndarray), "x应该是NumPy ndarray"
 
         # 对输入信号应用带通滤波器
-        x = signal.filtfilt(c, d, x)
+        x = FilterUtil.filtfilt_ba(x, order_r, (self.lowFr, self.higFr), self.fs, 'bandpass')
 
         all_avg_Pxx = []  # 用于存储平均功率谱密度的列表
         for data in x:
@@ -308,12 +290,7 @@ class getESDFeature(Module):
         返回:
         - esd_features: 提取的ESD特征，形状为(batch_size, 1)。
         """
-        # 定义滤波器的阶数和奈奎斯特频率
         order_r = 12  # 滤波器阶数
-        nyq = 0.5 * self.fs  # 奈奎斯特频率
-
-        # 设计带通巴特沃斯滤波器
-        c, d = signal.butter(order_r, [self.lowFr / nyq, self.higFr / nyq], btype='bandpass')
 
         # 调整输入信号的形状，准备进行滤波
         x = x.view(-1, x.shape[-1])
@@ -326,7 +303,7 @@ class getESDFeature(Module):
         assert isinstance(x, ndarray), "x应该是NumPy ndarray"
 
         # 应用带通滤波器
-        x = signal.filtfilt(c, d, x, axis=-1)
+        x = FilterUtil.filtfilt_ba(x, order_r, (self.lowFr, self.higFr), self.fs, 'bandpass')
 
         # 初始化存储能量谱密度的列表
         esd_features = []
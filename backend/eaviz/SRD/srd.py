@@ -1,5 +1,70 @@
 from json import dumps
-from eaviz.SRD.hfo import preprocess, predicted, merged, get_bias
+from numpy import arange, array, stack
+from time import perf_counter
+from config.env import EAVizConfig, EdfCacheConfig
+from eaviz.SRD.hfo import predicted, get_bias, HfoMerger
+from utils.common_util import data2stream_frame
+from utils.edf_cache_util import EdfFilterCache, RawEdfSidecar
+from utils.edf_util import EdfUtil
+from utils.log_util import logger
+
+
+class SrdWindowReader:
+    """
+    按时间顺序读取 SRD 的三路滤波结果：notch（两次 50Hz 陷波，分类及原始数据流使用）、low（1-70Hz）、high（80-450Hz）
+
+    raw 为 sidecar 且启用滤波缓存时直接从 EdfFilterCache 读取所请求的样本（缓存与整段滤波一致，无需再带 margin）；
+    否则每次滤波 SRDConfig.FILTER_BLOCK 秒（前后带 FILTER_MARGIN）并保留该块，之后落在块内的窗口直接切片
+    """
+    SPECS = {
+        'notch': EdfUtil.SRD_NOTCH_FILTER_SPEC,
+        'low': EdfUtil.NORMAL_FILTER_SPEC,
+        'high': EdfUtil.HFO_FILTER_SPEC
+    }
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sfreq = raw.info['sfreq']
+        self.use_cache = EdfCacheConfig.FILTER_CACHE_ENABLED and isinstance(raw, RawEdfSidecar)
+        self.block_start = self.block_stop = 0
+        self.block = {}
+
+    def read(self, start: int, stop: int):
+        """
+        :return: {'notch': ..., 'low': ..., 'high': ...}，每路为 [start, stop) 内的滤波结果（V），(n_channels, stop - start)
+        """
+        if self.use_cache:
+            try:
+                offset = self.raw.first_samp
+                return {name: EdfFilterCache.get_data(self.raw.edf_path, self.raw.ch_names, spec,
+                                                      offset + start, offset + stop)
+                        for name, spec in self.SPECS.items()}
+            except Exception as e:
+                logger.warning(f'EDF 滤波缓存不可用，按块滤波: {self.raw.edf_path}. Error info: {str(e)}')
+                self.use_cache = False
+
+        if start < self.block_start or stop > self.block_stop:
+            self.fill(start, stop)
+        local = slice(start - self.block_start, stop - self.block_start)
+        return {name: data[:, local] for name, data in self.block.items()}
+
+    def fill(self, start: int, stop: int):
+        """
+        滤波从 start 开始的一块（至少覆盖到 stop），前后多读取 FILTER_MARGIN 秒以与整段滤波一致
+        """
+        n_times = self.raw.n_times
+        margin = int(EAVizConfig.SRDConfig.FILTER_MARGIN * self.sfreq)
+        self.block_start = start
+        self.block_stop = min(max(stop, start + int(EAVizConfig.SRDConfig.FILTER_BLOCK * self.sfreq)), n_times)
+        read_start, read_stop = max(self.block_start - margin, 0), min(self.block_stop + margin, n_times)
+        # 以滤波链的前缀为键，三路共用的第一次 50Hz 陷波只计算一次
+        filtered = {(): self.raw.get_data(start=read_start, stop=read_stop)}
+        for spec in self.SPECS.values():
+            for i in range(1, len(spec) + 1):
+                if spec[:i] not in filtered:
+                    filtered[spec[:i]] = EdfFilterCache.apply_spec(filtered[spec[:i - 1]], self.sfreq, spec[i - 1:i])
+        local = slice(self.block_start - read_start, self.block_stop - read_start)
+        self.block = {name: filtered[spec][:, local] for name, spec in self.SPECS.items()}
 
 
 class SRD:
@@ -8,55 +73,55 @@ class SRD:
     """
 
     @staticmethod
-    def stream_srd_data(raw, model, start_time, stop_time, ch_idx, window_size=5.0):
+    def stream_srd_data(raw, model, start_time, stop_time, ch_idx, window_size=5.0, wire_format='json',
+                        dtype='float32', decimation=1):
         """
         流式输出 SRD 数据
-        :param raw: MNE Raw 对象
+
+        按窗口分块处理：每块的滤波结果由 SrdWindowReader 读取（与整段滤波一致），
+        该块分类后立即输出新确定的 HFO（events），再输出该窗口的数据（data），全部处理完后输出所有标注的汇总（summary）
+        :param raw: MNE Raw 对象（可未加载数据，按块读取）
         :param model: 预训练模型
         :param start_time: 开始时间（秒）
         :param stop_time: 结束时间（秒）
         :param ch_idx: 通道索引
         :param window_size: 窗口大小（秒），默认 5 秒
+        :param wire_format: json 每行一个 JSON；framed 为二进制帧（见 data2stream_frame），三路数据以 dtype 传输，
+                            不发送 times（由帧头中的 t0 + i * dt 得到）
+        :param dtype: float32 / int16，仅 framed 格式有效
+        :param decimation: 用于显示的抽取倍数（每 decimation 个样本点取一个），bias 仍按完整数据计算
         :return: 生成器，每次 yield 一个窗口的数据
         """
+        begin_time = perf_counter()
+        first_byte_time = None
         raw.pick(ch_idx)
-        raw.load_data()
-        raw.notch_filter(freqs=50)
+        sfreq = raw.info['sfreq']
+        reader = SrdWindowReader(raw)
 
-        # 创建滤波后的副本
-        raw_low = raw.copy().filter(l_freq=1, h_freq=70)
-        raw_high = raw.copy().filter(l_freq=80, h_freq=450)
+        # HFO 分类窗口：从 start_time 开始，每段 100 个采样点（0.1s），步长 50 个采样点
+        s_idx, e_idx = raw.time_as_index([start_time, stop_time])
+        n_total = max((e_idx - s_idx - 100) // 50 + 1, 0)
+        merger = HfoMerger(start_time)
+        all_annotations = []
 
-        # 处理整个时间段，生成 HFO 标注
-        raw_notch, sliced_data = preprocess(raw, start_time, stop_time)
-        predicted_indices = predicted(model, sliced_data)
-        merged_raw = merged(raw_notch, predicted_indices, start_time)
+        encoded_bytes = 0
+        encode_time = 0.
+        n_frames = 0
 
-        # 获取所有标注
-        all_annotations = []
-        for ann in merged_raw.annotations:
-            all_annotations.append({
-                'onset': float(ann['onset']),
-                'duration': float(ann['duration']),
-                'description': str(ann['description'])
-            })
+        def encode_header_only(line):
+            if wire_format == 'framed':
+                return data2stream_frame(line)
+            return dumps(line).encode('utf-8') + b'\n'
 
-        # 首先发送所有标注的汇总信息，让前端可以先绘制标注区域
-        summary = {
-            'type': 'summary',
-            'totalAnnotations': len(all_annotations),
-            'annotations': all_annotations,
-            'timeRange': {
-                'start': float(start_time),
-                'stop': float(stop_time)
+        def to_annotation(interval):
+            return {
+                'onset': float(interval[0]),
+                'duration': float(interval[1] - interval[0]),
+                'description': 'HFO'
             }
-        }
-        yield dumps(summary).encode('utf-8') + b'\n'
 
-        # 按窗口流式输出数据
+        # 按窗口分块输出
         cur_time = start_time
-        sfreq = raw.info['sfreq']
-
         while cur_time < stop_time:
             window_end = min(cur_time + window_size, stop_time)
 
@@ -65,45 +130,141 @@ class SRD:
             if t_idx[0] >= t_idx[1]:
                 break
 
+            # 本块分类窗口的序号范围（窗口起点落在本块内），分类窗口可能超出本块 100 个采样点
+            n_first = min(-(-(t_idx[0] - s_idx) // 50), n_total)
+            n_last = min(-(-(t_idx[1] - s_idx) // 50), n_total)
+
+            # 读取本块的滤波结果（分类窗口可能超出本块 100 个采样点）
+            filtered = reader.read(t_idx[0], min(t_idx[1] + 100, raw.n_times))
+            notch_data = filtered['notch']
+
+            # 分类本块的窗口并增量合并
+            new_annotations = []
+            if n_last > n_first:
+                offsets = [s_idx + 50 * n - t_idx[0] for n in range(n_first, n_last)]
+                sliced_data = array([notch_data[:, o:o + 100] * 1e6 for o in offsets])  # (m,1,100)
+                for j in predicted(model, sliced_data):
+                    closed = merger.push(n_first + j)
+                    if closed is not None:
+                        new_annotations.append(to_annotation(closed))
+            all_annotations.extend(new_annotations)
+
+            # 先发送本块新确定的标注，让前端可以尽早绘制标注区域
+            encode_start = perf_counter()
+            frame = encode_header_only({
+                'type': 'events',
+                'time': float(window_end),
+                'annotations': new_annotations
+            })
+            encode_time += perf_counter() - encode_start
+            encoded_bytes += len(frame)
+            n_frames += 1
+            first_byte_time = first_byte_time or perf_counter()
+            yield frame
+
             # 提取三个数据流
-            raw_data, raw_times = raw[:, t_idx[0]:t_idx[1]]
-            low_data, low_times = raw_low[:, t_idx[0]:t_idx[1]]
-            high_data, high_times = raw_high[:, t_idx[0]:t_idx[1]]
+            local = slice(0, t_idx[1] - t_idx[0])
+            raw_times = arange(t_idx[0], t_idx[1]) / sfreq  # 同 raw.times 的切片，但不生成整段记录的时间轴
+            low_times = high_times = raw_times
 
             # 转换为微伏
-            raw_data = raw_data * 1e6
-            low_data = low_data * 1e6
-            high_data = high_data * 1e6
+            raw_data = notch_data[:, local] * 1e6
+            low_data = filtered['low'][:, local] * 1e6
+            high_data = filtered['high'][:, local] * 1e6
 
             # 计算 bias（使用当前窗口的高频数据）
             bias_lower, bias_upper = get_bias(high_data[0])
 
-            # 准备窗口数据（不包含标注，标注已通过汇总信息发送）
-            window_data = {
-                'type': 'data',
-                'time': cur_time,
-                'windowSize': window_size,
-                'sfreq': float(sfreq),
-                'raw': {
-                    'times': raw_times.tolist(),
-                    'data': raw_data[0].tolist()
-                },
-                'low': {
-                    'times': low_times.tolist(),
-                    'data': low_data[0].tolist()
-                },
-                'high': {
-                    'times': high_times.tolist(),
-                    'data': high_data[0].tolist()
-                },
-                'bias': {
-                    'lower': float(bias_lower),
-                    'upper': float(bias_upper)
-                }
-            }
+            encode_start = perf_counter()
+            if decimation > 1:
+                raw_times, raw_data = raw_times[::decimation], raw_data[:, ::decimation]
+                low_times, low_data = low_times[::decimation], low_data[:, ::decimation]
+                high_times, high_data = high_times[::decimation], high_data[:, ::decimation]
 
-            # 将数据编码为 JSON 字符串，然后转换为字节
-            json_str = dumps(window_data)
-            yield json_str.encode('utf-8') + b'\n'  # 使用换行符分隔每个窗口
+            # 准备窗口数据（不包含标注，标注已通过 events 发送）
+            if wire_format == 'framed':
+                header = {
+                    'type': 'data',
+                    'time': cur_time,
+                    'windowSize': window_size,
+                    'sfreq': float(sfreq),
+                    'decimation': decimation,
+                    't0': float(raw_times[0]),
+                    'dt': decimation / float(sfreq),
+                    'streams': ['raw', 'low', 'high'],
+                    'bias': {
+                        'lower': float(bias_lower),
+                        'upper': float(bias_upper)
+                    }
+                }
+                frame = data2stream_frame(header, stack([raw_data[0], low_data[0], high_data[0]]), dtype)
+            else:
+                window_data = {
+                    'type': 'data',
+                    'time': cur_time,
+                    'windowSize': window_size,
+                    'sfreq': float(sfreq),
+                    'raw': {
+                        'times': raw_times.tolist(),
+                        'data': raw_data[0].tolist()
+                    },
+                    'low': {
+                        'times': low_times.tolist(),
+                        'data': low_data[0].tolist()
+                    },
+                    'high': {
+                        'times': high_times.tolist(),
+                        'data': high_data[0].tolist()
+                    },
+                    'bias': {
+                        'lower': float(bias_lower),
+                        'upper': float(bias_upper)
+                    }
+                }
+                # 将数据编码为 JSON 字符串，然后转换为字节，使用换行符分隔每个窗口
+                frame = dumps(window_data).encode('utf-8') + b'\n'
+            encode_time += perf_counter() - encode_start
+            encoded_bytes += len(frame)
+            n_frames += 1
+            yield frame
 
             cur_time = window_end
+
+        # 结束仍未关闭的区间
+        closed = merger.flush()
+        if closed is not None:
+            all_annotations.append(to_annotation(closed))
+            encode_start = perf_counter()
+            frame = encode_header_only({
+                'type': 'events',
+                'time': float(stop_time),
+                'annotations': [to_annotation(closed)]
+            })
+            encode_time += perf_counter() - encode_start
+            encoded_bytes += len(frame)
+            n_frames += 1
+            first_byte_time = first_byte_time or perf_counter()
+            yield frame
+
+        # 最后发送所有标注的汇总信息
+        summary = {
+            'type': 'summary',
+            'totalAnnotations': len(all_annotations),
+            'annotations': all_annotations,
+            'timeRange': {
+                'start': float(start_time),
+                'stop': float(stop_time)
+            }
+        }
+        encode_start = perf_counter()
+        frame = encode_header_only(summary)
+        encode_time += perf_counter() - encode_start
+        encoded_bytes += len(frame)
+        n_frames += 1
+        first_byte_time = first_byte_time or perf_counter()
+        yield frame
+
+        logger.info(f'SRD 流式输出（{wire_format}{"/" + dtype if wire_format == "framed" else ""}，'
+                    f'抽取 {decimation}）：{n_frames} 帧，平均 {encoded_bytes / n_frames:.0f} B/帧，'
+                    f'编码 {encode_time / n_frames * 1000:.2f} ms/帧，首帧 {first_byte_time - begin_time:.2f} s，'
+                    f'总耗时 {perf_counter() - begin_time:.2f} s')
@@ -1,6 +1,6 @@
 from os import listdir, path
-from torch import from_numpy, no_grad, argmax
-from numpy import zeros, where, array, load as np_load
+from torch import from_numpy, inference_mode, argmax, float32, tensor
+from numpy import zeros, where, array, stack, load as np_load
 from config.env import EAVizConfig
 
 
@@ -33,38 +33,63 @@ def label2Spair(label):
     return s_pair
 
 
-def getlabel(model, npz_path):
-    # edf -> mat -> npz 每个npz全长15000
-    # 逐个遍历npz (19,15000) -> normalize -> unsqueeze (1,19,15000) -> <model> (1,2,15000) -> argmax (15000,)
-    # -> 2pair (x,2) -> 2label (15000,) -> 2pair (y,2) -> + 15000*t (y,2) -> 2list[list] y[2] -> res -> t+1
-    # 第二遍2pair应该就是为了得到(⭐,2)的形式，方便后续+ 15000*t
+def split_segments(data, duration=None):
+    """
+    将 (19,n_times) 的数据按 SpiDConfig.DURATION 个采样点切分为若干段（视图，不复制），不足一段的尾部舍去
+    """
+    duration = duration or EAVizConfig.SpiDConfig.DURATION
+    return [data[:, i:i + duration] for i in range(0, data.shape[1] - duration + 1, duration)]
+
+
+def getlabel(model, npz_path, mean=None, std=None):
+    """
+    从 mat2npz 导出的npz文件夹预测（调试用），按文件名顺序视为连续的片段
+    """
+    segments = [np_load(path.join(npz_path, filename))['data'] for filename in sorted(listdir(npz_path))]
+    return getlabel_from_segments(model, segments, mean, std)
+
+
+def getlabel_from_segments(model, segments, mean=None, std=None, batch_size=None):
+    """
+    :param segments: 若干段 (19,15000) 的数据（list 或 (段数,19,15000) 数组），按顺序视为连续的片段
+    :param batch_size: 每批送入模型的段数，默认 SpiDConfig.BATCH_SIZE；模型处于 eval 模式，各段结果与逐段推理一致
+    """
     result = []
-    t = 0
-    for filename in listdir(npz_path):  # 遍历文件夹中的所有.npz文件
-        npzpath = path.join(npz_path, filename)
-        input2 = from_numpy(np_load(npzpath)['data']).cuda().float()  # 从npz读取key = data的value Tensor (19,15000)
-        # print('实际标签')
-        # print(np.load(npzpath)['spike_label'])
-
-        cfg = EAVizConfig.SpiDConfig
-        for i in range(len(cfg.MEAN)):  # 对不同通道进行归一化
-            input2[i] = (input2[i] - cfg.MEAN[i]) / cfg.STD[i]
-        input2 = input2.unsqueeze(0)  # (1,19,15000) 作为模型输入
-        # batch_size = input2.shape[0]  # 1
-
-        with no_grad():
-            U34pred = model(input2)['seg_out']  # (1,2,15000)
-        U34pred = argmax(U34pred, dim=1).squeeze(0).cpu().numpy()  # (15000,)
-        U3_s_pair = label2Spair(U34pred)  # (x,2)
-        U3pred_new = pair2label(U3_s_pair, 15000, 15)  # (15000,)
-        prelable = label2Spair(U3pred_new)  # (y,2)
-        # print('预测标签')
-        # print(prelable)
-        prelable_modified = [[x + 15000 * t for x in sublist] for sublist in prelable]  # (y,2) -> list[list] y[2]
-        result.extend(prelable_modified)  # 添加一个可迭代对象中的所有元素到列表末尾
-        t += 1
+    for _, pairs in iter_segment_labels(model, segments, mean, std, batch_size):
+        result.extend(pairs)
     return result
 
+
+def iter_segment_labels(model, segments, mean=None, std=None, batch_size=None):
+    """
+    逐批推理：每批 yield (已处理的段数, 该批预测的棘波 [[start, end], ...]，采样点相对第一段开始)
+    """
+    # 分批 (B,19,15000) -> normalize -> <model> (B,2,15000) -> argmax (B,15000)
+    # 逐段 (15000,) -> 2pair (x,2) -> 2label (15000,) -> 2pair (y,2) -> + 15000*t (y,2) -> 2list[list] y[2] -> res
+    # 第二遍2pair应该就是为了得到(⭐,2)的形式，方便后续+ 15000*t
+    cfg = EAVizConfig.SpiDConfig
+    batch_size = batch_size or cfg.BATCH_SIZE
+    device = next(model.parameters()).device  # 模型所在设备（CPU / GPU）
+    # 未指定时使用 SpiDConfig 中固定的统计量
+    ch_mean = tensor(cfg.MEAN if mean is None else mean, dtype=float32, device=device).unsqueeze(1)  # (19,1)
+    ch_std = tensor(cfg.STD if std is None else std, dtype=float32, device=device).unsqueeze(1)
+
+    for t0 in range(0, len(segments), batch_size):
+        input2 = from_numpy(stack(segments[t0:t0 + batch_size])).to(device).float()  # Tensor (B,19,15000)
+        input2 = (input2 - ch_mean) / ch_std  # 对不同通道进行归一化
+
+        with inference_mode():
+            U34pred = model(input2)['seg_out']  # (B,2,15000)
+        U34pred = argmax(U34pred, dim=1).cpu().numpy()  # (B,15000)
+        result = []
+        for t, pred in enumerate(U34pred, start=t0):
+            U3_s_pair = label2Spair(pred)  # (x,2)
+            U3pred_new = pair2label(U3_s_pair, 15000, 15)  # (15000,)
+            prelable = label2Spair(U3pred_new)  # (y,2)
+            prelable_modified = [[x + 15000 * t for x in sublist] for sublist in prelable]  # (y,2) -> list[list] y[2]
+            result.extend(prelable_modified)  # 添加一个可迭代对象中的所有元素到列表末尾
+        yield t0 + len(U34pred), result
+
 # input2 = torch.from_numpy(np.load(r"D:\资料\睡眠分期+棘波\裁剪数据\npz数据\滤波后\梁圣豪0607\liang01_19_labeled_filtered_00030.npz")['data']).cuda().float()  # 标准化后的19通道信号
 # print('实际标签')
 # print(np.load(r"D:\资料\睡眠分期+棘波\裁剪数据\npz数据\滤波后\梁圣豪0607\liang01_19_labeled_filtered_00030.npz")['spike_label'])
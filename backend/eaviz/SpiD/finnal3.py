@@ -21,6 +21,41 @@ def get_label_data(corr_windows):
     merged_windows.append((start, end))
     return merged_windows
 
+
+class WindowMerger:
+    """
+    get_label_data 的增量版本：按时间顺序逐个推入时间窗，跨分块仍未结束的时间窗保存在状态中
+    依次收集 push 返回的时间窗及最后 flush 的时间窗，结果与 get_label_data 一致
+    """
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+
+    def push(self, curr_start, curr_end):
+        """
+        :return: 因当前时间窗不重叠而结束的时间窗 (start, end)，否则为 None
+        """
+        if self.start is None:
+            self.start, self.end = curr_start, curr_end
+            return None
+        if curr_start <= self.end:
+            self.end = max(curr_end, self.end)
+            return None
+        closed = (self.start, self.end)
+        self.start, self.end = curr_start, curr_end
+        return closed
+
+    def flush(self):
+        """
+        :return: 最后一个时间窗，没有推入过时间窗时为 None
+        """
+        if self.start is None:
+            return None
+        closed = (self.start, self.end)
+        self.start = self.end = None
+        return closed
+
 # 输出保存的相关窗口个数
 # print(len(get_label_data()))
 # print(get_label_data())
@@ -1,14 +1,19 @@
-from os import makedirs, path
+from json import dumps
+from os import makedirs, path, remove, scandir
 from shutil import rmtree
-from matplotlib.pyplot import savefig, close
-from mne import Annotations, read_evokeds
-from numpy import corrcoef
-from config.env import EAVizConfig
-from eaviz.SpiD.Premodel import getlabel
+from tempfile import mkdtemp
+from time import time
+from matplotlib.pyplot import close
+from mne import Annotations
+from numpy import arange, empty, errstate, float64, sqrt
+from numpy.lib.stride_tricks import sliding_window_view
+from config.env import EAVizConfig, EdfCacheConfig
+from eaviz.SpiD.Premodel import getlabel, getlabel_from_segments, iter_segment_labels, split_segments
 from eaviz.SpiD.edf2mat import filter_2sIIR, edf2mat, anno_txt
-from eaviz.SpiD.finnal3 import get_label_data
+from eaviz.SpiD.finnal3 import get_label_data, WindowMerger
 from eaviz.SpiD.mat2npz import mat2npz
 from utils.edf_util import EdfUtil
+from utils.log_util import logger
 
 
 class SPID:
@@ -17,7 +22,10 @@ class SPID:
     """
 
     @staticmethod
-    def tm(raw, start_time, stop_time, auto=False):
+    def tm(raw, start_time, stop_time, auto=False, run_id=None):
+        """
+        :param run_id: 单次分析的编号，结果图保存到 get_spid_adr('res', run_id)，为 None 时保存到共享路径
+        """
         raw.load_data()
 
         # 滤波
@@ -26,26 +34,18 @@ class SPID:
         # 清除annotations
         raw_filtered.set_annotations(Annotations([], [], []))
 
-        # 加载模板数据
-        template = read_evokeds(EAVizConfig.AddressConfig.get_spid_adr('tem'), verbose='error')[0]
-        template_data = template.data  # (19,150)
-
-        # 初始化保存相关窗口的列表
-        corr_windows = []
-
         # calculate SWI
         total_dur = 0
 
         # 滑动窗口匹配，窗口大小为 0.3 秒，步长为 0.01 秒
-        for i in range(int(start_time) * 500, int(stop_time) * 500 - 150, 5):
-            # 获取当前窗口内的数据
-            window_data = raw_filtered.get_data(start=i, stop=i + 150)  # (19,150)
-            # 计算当前窗口内的相关度
-            corr = corrcoef(window_data, template_data)[0, 1]  # (19,150) 取[0,1]作为参考，不取[0,0]是因为对角线（变量自身与自身）的相关系数都是1
-            abs_corr = abs(corr)  # 正相关和负相关都可以
-            # 判断相关度是否超过阈值，如果超过则保存当前窗口的起始和终止时间
-            if abs_corr > EAVizConfig.SpiDConfig.CORR_THRESHOLD:
-                corr_windows.append((i / 500, (i + 150) / 500))
+        # 原实现逐窗口计算 corrcoef(window_data, template_data)[0, 1]：corrcoef 将两个 (19,150) 数组按行拼接为 38 个变量，
+        # [0, 1] 实际是窗口内第 0 与第 1 通道的相关系数（模板 liangC3_ave.fif 并未参与计算）。
+        # 此处保持该结果不变，对所有窗口一次性计算第 0、1 通道的相关系数
+        offsets = arange(int(start_time) * 500, int(stop_time) * 500 - 150, 5)
+        data = raw_filtered.get_data(picks=[0, 1])  # (2,n_times)
+        abs_corr = abs(sliding_corr(data[0], data[1], offsets, 150))  # 正相关和负相关都可以
+        # 判断相关度是否超过阈值，如果超过则保存当前窗口的起始和终止时间
+        corr_windows = [(i / 500, (i + 150) / 500) for i in offsets[abs_corr > EAVizConfig.SpiDConfig.CORR_THRESHOLD]]
 
         annotations_list = []
         if len(corr_windows) > 0:
@@ -60,55 +60,32 @@ class SPID:
         duration = stop_time - start_time
         swi = ('%.2f' % (total_dur / duration))
 
-        plot_eeg_and_save(duration, start_time, raw_filtered, 15, 300e-6)
+        plot_eeg_and_save(duration, start_time, raw_filtered, 15, 300e-6,
+                          EAVizConfig.AddressConfig.get_spid_adr('res', run_id))
         return swi
 
     @staticmethod
-    def ss(raw, model, start_time, stop_time, auto=False):
+    def ss(raw, model, start_time, stop_time, auto=False, mean=None, std=None, run_id=None):
+        """
+        :param run_id: 单次分析的编号，结果图按该次分析隔离，为 None 时保存到共享路径
+        """
         raw.load_data()
 
-        # todo 50 Notch
-        raw1 = raw.notch_filter(freqs=50)
-
-        # 用于绘制
-        raw_filtered = raw1.copy().filter(l_freq=1, h_freq=70)  # filter直接修改了原始对象，需要先copy
-
-        # 切片
-        sfreq = raw1.info['sfreq']
-        raw1 = raw1.crop(start_time, stop_time - 1 / sfreq)
-        record_microvolts = raw1.get_data() * 1e6  # 单位转换
-
-        # 0.5-50 BP
-        passband = [0.5, 50]  # passband for bandpass filter
-        forder = 6  # filter order
-        record1 = filter_2sIIR(record_microvolts, passband, EAVizConfig.SpiDConfig.SAMPLE_RATE, forder, 'bandpass')
-
-        # folder process
-        mat_path = EAVizConfig.AddressConfig.get_spid_adr('mat')
-        npz_path = EAVizConfig.AddressConfig.get_spid_adr('npz')
-        SPID.clean_folder_list([mat_path, npz_path])
-        # 如果这个目录或其任何父目录不存在的话，创建一个名为 mat_path 的目录。
-        # 如果这个目录已经存在，代码不会有任何错误，而是正常继续执行。这在确保创建目录时不因目录已存在而中断程序执行的情况下非常有用。
-        makedirs(mat_path, exist_ok=True)
-        makedirs(npz_path, exist_ok=True)
-
-        # edf2mat
-        edf2mat(record1, mat_path)
+        # 用于绘制（滤波缓存要求传入未滤波的数据，需在陷波前copy）
+        raw_filtered = EdfUtil.normal_filter(raw.copy())  # filter直接修改了原始对象，需要先copy
 
-        # 生成伪标签以满足数据格式条件
-        anno_txt(mat_path, record1.shape[1], sfreq)  # record1.shape[1] = raw.n_times
-
-        # mat2npz
-        mat2npz(mat_path, npz_path)
+        record1, sfreq = SPID.ss_preprocess(raw, start_time, stop_time)
 
         # calculate SWI
         total_dur = 0
 
         raw_filtered.set_annotations(Annotations([], [], []))
 
-        # 得到npz后
+        # 在内存中按 DURATION 切段后直接送入模型
         annotations_list = []
-        res = getlabel(model, npz_path)
+        res = getlabel_from_segments(model, split_segments(record1), mean, std)
+        if EAVizConfig.SpiDConfig.DEBUG_EXPORT:
+            SPID.check_by_npz(model, record1, sfreq, res, mean, std)
         if len(res) > 0:
             for start, end in res:
                 real_dur = (end - start) / sfreq
@@ -122,17 +99,158 @@ class SPID:
         duration = stop_time - start_time
         swi = '%.2f' % (total_dur / duration)
 
-        plot_eeg_and_save(duration, start_time, raw_filtered, 15, 300e-6)
+        plot_eeg_and_save(duration, start_time, raw_filtered, 15, 300e-6,
+                          EAVizConfig.AddressConfig.get_spid_adr('res', run_id))
         return swi
 
     @staticmethod
-    def clean_folder_list(folder_path_list):
-        for p in folder_path_list:
-            if path.exists(p):
-                rmtree(p)
+    def ss_preprocess(raw, start_time, stop_time):
+        """
+        50Hz 陷波 -> 切片 -> 0.5-50Hz 带通（直接修改 raw）
+        :return: (19,n_times) 微伏, sfreq
+        """
+        # todo 50 Notch
+        raw1 = EdfUtil.filter_by_spec(raw, EdfUtil.NOTCH_FILTER_SPEC)
+
+        # 切片
+        sfreq = raw1.info['sfreq']
+        raw1 = raw1.crop(start_time, stop_time - 1 / sfreq)
+        record_microvolts = raw1.get_data() * 1e6  # 单位转换
+
+        # 0.5-50 BP
+        passband = [0.5, 50]  # passband for bandpass filter
+        forder = 6  # filter order
+        record1 = filter_2sIIR(record_microvolts, passband, EAVizConfig.SpiDConfig.SAMPLE_RATE, forder, 'bandpass')
+        return record1, sfreq
+
+    @staticmethod
+    def stream_tm(raw, start_time, stop_time, chunk_seconds=None):
+        """
+        流式模板匹配：每 chunk_seconds 秒的窗口计算一次相关度并增量合并，yield 一次部分结果
+        每块只读取该块（前后带 EdfCacheConfig.FILTER_MARGIN_SECOND 的余量）并滤波，首个结果无需等待整段记录加载、滤波；
+        时间窗按与 tm 相同的顺序合并、累加，最终的 swi 与 tm 一致（不绘制结果图）
+        :param raw: 可为未加载数据的 raw
+        :return: 生成器，每行一个 JSON（progress 若干，最后为 summary）
+        """
+        sfreq = raw.info['sfreq']
+        margin = int(EdfCacheConfig.FILTER_MARGIN_SECOND * sfreq)
+
+        # 同 tm：窗口大小为 0.3 秒，步长为 0.01 秒，取第 0、1 通道的相关系数
+        offsets = arange(int(start_time) * 500, int(stop_time) * 500 - 150, 5)
+        chunk = max(int((chunk_seconds or EAVizConfig.SpiDConfig.STREAM_CHUNK_SECONDS) * 500) // 5, 1)
+
+        accumulator = SwiAccumulator(start_time, stop_time)
+        merger = WindowMerger()
+        for i in range(0, len(offsets), chunk):
+            part = offsets[i:i + chunk]
+            # 读取本块（前后带 margin）并滤波（从未滤波的数据出发，以便命中滤波缓存）
+            read_start = max(part[0] - margin, 0)
+            read_stop = min(part[-1] + 150 + margin, raw.n_times)
+            block = raw.copy().crop(tmin=read_start / sfreq, tmax=(read_stop - 1) / sfreq)
+            block.load_data()
+            data = EdfUtil.normal_filter(block).get_data(picks=[0, 1])  # (2,本块的采样点数)
+
+            abs_corr = abs(sliding_corr(data[0], data[1], part - read_start, 150))
+            for o in part[abs_corr > EAVizConfig.SpiDConfig.CORR_THRESHOLD]:
+                accumulator.add(merger.push(o / 500, (o + 150) / 500))
+            # 已处理到的时间：下一块第一个窗口的开始
+            yield accumulator.progress(offsets[i + chunk] / 500 if i + chunk < len(offsets) else stop_time)
+
+        accumulator.add(merger.flush())
+        yield accumulator.summary()
+
+    @staticmethod
+    def stream_ss(raw, model, start_time, stop_time, mean=None, std=None):
+        """
+        流式棘波分割：预处理后每批 SpiDConfig.BATCH_SIZE 个 30s 片段推理一次并 yield 部分结果
+        只读取 [start_time, stop_time) 及前后 EdfCacheConfig.FILTER_MARGIN_SECOND 的余量做 50Hz 陷波
+        （FIR 滤波器长度小于余量，与 ss 对整段记录陷波的结果一致），0.5-50Hz 带通为零相位 IIR 滤波，
+        每个样本点都受整个范围影响，因此同 ss 对整个分析范围一次带通，模型的输入与 ss 相同；
+        分批推理的结果与 ss 一致，各段的棘波按与 ss 相同的顺序累加，最终的 swi 与 ss 相同（不绘制结果图）
+        :param raw: 可为未加载数据的 raw
+        :return: 生成器，每行一个 JSON（progress 若干，最后为 summary）
+        """
+        sfreq = raw.info['sfreq']
+        margin = int(EdfCacheConfig.FILTER_MARGIN_SECOND * sfreq)
+        duration = EAVizConfig.SpiDConfig.DURATION
+        s_idx, stop_idx = int(round(start_time * sfreq)), int(round(stop_time * sfreq))
+        read_start, read_stop = max(s_idx - margin, 0), min(stop_idx + margin, raw.n_times)
+
+        # 读取分析范围及余量（从未滤波的数据出发，以便命中滤波缓存）-> 50Hz 陷波 -> 0.5-50Hz 带通
+        block = raw.copy().crop(tmin=read_start / sfreq, tmax=(read_stop - 1) / sfreq)
+        block.load_data()
+        block = EdfUtil.filter_by_spec(block, EdfUtil.NOTCH_FILTER_SPEC)
+        record = block.get_data()[:, s_idx - read_start:stop_idx - read_start] * 1e6  # 单位转换
+        del block
+        record = filter_2sIIR(record, [0.5, 50], EAVizConfig.SpiDConfig.SAMPLE_RATE, 6, 'bandpass')
+
+        accumulator = SwiAccumulator(start_time, stop_time)
+        for n_done, pairs in iter_segment_labels(model, split_segments(record), mean, std):
+            for start, end in pairs:  # 采样点相对第一段开始
+                accumulator.add((start / sfreq + start_time, start / sfreq + start_time + (end - start) / sfreq),
+                                (end - start) / sfreq)
+            yield accumulator.progress(min(start_time + n_done * duration / sfreq, stop_time))
+        yield accumulator.summary()
+
+    @staticmethod
+    def check_by_npz(model, record, sfreq, res, mean=None, std=None):
+        """
+        调试：按原有流程导出 mat/伪标签/npz 文件，从 npz 文件再推理一次并与内存中的结果比对
+        每次分析导出到单独的临时目录，结束后删除
+        """
+        duration = EAVizConfig.SpiDConfig.DURATION
+        export_dir = mkdtemp(prefix='spid_debug_')
+        try:
+            # mat2npz 要求数据长度为整数个片段，同 split_segments 舍去尾部
+            npz_path = SPID.export_npz(record[:, :record.shape[1] // duration * duration], sfreq, export_dir)
+            npz_res = getlabel(model, npz_path, mean, std)
+            if [list(pair) for pair in npz_res] != [list(pair) for pair in res]:
+                logger.warning(f'SpiD npz 流程的结果与内存中的结果不一致: {len(npz_res)} / {len(res)} 个棘波')
+        finally:
+            rmtree(export_dir, ignore_errors=True)
+
+    @staticmethod
+    def export_npz(record, sfreq, export_dir):
+        """
+        将滤波后的数据按原有流程导出为 mat -> npz 文件（仅用于调试，分析流程不再依赖这些文件）
+        :param export_dir: 导出目录，其下生成 mat、npz 两个子目录
+        :return: npz 文件夹
+        """
+        # folder process
+        mat_path = path.join(export_dir, 'mat')
+        npz_path = path.join(export_dir, 'npz')
+        makedirs(mat_path, exist_ok=True)
+        makedirs(npz_path, exist_ok=True)
+
+        # edf2mat
+        edf2mat(record, mat_path)
+
+        # 生成伪标签以满足数据格式条件
+        anno_txt(mat_path, record.shape[1], sfreq)  # record.shape[1] = raw.n_times
 
+        # mat2npz
+        mat2npz(mat_path, npz_path)
+        return npz_path
 
-def plot_eeg_and_save(duration, start_time, raw, dur_th, scaling):
+    @staticmethod
+    def remove_expired_res():
+        """
+        删除超过 SpiDConfig.RES_EXPIRE_SECONDS 的单次分析结果图
+        """
+        res_dir = path.dirname(EAVizConfig.AddressConfig.get_spid_adr('res'))
+        if not path.isdir(res_dir):
+            return
+        expire_time = time() - EAVizConfig.SpiDConfig.RES_EXPIRE_SECONDS
+        shared_name = path.basename(EAVizConfig.AddressConfig.get_spid_adr('res'))
+        for entry in scandir(res_dir):
+            try:
+                if entry.is_file() and entry.name != shared_name and entry.stat().st_mtime < expire_time:
+                    remove(entry.path)
+            except OSError:  # 可能已被并发的分析删除
+                continue
+
+
+def plot_eeg_and_save(duration, start_time, raw, dur_th, scaling, save_path):
     text_size = 16
     font_family = "Microsoft YaHei"
     if raw.annotations:
@@ -169,6 +287,84 @@ def plot_eeg_and_save(duration, start_time, raw, dur_th, scaling):
         text.set_fontsize(text_size)
 
     # Save the figure
+    # 按图对象保存/关闭，不依赖 pyplot 的当前图（并发分析时当前图可能属于其他请求）
     eeg_plot.tight_layout()
-    savefig(EAVizConfig.AddressConfig.get_spid_adr('res'), format='png', dpi=600)
-    close()
+    makedirs(path.dirname(save_path), exist_ok=True)
+    eeg_plot.savefig(save_path, format='png', dpi=600)
+    close(eeg_plot)
+
+
+class SwiAccumulator:
+    """
+    流式计算 SWI：累加已确定的棘慢波时长，生成 progress / summary 行（同 SRD 流式输出，每行一个 JSON）
+    """
+
+    def __init__(self, start_time, stop_time):
+        self.start_time = start_time
+        self.stop_time = stop_time
+        self.total_dur = 0
+        self.count = 0
+        self.pending = []  # 上次 progress 之后新确定的棘慢波 [onset, duration]
+
+    def add(self, window, dur=None):
+        """
+        :param window: (start, end)，为 None 时忽略
+        :param dur: 累加的时长，默认 end - start（与批量计算的累加方式保持一致）
+        """
+        if window is None:
+            return
+        dur = window[1] - window[0] if dur is None else dur
+        self.total_dur += dur
+        self.count += 1
+        self.pending.append([float(window[0]), float(dur)])
+
+    def progress(self, cur_time):
+        """
+        :param cur_time: 已处理到的时间（秒）
+        """
+        elapsed = cur_time - self.start_time
+        line = {
+            'type': 'progress',
+            'time': float(cur_time),
+            'annotations': self.pending,
+            'swi': '%.2f' % (self.total_dur / elapsed) if elapsed > 0 else None
+        }
+        self.pending = []
+        return dumps(line).encode('utf-8') + b'\n'
+
+    def summary(self):
+        line = {
+            'type': 'summary',
+            'annotations': self.pending,
+            'totalAnnotations': self.count,
+            'totalDur': float(self.total_dur),
+            'swi': '%.2f' % (self.total_dur / (self.stop_time - self.start_time)),
+            'timeRange': {
+                'start': float(self.start_time),
+                'stop': float(self.stop_time)
+            }
+        }
+        self.pending = []
+        return dumps(line).encode('utf-8') + b'\n'
+
+
+def sliding_corr(x, y, offsets, width, chunk=None):
+    """
+    计算 x、y 在各窗口 [offset, offset + width) 内的皮尔逊相关系数（同 numpy.corrcoef，方差为 0 时为 nan）
+    按块用滑动窗口视图向量化计算，避免逐窗口调用
+    :param chunk: 每块的窗口数，默认按 SpiDConfig.CORR_CHUNK_BYTES 计算（每块约有 5 个 (chunk, width) 的 float64 临时数组）
+    """
+    if chunk is None:
+        chunk = max(EAVizConfig.SpiDConfig.CORR_CHUNK_BYTES // (5 * width * 8), 1)
+    x_windows = sliding_window_view(x, width)
+    y_windows = sliding_window_view(y, width)
+    corr = empty(len(offsets), dtype=float64)
+    for i in range(0, len(offsets), chunk):
+        idx = offsets[i:i + chunk]
+        xw = x_windows[idx]
+        yw = y_windows[idx]
+        xw = xw - xw.mean(axis=1, keepdims=True)
+        yw = yw - yw.mean(axis=1, keepdims=True)
+        with errstate(divide='ignore', invalid='ignore'):
+            corr[i:i + chunk] = (xw * yw).sum(axis=1) / sqrt((xw * xw).sum(axis=1) * (yw * yw).sum(axis=1))
+    return corr.clip(-1, 1)
@@ -3,7 +3,9 @@ from cv2 import VideoCapture, CAP_PROP_FRAME_COUNT, CAP_PROP_FPS
 from fastapi import APIRouter, Depends, Request, UploadFile, File, Form
 from json import dumps
 from os import remove
+from starlette.concurrency import run_in_threadpool
 from tempfile import NamedTemporaryFile
+from uuid import uuid4
 
 from config.env import EAVizConfig, UploadConfig
 from config.get_db import get_db
@@ -30,20 +32,19 @@ download_path = UploadConfig.DOWNLOAD_PATH
 @analysisController.post("/escsd", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:escsd:analyse"))])
 @log_decorator(title="ESCSD分析", business_type=12)
 async def analyse_escsd_by_edf_id(request: Request,
-                                  edf_data_analyse: EdfDataAnalyseGenericModel,
+                                  edf_data_analyse: EdfDataAnalyseESCSDModel,
                                   query_db: Session = Depends(get_db),
                                   current_user: CurrentUserModel = Depends(LoginService.get_current_user)):
     try:
-        edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id,
-                                         selectedChannels=','.join(EAVizConfig.ChannelEnum.CH21.value))
-        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query)
-        if not edf_raw_query_result.is_success:  # 检查是否获取成功
-            return ResponseUtil.error(msg=edf_raw_query_result.message)
-
-        logger.info(edf_raw_query_result.message)
-        raw = edf_raw_query_result.result
-        if raw.info['nchan'] != 21:  # 检查通道数量
-            return ResponseUtil.error(msg='通道数不是 21，无法进行 ESC/SD 分析')
+        # 根据数据库中的edf元信息校验，不满足要求时不读取edf
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_analyse.edf_id,
+            channels=EAVizConfig.ChannelEnum.CH21.value,
+            sfreq=EAVizConfig.ModelConfig.ESC_SD_SFREQ,
+            start_time=edf_data_analyse.start_time,
+            stop_time=edf_data_analyse.start_time + EAVizConfig.ModelConfig.ESC_SD_DURATION)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
 
         model_name = edf_data_analyse.method
         if model_name not in EAVizConfig.ModelConfig.ESC_SD_MODEL:
@@ -54,32 +55,40 @@ async def analyse_escsd_by_edf_id(request: Request,
             logger.error(f"对应的预训练模型未加载: {model_name}")
             return ResponseUtil.error(msg=f"预训练模型未加载: {model_name}")
 
-        fm_abs = None
-        stft_abs = None
-        res_abs = None
-        if model_name == "DSMN-ESS":
-            ESCSD.sd(raw, model, edf_data_analyse.start_time)
-            fm_abs = EAVizConfig.AddressConfig.get_sd_adr('fm')
-            stft_abs = EAVizConfig.AddressConfig.get_sd_adr('stft')
-            res_abs = EAVizConfig.AddressConfig.get_sd_adr('res')
-        elif model_name == "R3DClassifier":
-            ESCSD.esc(raw, model, edf_data_analyse.start_time)
-            fm_abs = EAVizConfig.AddressConfig.get_esc_adr('fm')
-            stft_abs = EAVizConfig.AddressConfig.get_esc_adr('stft')
-            res_abs = EAVizConfig.AddressConfig.get_esc_adr('res')
+        # 按 (edf_id, 窗口, 方法) 缓存预测结果及结果图，重复打开同一结果时不再推理/绘图
+        render = edf_data_analyse.render
+        cache_key = ESCSD.make_cache_key(edf_data_analyse.edf_id, edf_data_analyse.start_time, model_name)
+        result = ESCSD.load_cached_result(model_name, cache_key, render)
+        if result is None:
+            edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id,
+                                             selectedChannels=','.join(EAVizConfig.ChannelEnum.CH21.value))
+            edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query)
+            if not edf_raw_query_result.is_success:  # 检查是否获取成功
+                return ResponseUtil.error(msg=edf_raw_query_result.message)
+
+            logger.info(edf_raw_query_result.message)
+            raw = edf_raw_query_result.result
+            if raw.info['nchan'] != 21:  # 检查通道数量
+                return ResponseUtil.error(msg='通道数不是 21，无法进行 ESC/SD 分析')
+
+            # 推理及绘图均按图对象进行，放到线程池中执行，不阻塞事件循环
+            result = await run_in_threadpool(ESCSD.analyse, raw, model, model_name, edf_data_analyse.start_time,
+                                             render, cache_key)
+        else:
+            logger.info(f'命中 ESC/SD 结果缓存: {cache_key}')
 
         # 把目录下的结果图转成 URL（StaticFiles 访问路径）
         # app.mount 只是告诉 FastAPI：URL 前缀 ↔ 硬盘目录 的映射关系。
         # 后端代码里拿到的是 硬盘路径，必须转换成 URL 才能返回给前端。
-        image_urls = [
-            CommonService.make_static_url(request, fm_abs, download_path),
-            CommonService.make_static_url(request, stft_abs, download_path),
-            CommonService.make_static_url(request, res_abs, download_path)
-        ]
-        # 过滤掉没转换成功的
-        image_urls = [u for u in image_urls if u]
+        image_urls = []
+        if render:
+            image_urls = [CommonService.make_static_url(request, ESCSD.get_adr(model_name, name, cache_key),
+                                                        download_path) for name in ('fm', 'stft', 'res')]
+            # 过滤掉没转换成功的
+            image_urls = [u for u in image_urls if u]
 
         return ResponseUtil.success(data={
+            "result": result,
             "images": image_urls,
             "message": "分析完成"
         })
@@ -88,6 +97,56 @@ async def analyse_escsd_by_edf_id(request: Request,
         return ResponseUtil.error(msg=str(e))
 
 
+@analysisController.post("/escsd/scan", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:escsd:analyse"))])
+@log_decorator(title="ESCSD整段扫描", business_type=12)
+async def scan_escsd_by_edf_id(request: Request,
+                               edf_data_scan: EdfDataScanESCSDModel,
+                               query_db: Session = Depends(get_db),
+                               current_user: CurrentUserModel = Depends(LoginService.get_current_user)):
+    try:
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_scan.edf_id,
+            channels=EAVizConfig.ChannelEnum.CH21.value,
+            sfreq=EAVizConfig.ModelConfig.ESC_SD_SFREQ,
+            start_time=edf_data_scan.start_time,
+            stop_time=edf_data_scan.stop_time)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
+        if edf_data_scan.stride is not None and edf_data_scan.stride <= 0:
+            return ResponseUtil.error(msg='步长必须大于 0')
+        if edf_data_scan.batch_size is not None and edf_data_scan.batch_size <= 0:
+            return ResponseUtil.error(msg='批大小必须大于 0')
+
+        model_name = edf_data_scan.method
+        if model_name not in EAVizConfig.ModelConfig.ESC_SD_MODEL:
+            return ResponseUtil.error(msg='模型选择有误')
+        model = request.app.state.models.get(model_name)
+        if not model:
+            logger.error(f"对应的预训练模型未加载: {model_name}")
+            return ResponseUtil.error(msg=f"预训练模型未加载: {model_name}")
+
+        # 整段扫描只读取扫描范围内的数据，不经过 Raw 缓存
+        edf_raw_query = EdfRawQueryModel(edfId=edf_data_scan.edf_id,
+                                         selectedChannels=','.join(EAVizConfig.ChannelEnum.CH21.value))
+        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query, preload=False)
+        if not edf_raw_query_result.is_success:
+            return ResponseUtil.error(msg=edf_raw_query_result.message)
+        raw = edf_raw_query_result.result
+        if raw.info['nchan'] != 21:
+            return ResponseUtil.error(msg='通道数不是 21，无法进行 ESC/SD 分析')
+
+        scan_result = await run_in_threadpool(
+            ESCSD.scan, raw, model, model_name,
+            start_time=edf_data_scan.start_time, stop_time=edf_data_scan.stop_time,
+            stride=edf_data_scan.stride, batch_size=edf_data_scan.batch_size,
+            merge_events=edf_data_scan.merge_events, threshold=edf_data_scan.threshold)
+        logger.info(f'ESCSD 扫描完成，共 {len(scan_result["windows"])} 个窗口')
+        return ResponseUtil.success(data=scan_result)
+    except Exception as e:
+        logger.exception(e)
+        return ResponseUtil.error(msg=str(e))
+
+
 @analysisController.post("/ad", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:ad:analyse"))])
 @log_decorator(title="AD分析", business_type=13)
 async def analyse_ad_by_edf_id(request: Request,
@@ -95,9 +154,20 @@ async def analyse_ad_by_edf_id(request: Request,
                                query_db: Session = Depends(get_db),
                                current_user: CurrentUserModel = Depends(LoginService.get_current_user)):
     try:
+        # 根据数据库中的edf元信息校验，不满足要求时不读取edf
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_analyse.edf_id,
+            channels=EAVizConfig.ChannelEnum.CH19.value,
+            sfreq=EAVizConfig.ModelConfig.AD_SFREQ,
+            start_time=edf_data_analyse.start_time,
+            stop_time=edf_data_analyse.start_time + EAVizConfig.ModelConfig.AD_DURATION)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
+
         edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id,
                                          selectedChannels=','.join(EAVizConfig.ChannelEnum.CH19.value))
-        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query)
+        # AD 只读取分析窗口附近的数据，不加载整段记录
+        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query, preload=False)
         if not edf_raw_query_result.is_success:  # 检查是否获取成功
             return ResponseUtil.error(msg=edf_raw_query_result.message)
 
@@ -117,7 +187,15 @@ async def analyse_ad_by_edf_id(request: Request,
             logger.error(f"对应的预训练模型未加载: {edf_data_analyse.method}")
             return ResponseUtil.error(msg=f"预训练模型未加载: {edf_data_analyse.method}")
 
-        AD.ad(raw, edf_data_analyse.start_time, edf_data_analyse.fb_idx, edf_data_analyse.arti_list, mod1, mod2, model2)
+        mean, std = None, None
+        if EAVizConfig.ADConfig.USE_RECORDING_STATS:
+            channel_stats = EdfService.get_edf_channel_stats_services(query_db, edf_data_analyse.edf_id,
+                                                                      EAVizConfig.ADConfig.CHANNELS)
+            if channel_stats:
+                mean, std = channel_stats
+
+        AD.ad(raw, edf_data_analyse.start_time, edf_data_analyse.fb_idx, edf_data_analyse.arti_list, mod1, mod2, model2,
+              mean=mean, std=std)
 
         topo_abs = EAVizConfig.AddressConfig.get_ad_adr('topo')
         res_abs = EAVizConfig.AddressConfig.get_ad_adr('res')
@@ -137,6 +215,59 @@ async def analyse_ad_by_edf_id(request: Request,
         return ResponseUtil.error(msg=str(e))
 
 
+@analysisController.post("/ad/ensemble", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:ad:analyse"))])
+@log_decorator(title="AD集成分析", business_type=13)
+async def analyse_ad_ensemble_by_edf_id(request: Request,
+                                        edf_data_analyse: EdfDataAnalyseADEnsembleModel,
+                                        query_db: Session = Depends(get_db),
+                                        current_user: CurrentUserModel = Depends(LoginService.get_current_user)):
+    try:
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_analyse.edf_id,
+            channels=EAVizConfig.ChannelEnum.CH19.value,
+            sfreq=EAVizConfig.ModelConfig.AD_SFREQ,
+            start_time=edf_data_analyse.start_time,
+            stop_time=edf_data_analyse.start_time + EAVizConfig.ModelConfig.AD_DURATION)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
+
+        methods = edf_data_analyse.methods or EAVizConfig.ModelConfig.AD_MODEL
+        invalid_methods = [m for m in methods if m not in EAVizConfig.ModelConfig.AD_MODEL]
+        if invalid_methods:
+            return ResponseUtil.error(msg=f'模型选择有误: {",".join(invalid_methods)}')
+
+        models = {}
+        for name in {part for m in methods for part in m.split('_')[:2]}:
+            model = request.app.state.models.get(name)
+            if not model:
+                logger.error(f"对应的预训练模型未加载: {name}")
+                return ResponseUtil.error(msg=f"预训练模型未加载: {name}")
+            models[name] = model
+
+        edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id,
+                                         selectedChannels=','.join(EAVizConfig.ChannelEnum.CH19.value))
+        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query, preload=False)
+        if not edf_raw_query_result.is_success:
+            return ResponseUtil.error(msg=edf_raw_query_result.message)
+        raw = edf_raw_query_result.result
+        if raw.info['nchan'] != 19:
+            return ResponseUtil.error(msg='通道数不是 19，无法进行 AD 分析')
+
+        mean, std = None, None
+        if EAVizConfig.ADConfig.USE_RECORDING_STATS:
+            channel_stats = EdfService.get_edf_channel_stats_services(query_db, edf_data_analyse.edf_id,
+                                                                      EAVizConfig.ADConfig.CHANNELS)
+            if channel_stats:
+                mean, std = channel_stats
+
+        result = await run_in_threadpool(AD.ensemble, raw, edf_data_analyse.start_time, edf_data_analyse.arti_list,
+                                         list(methods), models, mean=mean, std=std)
+        return ResponseUtil.success(data=result)
+    except Exception as e:
+        logger.exception(e)
+        return ResponseUtil.error(msg=str(e))
+
+
 @analysisController.post("/spid", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:spid:analyse"))])
 @log_decorator(title="SpiD分析", business_type=14)
 async def analyse_spid_by_edf_id(request: Request,
@@ -144,6 +275,16 @@ async def analyse_spid_by_edf_id(request: Request,
                                  query_db: Session = Depends(get_db),
                                  current_user: CurrentUserModel = Depends(LoginService.get_current_user)):
     try:
+        # 根据数据库中的edf元信息校验，不满足要求时不读取edf
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_analyse.edf_id,
+            channels=EAVizConfig.ChannelEnum.CH19.value,
+            sfreq=EAVizConfig.ModelConfig.SpiD_SFREQ,
+            start_time=edf_data_analyse.start_time,
+            stop_time=edf_data_analyse.stop_time)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
+
         edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id,
                                          selectedChannels=','.join(EAVizConfig.ChannelEnum.CH19.value))
         edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query)
@@ -159,19 +300,31 @@ async def analyse_spid_by_edf_id(request: Request,
         if model_name not in EAVizConfig.ModelConfig.SpiD_MODEL:
             return ResponseUtil.error(msg='模型选择有误')
 
+        # 每次分析的结果图单独保存，并发分析互不覆盖
+        SPID.remove_expired_res()
+        run_id = uuid4().hex
         swi = None
         res_abs = None
         if model_name == "Template Matching":
-            swi = SPID.tm(raw, edf_data_analyse.start_time, edf_data_analyse.stop_time)
-            res_abs = EAVizConfig.AddressConfig.get_spid_adr('res')
+            swi = await run_in_threadpool(SPID.tm, raw, edf_data_analyse.start_time, edf_data_analyse.stop_time,
+                                          run_id=run_id)
+            res_abs = EAVizConfig.AddressConfig.get_spid_adr('res', run_id)
         elif model_name == "Unet+ResNet34":
             model = request.app.state.models.get(model_name)  # todo 与model处协调一下
             if not model:
                 logger.error(f"对应的预训练模型未加载: {model_name}")
                 return ResponseUtil.error(msg=f"预训练模型未加载: {model_name}")
 
-            swi = SPID.ss(raw, model, edf_data_analyse.start_time, edf_data_analyse.stop_time)
-            res_abs = EAVizConfig.AddressConfig.get_spid_adr('res')
+            mean, std = None, None
+            if EAVizConfig.SpiDConfig.USE_RECORDING_STATS:
+                channel_stats = EdfService.get_edf_channel_stats_services(query_db, edf_data_analyse.edf_id,
+                                                                          EAVizConfig.ChannelEnum.CH19.value)
+                if channel_stats:
+                    mean, std = channel_stats
+
+            swi = await run_in_threadpool(SPID.ss, raw, model, edf_data_analyse.start_time,
+                                          edf_data_analyse.stop_time, mean=mean, std=std, run_id=run_id)
+            res_abs = EAVizConfig.AddressConfig.get_spid_adr('res', run_id)
 
         image_urls = [
             CommonService.make_static_url(request, res_abs, download_path)
@@ -188,6 +341,63 @@ async def analyse_spid_by_edf_id(request: Request,
         return ResponseUtil.error(msg=str(e))
 
 
+@analysisController.post("/spid/stream", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:spid:analyse"))])
+@log_decorator(title="SpiD流式分析", business_type=14)
+async def stream_spid_by_edf_id(request: Request,
+                                edf_data_analyse: EdfDataAnalyseSpiDModel,
+                                query_db: Session = Depends(get_db),
+                                current_user: CurrentUserModel = Depends(LoginService.get_current_user)):
+    """
+    流式输出 SpiD 分析的部分结果（SWI 及已确定的棘慢波），最后一行为与 /spid 一致的 SWI
+    """
+    try:
+        # 根据数据库中的edf元信息校验，不满足要求时不读取edf
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_analyse.edf_id,
+            channels=EAVizConfig.ChannelEnum.CH19.value,
+            sfreq=EAVizConfig.ModelConfig.SpiD_SFREQ,
+            start_time=edf_data_analyse.start_time,
+            stop_time=edf_data_analyse.stop_time)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
+
+        model_name = edf_data_analyse.method
+        if model_name not in EAVizConfig.ModelConfig.SpiD_MODEL:
+            return ResponseUtil.error(msg='模型选择有误')
+        model = None
+        if model_name == "Unet+ResNet34":
+            model = request.app.state.models.get(model_name)
+            if not model:
+                logger.error(f"对应的预训练模型未加载: {model_name}")
+                return ResponseUtil.error(msg=f"预训练模型未加载: {model_name}")
+
+        edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id,
+                                         selectedChannels=','.join(EAVizConfig.ChannelEnum.CH19.value))
+        # 按块读取，不预先加载整段记录
+        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query, preload=False)
+        if not edf_raw_query_result.is_success:  # 检查是否获取成功
+            return ResponseUtil.error(msg=edf_raw_query_result.message)
+        raw = edf_raw_query_result.result
+        if raw.info['nchan'] != 19:  # 检查通道数量
+            return ResponseUtil.error(msg='通道数不是 19，无法进行 SpiD 分析')
+
+        if model_name == "Template Matching":
+            stream_generator = SPID.stream_tm(raw, edf_data_analyse.start_time, edf_data_analyse.stop_time)
+        else:
+            mean, std = None, None
+            if EAVizConfig.SpiDConfig.USE_RECORDING_STATS:
+                channel_stats = EdfService.get_edf_channel_stats_services(query_db, edf_data_analyse.edf_id,
+                                                                          EAVizConfig.ChannelEnum.CH19.value)
+                if channel_stats:
+                    mean, std = channel_stats
+            stream_generator = SPID.stream_ss(raw, model, edf_data_analyse.start_time, edf_data_analyse.stop_time,
+                                              mean=mean, std=std)
+        return ResponseUtil.streaming(data=stream_generator)
+    except Exception as e:
+        logger.exception(e)
+        return ResponseUtil.error(msg=str(e))
+
+
 @analysisController.post("/srd", dependencies=[Depends(CheckUserInterfaceAuth("eaviz:srd:analyse"))])
 @log_decorator(title="SRD分析", business_type=15)
 async def analyse_srd_by_edf_id(request: Request,
@@ -198,8 +408,19 @@ async def analyse_srd_by_edf_id(request: Request,
     流式输出 SRD 分析数据
     """
     try:
+        # 根据数据库中的edf元信息校验，不满足要求时不读取edf
+        edf_check_result = EdfService.check_edf_analysable_services(
+            query_db, edf_data_analyse.edf_id,
+            sfreq=EAVizConfig.ModelConfig.SRD_SFREQ,
+            start_time=edf_data_analyse.start_time,
+            stop_time=edf_data_analyse.stop_time,
+            ch_idx=edf_data_analyse.ch_idx)
+        if not edf_check_result.is_success:
+            return ResponseUtil.error(msg=edf_check_result.message)
+
+        # 流式分析按块读取数据，不经过 Raw 缓存
         edf_raw_query = EdfRawQueryModel(edfId=edf_data_analyse.edf_id)
-        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query)
+        edf_raw_query_result = EdfService.get_edf_raw_by_id_services(query_db, edf_raw_query, preload=False)
         if not edf_raw_query_result.is_success:  # 检查是否获取成功
             return ResponseUtil.error(msg=edf_raw_query_result.message)
 
@@ -214,6 +435,8 @@ async def analyse_srd_by_edf_id(request: Request,
         if not model:
             logger.error(f"对应的预训练模型未加载: {model_name}")
             return ResponseUtil.error(msg=f"预训练模型未加载: {model_name}")
+        if edf_data_analyse.decimation < 1:
+            return ResponseUtil.error(msg='抽取倍数必须大于等于 1')
 
         # 生成流式数据
         stream_generator = SRD.stream_srd_data(
@@ -221,7 +444,10 @@ async def analyse_srd_by_edf_id(request: Request,
             edf_data_analyse.start_time,
             edf_data_analyse.stop_time,
             edf_data_analyse.ch_idx,
-            UploadConfig.STREAM_WINDOW_SIZE_SECOND
+            UploadConfig.STREAM_WINDOW_SIZE_SECOND,
+            wire_format=edf_data_analyse.wire_format,
+            dtype=edf_data_analyse.dtype,
+            decimation=edf_data_analyse.decimation
         )
         return ResponseUtil.streaming(data=stream_generator)
     except Exception as e:
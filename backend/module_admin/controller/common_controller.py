@@ -14,7 +14,7 @@ async def common_upload(request: Request, file: UploadFile = File(...)):
     将用户上传的文件保存到服务器的指定位置，并返回上传结果
     """
     try:
-        upload_result = CommonService.upload_service(request, file)
+        upload_result = await CommonService.upload_service(request, file)
         if upload_result.is_success:
             logger.info('上传成功')
             return ResponseUtil.success(model_content=upload_result.result)
@@ -7,10 +7,12 @@ from module_admin.aspect.interface_auth import CheckUserInterfaceAuth
 from module_admin.service.common_service import *
 from module_admin.service.edf_service import *
 from module_admin.service.login_service import LoginService, CurrentUserModel
-from utils.common_util import data2bytes_response
+from utils.common_util import data2bytes_response, data2frames_response
+from utils.edf_cache_util import EdfCacheUtil, EdfFilterCache, EdfPyramidUtil
 from utils.log_util import *
 from utils.page_util import PageResponseModel
 from utils.response_util import *
+from eaviz.ESC_SD.escsd import ESCSD
 
 edfController = APIRouter(prefix='/system/edf', dependencies=[Depends(LoginService.get_current_user)])
 
@@ -33,6 +35,22 @@ async def get_system_edf_list(request: Request, edf_page_query: EdfPageQueryMode
         return ResponseUtil.error(msg=str(e))
 
 
+@edfController.get("/status/{edf_id}", response_model=EdfJobStatusModel,
+                   dependencies=[Depends(CheckUserInterfaceAuth('system:edf:query'))])
+async def get_system_edf_status(request: Request, edf_id: int, query_db: Session = Depends(get_db)):
+    """
+    获取Edf后台处理（规范化）状态
+    """
+    try:
+        edf_status_result = EdfService.get_edf_job_status_services(query_db, edf_id)
+        if edf_status_result is None:
+            return ResponseUtil.failure(msg=f'EDF ID {edf_id} 未找到')
+        return ResponseUtil.success(data=edf_status_result.model_dump(by_alias=True))
+    except Exception as e:
+        logger.exception(e)
+        return ResponseUtil.error(msg=str(e))
+
+
 @edfController.get("/{edf_id}", response_model=EdfModel,
                    dependencies=[Depends(CheckUserInterfaceAuth('system:edf:query'))])
 async def query_detail_system_edf(request: Request, edf_id: int, query_db: Session = Depends(get_db)):
@@ -79,7 +97,9 @@ async def import_system_edf(request: Request, query_db: Session = Depends(get_db
             - 离线是直接基于导入的edf文件检测
             - 在线是需要事先上传edf文件，经过规则化后存在服务器文件夹下（涉及到edf先导入后导出，导出的文件会与原文件有微小差别），再基于此文件进行检测
         """
-        upload_res = CommonService.upload_service(request, file)
+        # 文件写入在线程池中执行；规范化（预加载、通道映射、重新导出）作为后台任务提交到 edf_executor，
+        # 数据库中先写入状态为 processing 的记录，完成后更新为 ready，可通过 /status/{edf_id} 查询进度
+        upload_res = await CommonService.upload_service(request, file, normalize=False)
 
         # 检查上传结果
         if not upload_res.is_success:
@@ -89,10 +109,8 @@ async def import_system_edf(request: Request, query_db: Session = Depends(get_db
 
         edf = EdfModel(
             edfName=upload_res.result.original_filename,  # 字典已经转化为了Pydantic模型
-            edfSfreq=upload_res.result.extra_info['sfreq'],
-            edfTime=upload_res.result.extra_info['time'],
             edfPath=upload_res.result.file_path,
-            validChannels=upload_res.result.extra_info['valid_channels'],
+            edfStatus='processing',
             uploadBy=current_user.user.user_name,
             uploadTime=datetime.now()
         )
@@ -100,8 +118,12 @@ async def import_system_edf(request: Request, query_db: Session = Depends(get_db
         added_edf = AddEdfModel(edfList=[edf], userId=current_user.user.user_id)
         added_edf_result = EdfService.add_edf_services(query_db, added_edf)
         if added_edf_result.is_success:
+            for edf_id in added_edf_result.result:
+                request.app.state.edf_executor.submit(EdfService.normalize_edf_job_services, edf_id,
+                                                      upload_res.result.file_path)
             logger.info(added_edf_result.message)
-            return ResponseUtil.success(msg=added_edf_result.message)
+            return ResponseUtil.success(msg=f'{added_edf_result.message}，正在后台处理',
+                                        data=dict(edfIds=added_edf_result.result))
         else:
             logger.warning(added_edf_result.message)
             return ResponseUtil.failure(msg=added_edf_result.message)
@@ -129,6 +151,11 @@ async def delete_system_edf(request: Request, edf_ids: str, query_db: Session =
                         logger.info(f'文件 {file_path} 删除成功')
                     else:
                         logger.warning(f'文件 {file_path} 不存在或已被删除')
+                    EdfCacheUtil.remove_sidecar(file_path)
+                    EdfPyramidUtil.remove_pyramid(file_path)
+                    EdfFilterCache.remove_entries(file_path)
+                    EdfService.data_cache.invalidate(int(edf_id))
+                    ESCSD.remove_cache(int(edf_id))
                 else:
                     logger.warning(f'EDF ID {edf_id} 未找到')
 
@@ -222,7 +249,20 @@ async def get_system_edf_data_by_id(request: Request,
         edf_data_query_result = EdfService.get_edf_data_by_id_services(query_db, edf_data_query)
         if edf_data_query_result.is_success:
             logger.info(edf_data_query_result.message)
-            return ResponseUtil.streaming(data=data2bytes_response(edf_data_query_result.result))
+            # envelope 模式下每个 bin 对应 [min, max] 两个值，X-Edf-Decimation 为每个 bin 覆盖的样本点数（1 表示原始样本）
+            edf_data = edf_data_query_result.result
+            decimation = edf_data['decimation']
+            headers = {'X-Edf-Mode': 'envelope' if decimation > 1 else 'raw', 'X-Edf-Decimation': str(decimation)}
+            if edf_data_query.wire_format == 'framed':
+                try:
+                    frames = data2frames_response(edf_data['data'], edf_data['sfreq'], edf_data['ch_names'],
+                                                  dtype=edf_data_query.dtype, compression=edf_data_query.compression,
+                                                  decimation=decimation)
+                except ValueError as e:
+                    logger.warning(str(e))
+                    return ResponseUtil.failure(msg=str(e))
+                return ResponseUtil.streaming(data=frames, headers=headers)
+            return ResponseUtil.streaming(data=data2bytes_response(edf_data['data']), headers=headers)
         else:
             return ResponseUtil.error(msg=edf_data_query_result.message)
     except Exception as e:
@@ -54,7 +54,7 @@ class EdfDao:
                  .order_by(SysEdf.edf_id)
                  .distinct())
         edf_list = PageUtil.paginate(query, query_object.page_num, query_object.page_size, is_page,
-                                     exclude_columns=['edf_path'])
+                                     exclude_columns=['edf_path', 'edf_meta'])
 
         return edf_list
 
@@ -75,6 +75,17 @@ class EdfDao:
 
         return db_edf
 
+    @classmethod
+    def edit_edf_dao(cls, db: Session, edf: dict):
+        """
+        编辑Edf数据库操作
+        :param db: orm对象
+        :param edf: 需要更新的edf字典
+        """
+        db.query(SysEdf) \
+            .filter(SysEdf.edf_id == edf.get('edf_id')) \
+            .update(edf)
+
     @classmethod
     def delete_edf_dao(cls, db: Session, edf: EdfModel):
         """
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, FLOAT
+from sqlalchemy import Column, Integer, String, DateTime, FLOAT, Text
 from config.database import Base
 from datetime import datetime
 
@@ -13,8 +13,11 @@ class SysEdf(Base):
     edf_name = Column(String(255), default='', comment='EDF文件名')
     edf_sfreq = Column(FLOAT, default='', comment='EDF采样频率')
     edf_time = Column(FLOAT, default='', comment='EDF采样时间')
+    edf_n_samples = Column(Integer, nullable=True, comment='EDF样本点数')
+    edf_meta = Column(Text, nullable=True, comment='EDF元信息（JSON：记录布局、各通道物理量范围及均值/标准差）')
     edf_path = Column(String(255), default='', comment='EDF文件路径')
     valid_channels = Column(String(255), default='', comment='有效通道')
+    edf_status = Column(String(16), default='ready', comment='EDF状态（processing处理中 ready就绪 failed失败）')
     upload_by = Column(String(64), default='', comment='上传者')
     upload_time = Column(DateTime, default=datetime.now(), comment='上传时间')
     remark = Column(String(500), nullable=True, default='', comment='备注')
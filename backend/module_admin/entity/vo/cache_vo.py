@@ -12,6 +12,7 @@ class CacheMonitorModel(BaseModel):
     command_stats: Optional[List] = []
     db_size: Optional[int] = None
     info: Optional[dict] = {}
+    edf_raw_cache: Optional[dict] = {}
 
 
 class CacheInfoModel(BaseModel):
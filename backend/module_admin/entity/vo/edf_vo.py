@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from pydantic.alias_generators import to_camel
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from module_admin.annotation.pydantic_annotation import as_query
 
@@ -15,8 +15,11 @@ class EdfModel(BaseModel):
     edf_name: Optional[str] = None
     edf_sfreq: Optional[float] = None
     edf_time: Optional[float] = None
+    edf_n_samples: Optional[int] = None
+    edf_meta: Optional[str] = None
     edf_path: Optional[str] = None
     valid_channels: Optional[str] = None
+    edf_status: Optional[Literal['processing', 'ready', 'failed']] = None
     upload_by: Optional[str] = None
     upload_time: Optional[datetime] = None
     remark: Optional[str] = None
@@ -84,6 +87,19 @@ class EdfUserPageQueryModel(EdfUserQueryModel):
     page_size: int = 10
 
 
+class EdfJobStatusModel(BaseModel):
+    """
+    Edf后台处理任务状态模型
+    """
+    model_config = ConfigDict(alias_generator=to_camel, from_attributes=True)
+
+    edf_id: int
+    edf_status: Optional[str] = None
+    stage: Optional[str] = None
+    progress: float = 0.0
+    message: Optional[str] = None
+
+
 @as_query
 class EdfRawQueryModel(BaseModel):
     """
@@ -102,6 +118,12 @@ class EdfDataQueryModel(EdfRawQueryModel):
     """
     start_time: int = None
     end_time: int = None
+    mode: Literal['raw', 'envelope'] = 'raw'  # envelope：按像素数从 min/max 金字塔中取包络
+    pixels: int = 2000  # envelope 模式下的目标像素数（横轴宽度）
+    # 传输格式：legacy 为无帧头的 float64 流（默认，兼容旧前端）；framed 为带帧头的格式，见 data2frames_response
+    wire_format: Literal['legacy', 'framed'] = 'legacy'
+    dtype: Literal['float32', 'int16'] = 'float32'  # 仅 framed 格式有效
+    compression: Literal['none', 'lz4', 'zstd'] = 'none'  # 仅 framed 格式有效
 
 
 class EdfDataAnalyseGenericModel(BaseModel):
@@ -115,6 +137,13 @@ class EdfDataAnalyseGenericModel(BaseModel):
     start_time: float
 
 
+class EdfDataAnalyseESCSDModel(EdfDataAnalyseGenericModel):
+    """
+    Edf数据分析ESCSD模型
+    """
+    render: bool = False  # 是否生成特征图/STFT/结果图，默认只返回预测结果
+
+
 class EdfDataAnalyseADModel(EdfDataAnalyseGenericModel):
     """
     Edf数据分析AD模型
@@ -124,6 +153,18 @@ class EdfDataAnalyseADModel(EdfDataAnalyseGenericModel):
     arti_list: list
 
 
+class EdfDataAnalyseADEnsembleModel(BaseModel):
+    """
+    Edf数据AD多组合集成分析模型
+    """
+    model_config = ConfigDict(alias_generator=to_camel, from_attributes=True)
+
+    edf_id: int
+    start_time: int
+    arti_list: list
+    methods: Optional[List[str]] = None  # 为空时使用全部组合
+
+
 class EdfDataAnalyseSpiDModel(EdfDataAnalyseGenericModel):
     """
     Edf数据分析SpiD模型
@@ -137,3 +178,23 @@ class EdfDataAnalyseSRDModel(EdfDataAnalyseGenericModel):
     """
     stop_time: float
     ch_idx: int
+    # 传输格式：json 为每行一个 JSON（默认，兼容旧前端）；framed 为带 JSON 帧头的二进制帧，见 data2stream_frame
+    wire_format: Literal['json', 'framed'] = 'json'
+    dtype: Literal['float32', 'int16'] = 'float32'  # 仅 framed 格式有效
+    decimation: int = 1  # 用于显示的抽取倍数（每 decimation 个样本点取一个），1 表示不抽取
+
+
+class EdfDataScanESCSDModel(BaseModel):
+    """
+    Edf数据ESCSD整段扫描模型
+    """
+    model_config = ConfigDict(alias_generator=to_camel, from_attributes=True)
+
+    edf_id: int
+    method: str
+    start_time: Optional[float] = None  # 为空时从记录开头扫描
+    stop_time: Optional[float] = None  # 为空时扫描到记录结尾
+    stride: Optional[float] = None  # 窗口步长（秒），为空时使用默认值
+    batch_size: Optional[int] = None
+    merge_events: bool = True
+    threshold: Optional[float] = None  # SD 模型的发作概率阈值
@@ -3,6 +3,7 @@ from module_admin.entity.vo.cache_vo import *
 from config.env import RedisInitKeyConfig
 from config.get_redis import RedisUtil
 from module_admin.entity.vo.common_vo import CrudResponseModel
+from module_admin.service.edf_service import EdfService
 
 
 class CacheService:
@@ -38,7 +39,8 @@ class CacheService:
         result = CacheMonitorModel(
             commandStats=command_stats,
             dbSize=db_size,
-            info=info
+            info=info,
+            edfRawCache=EdfService.data_cache.stats()
         )
 
         return result
@@ -185,6 +187,8 @@ class CacheService:
             # ** 用于解构字典，可以在函数调用时拆开字典传参，或将多个字典合并成一个新的字典
             await request.app.state.redis.delete(*cache_keys)
 
+        EdfService.data_cache.clear()
+
         result = dict(is_success=True, message="所有缓存清除成功")
         await RedisUtil.init_sys_dict(request.app.state.redis)
         await RedisUtil.init_sys_config(request.app.state.redis)
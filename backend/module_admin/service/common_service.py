@@ -2,9 +2,11 @@ from datetime import datetime
 from fastapi import Request, BackgroundTasks, UploadFile
 from os import path, makedirs
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
-from config.env import UploadConfig
+from config.env import EdfCacheConfig, UploadConfig
 from module_admin.entity.vo.common_vo import *
+from utils.edf_cache_util import EdfPyramidUtil
 from utils.edf_util import EdfUtil
 from utils.log_util import logger
 from utils.upload_util import UploadUtil
@@ -15,12 +17,34 @@ class CommonService:
     通用模块服务层
     """
 
+    @staticmethod
+    def save_upload_file(file: UploadFile, filepath: str):
+        """
+        将上传文件逐块写入磁盘（同步阻塞，需在线程池中调用）
+        :param file: 上传文件对象
+        :param filepath: 目标路径
+        """
+        # 以二进制写模式将文件数据从一个源文件逐块写入到目标文件（流式写出大型文件）
+        with open(filepath, 'wb') as f:
+            for chunk in iter(lambda: file.file.read(1024 * 1024 * 10), b''):  # 每次调用它都会从 file.file 读取 10 MB 的数据
+                # iter 函数创建一个迭代器，每次调用迭代器时，它都会调用 lambda 函数以获取下一个值（在这里是读取的文件数据块）
+                # b'' 是哨兵值，当 file.file.read 返回空字节串（即文件已读取完毕）时，迭代结束
+                # eg：file.file 是一个大小为 25 MB 的文件，代码执行过程如下：
+                # 第一次调用 lambda 函数，读取第一个 10 MB 数据块。
+                # 第二次调用 lambda 函数，读取第二个 10 MB 数据块。
+                # 第三次调用 lambda 函数，读取剩余的 5 MB 数据块。
+                # 第四次调用 lambda 函数，返回 b''（因为文件已读取完毕）。
+                # 迭代器检测到返回值等于哨兵值 b''，迭代停止。
+                f.write(chunk)
+
     @classmethod
-    def upload_service(cls, request: Request, file: UploadFile):
+    async def upload_service(cls, request: Request, file: UploadFile, normalize: bool = True):
         """
         将用户上传的文件保存到服务器的指定位置，并返回上传结果service
+        文件写入与edf规范化均在线程池中执行，不阻塞事件循环
         :param request: Request对象
         :param file: 上传文件对象
+        :param normalize: 是否在上传后立即规范化edf（为 False 时由调用方在后台任务中规范化）
         :return: 上传结果
         """
 
@@ -47,28 +71,24 @@ class CommonService:
         # files/upload_path/upload/2024/07/05/demo_edf_20240705132949A605.edf
         filepath = path.join(dir_path, filename)
 
-        # 以二进制写模式将文件数据从一个源文件逐块写入到目标文件（流式写出大型文件）
-        with open(filepath, 'wb') as f:
-            for chunk in iter(lambda: file.file.read(1024 * 1024 * 10), b''):  # 每次调用它都会从 file.file 读取 10 MB 的数据
-                # iter 函数创建一个迭代器，每次调用迭代器时，它都会调用 lambda 函数以获取下一个值（在这里是读取的文件数据块）
-                # b'' 是哨兵值，当 file.file.read 返回空字节串（即文件已读取完毕）时，迭代结束
-                # eg：file.file 是一个大小为 25 MB 的文件，代码执行过程如下：
-                # 第一次调用 lambda 函数，读取第一个 10 MB 数据块。
-                # 第二次调用 lambda 函数，读取第二个 10 MB 数据块。
-                # 第三次调用 lambda 函数，读取剩余的 5 MB 数据块。
-                # 第四次调用 lambda 函数，返回 b''（因为文件已读取完毕）。
-                # 迭代器检测到返回值等于哨兵值 b''，迭代停止。
-                f.write(chunk)
+        await run_in_threadpool(cls.save_upload_file, file, filepath)
 
         raw_info = None
         try:
             # 如果文件是.edf，则读取文件并进行规范化处理
-            if file.filename.lower().endswith('.edf'):
-                raw_info = EdfUtil.normalize_edf(filepath, None)
+            if normalize and file.filename.lower().endswith('.edf'):
+                raw_info = await run_in_threadpool(EdfUtil.normalize_edf, filepath, None)
         except Exception as e:
             logger.error(f'Error normalizing EDF file: {file.filename}. Error info: {str(e)}')
             return CrudResponseModel(is_success=False, message=f'{file.filename} 规范化失败: {str(e)}')
 
+        if raw_info is not None and EdfCacheConfig.PYRAMID_EAGER_BUILD:
+            try:
+                await run_in_threadpool(EdfPyramidUtil.build_pyramid, filepath)
+            except Exception as e:
+                # 金字塔生成失败不影响上传，首次请求包络时会重新生成
+                logger.warning(f'Error building EDF pyramid: {file.filename}. Error info: {str(e)}')
+
         result = CrudResponseModel(
             is_success=True,
             result=UploadResponseModel(
@@ -1,9 +1,13 @@
-from mne import io
+from json import dumps, loads
 from os.path import exists
 
 from module_admin.dao.edf_dao import *
 from module_admin.entity.vo.common_vo import CrudResponseModel
 from utils.common_util import CamelCaseUtil
+from config.env import EdfCacheConfig
+from config.get_db import get_db_context
+from utils.edf_cache_util import EdfCacheUtil, EdfPyramidUtil, EdfRawCache
+from utils.edf_util import EdfUtil
 from utils.log_util import logger
 
 
@@ -11,7 +15,8 @@ class EdfService:
     """
     Edf管理模块服务层
     """
-    data_cache = {}
+    data_cache = EdfRawCache(EdfCacheConfig.RAW_CACHE_MAX_BYTES)
+    job_status = {}  # edf_id -> EdfJobStatusModel，后台规范化任务的实时进度（仅当前进程内，任务结束后以数据库中的状态为准）
 
     @classmethod
     def get_edf_by_id_services(cls, query_db: Session, edf_id: int):
@@ -44,7 +49,7 @@ class EdfService:
         """
         新增Edf信息service
         """
-        result = dict(is_success=True, message='')
+        result = dict(is_success=True, message='', result=[])
         messages = []
         try:
             for edf in page_object.edf_list:
@@ -54,6 +59,7 @@ class EdfService:
                     messages.append(f'{edf.edf_name} 已存在')
                 else:
                     EdfDao.add_edf_user_dao(query_db, EdfUserModel(edfId=added_edf.edf_id, userId=page_object.user_id))
+                    result['result'].append(added_edf.edf_id)
                     messages.append(f'{edf.edf_name} 添加成功')
             query_db.commit()
         except Exception as e:
@@ -63,6 +69,128 @@ class EdfService:
         result['message'] = ';'.join(messages)
         return CrudResponseModel(**result)
 
+    @classmethod
+    def normalize_edf_job_services(cls, edf_id: int, edf_path: str):
+        """
+        后台任务：规范化上传的edf并将其状态由 processing 更新为 ready（失败时为 failed），在线程池中执行
+        """
+        cls.job_status[edf_id] = EdfJobStatusModel(edfId=edf_id, edfStatus='processing', stage='normalizing',
+                                                   progress=0.1, message='正在规范化EDF')
+        try:
+            raw_info = EdfUtil.normalize_edf(edf_path, None)
+
+            # 预先生成解码缓存，首次浏览/分析时无需再解码edf
+            cls.job_status[edf_id] = EdfJobStatusModel(edfId=edf_id, edfStatus='processing', stage='caching',
+                                                       progress=0.5, message='正在生成EDF缓存')
+            try:
+                EdfCacheUtil.build_sidecar(edf_path)
+                if EdfCacheConfig.PYRAMID_EAGER_BUILD:
+                    EdfPyramidUtil.build_pyramid(edf_path)
+            except Exception as e:
+                # 缓存生成失败不影响使用，首次读取时会重新生成
+                logger.warning(f'Error building EDF cache: {edf_path}. Error info: {str(e)}')
+
+            cls.job_status[edf_id] = EdfJobStatusModel(edfId=edf_id, edfStatus='processing', stage='metadata',
+                                                       progress=0.8, message='正在统计EDF元信息')
+            edf_meta = EdfUtil.get_edf_meta(edf_path)
+
+            with get_db_context() as query_db:
+                EdfDao.edit_edf_dao(query_db, dict(edf_id=edf_id,
+                                                   edf_sfreq=raw_info['sfreq'],
+                                                   edf_time=raw_info['time'],
+                                                   edf_n_samples=edf_meta['n_samples'],
+                                                   edf_meta=dumps(edf_meta, ensure_ascii=False),
+                                                   valid_channels=raw_info['valid_channels'],
+                                                   edf_status='ready'))
+                query_db.commit()
+            logger.info(f'ID为 {edf_id} 的EDF规范化完成')
+        except Exception as e:
+            logger.exception(e)
+            try:
+                with get_db_context() as query_db:
+                    EdfDao.edit_edf_dao(query_db, dict(edf_id=edf_id,
+                                                       edf_status='failed',
+                                                       remark=f'规范化失败: {str(e)}'[:500]))
+                    query_db.commit()
+            except Exception as db_error:
+                logger.error(f'Failed to update status of edf {edf_id}. Error info: {str(db_error)}')
+        finally:
+            cls.job_status.pop(edf_id, None)
+
+    @classmethod
+    def get_edf_job_status_services(cls, query_db: Session, edf_id: int):
+        """
+        获取edf后台处理任务状态service
+        """
+        job_status = cls.job_status.get(edf_id)
+        if job_status is not None:
+            return job_status
+        edf_record = EdfDao.get_edf_by_id(query_db, edf_id)
+        if not edf_record:
+            return None
+        edf_status = edf_record.edf_status or 'ready'
+        return EdfJobStatusModel(edfId=edf_id,
+                                 edfStatus=edf_status,
+                                 progress=1.0 if edf_status == 'ready' else 0.0,
+                                 message=edf_record.remark if edf_status == 'failed' else None)
+
+    @classmethod
+    def check_edf_analysable_services(cls, query_db: Session, edf_id: int, channels: List[str] = None,
+                                      sfreq: float = None, start_time: float = None, stop_time: float = None,
+                                      ch_idx: int = None):
+        """
+        分析前根据数据库中保存的edf元信息校验通道、采样率及时间范围service（不打开edf文件）
+        """
+        result = dict(is_success=False, message='')
+        edf_record = EdfDao.get_edf_by_id(query_db, edf_id)
+        if not edf_record:
+            result['message'] = '未找到对应的EDF记录，请重新导入！'
+            return CrudResponseModel(**result)
+        if edf_record.edf_status == 'processing':
+            result['message'] = '此EDF文件正在后台处理中，请稍后再试！'
+            return CrudResponseModel(**result)
+        if edf_record.edf_status == 'failed':
+            result['message'] = '此EDF文件规范化失败，请重新导入！'
+            return CrudResponseModel(**result)
+
+        valid_channels = edf_record.valid_channels.split(',') if edf_record.valid_channels else []
+        if channels:
+            missing_channels = [ch for ch in channels if ch not in valid_channels]
+            if missing_channels:
+                result['message'] = f'通道数不是 {len(channels)}（缺少 {",".join(missing_channels)}），无法进行分析'
+                return CrudResponseModel(**result)
+        if ch_idx is not None and not 0 <= ch_idx < len(valid_channels):
+            result['message'] = f'通道索引 {ch_idx} 超出范围（共 {len(valid_channels)} 个通道）'
+            return CrudResponseModel(**result)
+        if sfreq is not None and edf_record.edf_sfreq is not None and edf_record.edf_sfreq != sfreq:
+            result['message'] = f'采样率为 {edf_record.edf_sfreq:g}Hz，该模型要求 {sfreq:g}Hz'
+            return CrudResponseModel(**result)
+
+        duration = edf_record.edf_n_samples / edf_record.edf_sfreq if edf_record.edf_n_samples else edf_record.edf_time
+        if start_time is not None and duration is not None:
+            stop = stop_time if stop_time is not None else start_time
+            if start_time < 0 or stop > duration or (stop_time is not None and start_time >= stop_time):
+                result['message'] = f'时间范围有误（EDF时长为 {duration:g}s）'
+                return CrudResponseModel(**result)
+
+        result['is_success'] = True
+        result['message'] = '校验通过'
+        return CrudResponseModel(**result)
+
+    @classmethod
+    def get_edf_channel_stats_services(cls, query_db: Session, edf_id: int, channels: List[str]):
+        """
+        获取上传时统计的各通道均值/标准差（微伏）service
+        :return: (mean, std)，按 channels 的顺序排列；没有元信息时返回 None
+        """
+        edf_record = EdfDao.get_edf_by_id(query_db, edf_id)
+        if not edf_record or not edf_record.edf_meta:
+            return None
+        channel_meta = {channel['name']: channel for channel in loads(edf_record.edf_meta)['channels']}
+        if any(ch not in channel_meta or not channel_meta[ch]['std'] for ch in channels):
+            return None
+        return [channel_meta[ch]['mean'] for ch in channels], [channel_meta[ch]['std'] for ch in channels]
+
     @classmethod
     def delete_edf_services(cls, query_db: Session, page_object: DeleteEdfModel):
         """
@@ -86,9 +214,12 @@ class EdfService:
         return CrudResponseModel(**result)
 
     @classmethod
-    def get_edf_raw_by_id_services(cls, query_db: Session, query_object: EdfRawQueryModel):
+    def get_edf_raw_by_id_services(cls, query_db: Session, query_object: EdfRawQueryModel, preload: bool = True):
         """
         根据edf的id以及所选通道获取edf raw service
+
+        :param preload: 为 True 时返回已 load_data 的 raw（经过 Raw 缓存）；
+                        为 False 时返回未加载数据的 raw（不经过缓存），供只读取部分样本的场景按需读取
         """
         result = dict(is_success=False, message='')
         try:
@@ -96,15 +227,37 @@ class EdfService:
             if not edf_record:
                 result['message'] = '未找到对应的EDF记录，请重新导入！'
                 return CrudResponseModel(**result)
+            if edf_record.edf_status == 'processing':
+                result['message'] = '此EDF文件正在后台处理中，请稍后再试！'
+                return CrudResponseModel(**result)
+            if edf_record.edf_status == 'failed':
+                result['message'] = '此EDF文件规范化失败，请重新导入！'
+                return CrudResponseModel(**result)
             edf_path = edf_record.edf_path
             if not exists(edf_path):
                 result['message'] = '此EDF文件不存在，请重新导入！'
                 return CrudResponseModel(**result)
 
-            raw = io.read_raw_edf(edf_path)
-            if query_object.selected_channels:
-                selected_channels = query_object.selected_channels.split(',')
-                raw.pick(selected_channels)
+            if not preload:
+                raw = EdfCacheUtil.read_raw(edf_path)
+                if query_object.selected_channels:
+                    raw.pick(query_object.selected_channels.split(','))
+                result['result'] = raw
+                result['message'] = f'成功获取ID为 {query_object.edf_id} 的EDF的raw！'
+                result['is_success'] = True
+                return CrudResponseModel(**result)
+
+            cache_key = EdfRawCache.make_key(query_object.edf_id, edf_path, query_object.selected_channels)
+            raw = cls.data_cache.get(cache_key)
+            if raw is None:
+                raw = EdfCacheUtil.read_raw(edf_path)
+                if query_object.selected_channels:
+                    selected_channels = query_object.selected_channels.split(',')
+                    raw.pick(selected_channels)
+                raw.load_data()
+                # 缓存中保留原对象，返回副本
+                if cls.data_cache.put(cache_key, raw):
+                    raw = raw.copy()
             result['result'] = raw
             result['message'] = f'成功获取ID为 {query_object.edf_id} 的EDF的raw！'
             result['is_success'] = True
@@ -121,24 +274,35 @@ class EdfService:
         """
         result = dict(is_success=False, message='')
 
+        # 只读取所请求的样本窗口，内存占用与窗口大小成正比
         edf_raw_query_result = cls.get_edf_raw_by_id_services(query_db, EdfRawQueryModel(edfId=query_object.edf_id,
-                                                                                         selectedChannels=query_object.selected_channels))
+                                                                                         selectedChannels=query_object.selected_channels),
+                                                              preload=False)
         if not edf_raw_query_result.is_success:
             return edf_raw_query_result
 
         try:
             raw = edf_raw_query_result.result
-            data = raw.get_data()
+            n_times = raw.n_times
             start = query_object.start_time or 0
-            end = query_object.end_time  # end = None 表示到最后一个样本点（对于numpy，切片时如果不指定结束位置，即使用:，将自动扩展到数组的末尾）
+            end = query_object.end_time  # end = None 表示到最后一个样本点
             # for i in range(len(data)):  # 用于测试前端接收到的数据是按行发送的还是按列发送的
             #     logger.error(data[i][:10])
-            if start < 0 or (end is not None and end > data.shape[1]) or start >= (
-                    end if end is not None else data.shape[1]):
+            if start < 0 or (end is not None and end > n_times) or start >= (end if end is not None else n_times):
                 result['message'] = 'Invalid range！'
                 return CrudResponseModel(**result)
-            logger.error(data[:, start:end].shape)
-            result['result'] = data[:, start:end]
+            end = n_times if end is None else end
+
+            envelope = None
+            if query_object.mode == 'envelope':
+                edf_path = EdfDao.get_edf_by_id(query_db, query_object.edf_id).edf_path
+                envelope = EdfPyramidUtil.get_envelope(edf_path, start, end, query_object.pixels, raw.ch_names)
+            # 跨度较小（每像素样本数不足金字塔最底层）时直接返回原始样本
+            data, decimation = envelope if envelope is not None else (raw.get_data(start=start, stop=end), 1)
+            result['result'] = dict(data=data,
+                                    decimation=decimation,
+                                    sfreq=raw.info['sfreq'],
+                                    ch_names=raw.ch_names)
             result['message'] = f'成功获取ID为 {query_object.edf_id} 的EDF的数据！'
             result['is_success'] = True
             return CrudResponseModel(**result)
@@ -2,7 +2,7 @@ from contextlib import asynccontextmanager
 from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
 
-from config.env import AppConfig, EAVizConfig
+from config.env import AppConfig, EAVizConfig, UploadConfig
 from config.get_db import init_create_table
 from config.get_model import ModelUtil
 from config.get_redis import RedisUtil
@@ -31,6 +31,7 @@ from module_admin.controller.user_controller import userController
 from module_admin.controller.video_controller import videoController
 from sub_applications.handle import handle_sub_applications
 from utils.log_util import logger
+from utils.topomap_util import TopomapUtil
 
 
 # from utils.common_util import worship
@@ -54,12 +55,17 @@ async def lifespan(app: FastAPI):
     await RedisUtil.init_sys_config(app.state.redis)
     await SchedulerUtil.init_system_scheduler()
     app.state.models = await ModelUtil.init_models()
+    # 预先计算固定导联的地形图插值矩阵
+    TopomapUtil.get_interpolator()
     # 初始化全局线程池执行器用于视频处理（CPU/GPU密集型任务）
     # 使用线程池而不是进程池，因为PyTorch模型通常在同一进程内共享更高效
     # max_workers可以根据服务器配置调整，建议为CPU核心数或GPU数量
     app.state.vd_executor = ThreadPoolExecutor(max_workers=EAVizConfig.VDConfig.VD_EXECUTOR_MAX_WORKERS,
                                                thread_name_prefix="vd_processor")
     logger.info(f"VD视频处理线程池已初始化，最大并发数: {EAVizConfig.VDConfig.VD_EXECUTOR_MAX_WORKERS}")
+    # 上传后的edf规范化在该线程池中后台执行，避免阻塞事件循环
+    app.state.edf_executor = ThreadPoolExecutor(max_workers=UploadConfig.EDF_EXECUTOR_MAX_WORKERS,
+                                                thread_name_prefix="edf_processor")
 
     logger.info(f"{AppConfig.app_name}启动成功")
     yield
@@ -69,6 +75,9 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, 'vd_executor'):
         app.state.vd_executor.shutdown(wait=True)
         logger.info("VD视频处理线程池已关闭")
+    if hasattr(app.state, 'edf_executor'):
+        app.state.edf_executor.shutdown(wait=True)
+        logger.info("EDF处理线程池已关闭")
 
 
 # 初始化FastAPI对象
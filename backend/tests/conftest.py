@@ -0,0 +1,11 @@
+"""
+测试公共配置：以 backend 为根目录导入项目模块，matplotlib 使用非交互后端
+"""
+from os import chdir, environ, path
+from sys import path as sys_path
+
+BACKEND_ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+if BACKEND_ROOT not in sys_path:
+    sys_path.insert(0, BACKEND_ROOT)
+chdir(BACKEND_ROOT)  # AddressConfig.BASE_CP_ROOT 等按当前工作目录解析
+environ.setdefault('MPLBACKEND', 'Agg')
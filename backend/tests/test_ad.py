@@ -0,0 +1,132 @@
+"""
+AD 伪迹检测（CPU）：截取与偏移、标注时间（相对于 raw.first_time）以及多个组合的多数投票
+"""
+from pytest import approx, importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+torch = importorskip('torch')
+importorskip('scipy')
+importorskip('matplotlib')
+importorskip('loguru')
+
+from numpy.random import default_rng  # noqa: E402
+from numpy.testing import assert_allclose  # noqa: E402
+from torch import nn  # noqa: E402
+
+from config.env import EAVizConfig  # noqa: E402
+from eaviz.AD import setdata  # noqa: E402
+from eaviz.AD.ad import AD  # noqa: E402
+from eaviz.AD.gogogo import Art_Dec  # noqa: E402
+from utils.edf_util import EdfUtil  # noqa: E402
+
+SFREQ = 1000
+START_TIME = 20
+N_SEC = EAVizConfig.ModelConfig.AD_DURATION
+CHANNELS = ['Fp1', 'Fp2', 'F3', 'F4', 'C3', 'C4', 'P3', 'P4', 'O1', 'O2', 'F7', 'F8', 'T3', 'T4', 'T5', 'T6',
+            'Fz', 'Cz', 'Pz']
+FRONTAL_WINDOWS = [2, 3, 4, 7]
+
+
+class FixedClassifier(nn.Module):
+    """
+    分类头：对每个窗口输出固定的 logits，检出的窗口为 EB（第 0、1 列），其余为正常（第 5 列）
+    """
+
+    def __init__(self, windows):
+        super().__init__()
+        self.weight = nn.Parameter(torch.zeros(1))
+        logits = torch.full((N_SEC, 6), -10.)
+        logits[:, 5] = 10.
+        logits[windows, 0] = logits[windows, 1] = 10.
+        self.register_buffer('logits', logits)
+
+    def forward(self, x):
+        assert x.device == self.weight.device
+        return self.logits
+
+
+class FrontalAE(nn.Module):
+    """
+    异常检测模型：FRONTAL_WINDOWS 中额区两个通道的重建误差为 4（超过阈值 0.95），其余窗口完美重建
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.weight = nn.Parameter(torch.zeros(1))
+        shift = torch.zeros(N_SEC, 10, 1)
+        shift[FRONTAL_WINDOWS, :2] = 2.
+        self.register_buffer('shift', shift)
+
+    def forward(self, x):
+        return (x + self.shift,)
+
+
+def make_raw():
+    data = default_rng(0).standard_normal((len(CHANNELS), 60 * SFREQ)) * 2e-5
+    info = mne.create_info(CHANNELS, SFREQ, 'eeg')
+    return mne.io.RawArray(data, info, verbose='error')
+
+
+def test_prepare_crop_and_offset():
+    """
+    只截取分析窗口及滤波余量，得到的模型输入与对整段记录滤波后再切分的结果一致
+    """
+    raw = make_raw()
+    raw_filtered, raw_data, X, crop_start = AD.prepare(raw.copy(), START_TIME)
+
+    margin = EAVizConfig.ADConfig.FILTER_MARGIN
+    assert crop_start == START_TIME - margin
+    assert raw_filtered.first_time == approx(crop_start)
+    assert raw_data.shape == (len(CHANNELS), (N_SEC + 2 * margin) * SFREQ)
+    assert X.shape == (N_SEC, 10, SFREQ)
+
+    whole = EdfUtil.normal_filter(raw.copy()).get_data()
+    window = whole[:, START_TIME * SFREQ:(START_TIME + N_SEC) * SFREQ]
+    window = window.reshape(len(CHANNELS), N_SEC, SFREQ).transpose(1, 0, 2)
+    expected = setdata.dataset(window[:, [0, 1, 10, 11, 12, 13, 14, 15, 8, 9], :] * 1e6).numpy()
+    assert_allclose(X.numpy(), expected, rtol=0, atol=1e-4 * abs(expected).max())
+
+
+def test_prepare_window_at_recording_end():
+    """
+    分析窗口位于记录末尾时，余量截断到最后一个样本点，窗口仍完整
+    """
+    raw = make_raw()
+    start_time = int(raw.n_times / SFREQ) - N_SEC
+    _, raw_data, X, crop_start = AD.prepare(raw.copy(), start_time)
+
+    assert raw_data.shape == (len(CHANNELS), raw.n_times - (start_time - EAVizConfig.ADConfig.FILTER_MARGIN) * SFREQ)
+    assert X.shape == (N_SEC, 10, SFREQ)
+
+
+def test_art_dec_annotations(tmp_path, monkeypatch):
+    """
+    标注按游程合并，时间为原记录中的绝对时间（截取起点 + 相对时间）
+    """
+    monkeypatch.setattr(EAVizConfig.AddressConfig, 'BASE_ROOT', str(tmp_path))
+    (tmp_path / 'AD' / 'res').mkdir(parents=True)
+
+    raw_filtered, _, X, crop_start = AD.prepare(make_raw(), START_TIME)
+    annotations_list, des_list = Art_Dec(X, [1, 0], raw_filtered, START_TIME - crop_start,
+                                         FixedClassifier(FRONTAL_WINDOWS), FrontalAE(), 'AE', auto=True)
+
+    assert des_list == ['EB', 'Normal']
+    actual = sorted((round(float(onset), 6), float(duration), str(des)) for onset, duration, des in annotations_list)
+    assert actual == [(20., 2., 'Normal'), (22., 3., 'EB'), (25., 2., 'Normal'), (27., 1., 'EB'), (28., 3., 'Normal')]
+    assert (tmp_path / 'AD' / 'res' / 'res.png').exists()
+
+
+def test_ensemble_majority_vote():
+    """
+    三个组合分别检出 {2,3}、{3,4}、{4,7} 时，多数投票的结果为 {3,4}
+    """
+    models = {'A': FixedClassifier([2, 3]), 'B': FixedClassifier([3, 4]), 'C': FixedClassifier([4, 7]),
+              'AE': FrontalAE()}
+    methods = ['A_AE_BCELoss', 'B_AE_BCELoss', 'C_AE_BCELoss']
+    result = AD.ensemble(make_raw(), START_TIME, [1], methods, models)
+
+    assert result['times'] == list(range(START_TIME, START_TIME + N_SEC))
+    for method, windows in zip(methods, ([2, 3], [3, 4], [4, 7])):
+        assert numpy.flatnonzero(result['combinations'][method]['EB']).tolist() == windows
+    assert numpy.flatnonzero(result['vote']['EB']).tolist() == [3, 4]
@@ -0,0 +1,136 @@
+"""
+并发分析：绘图均按图对象保存/关闭，两个重叠的分析各自得到与单独运行时相同的结果图，中间文件不残留
+"""
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+torch = importorskip('torch')
+importorskip('scipy')
+importorskip('matplotlib')
+importorskip('loguru')
+
+from matplotlib.image import imread  # noqa: E402
+from numpy.random import default_rng  # noqa: E402
+from numpy.testing import assert_array_equal  # noqa: E402
+from torch import nn  # noqa: E402
+
+from config.env import EAVizConfig  # noqa: E402
+from eaviz.SpiD.spid import SPID  # noqa: E402
+from utils.topomap_util import TopomapUtil  # noqa: E402
+
+SFREQ = 500
+DURATION = 20
+
+
+def make_raw(correlated, seed):
+    """
+    19 通道 500Hz 的随机信号；correlated 时第 0、1 通道高度相关（模板匹配会检出大量窗口）
+    """
+    data = default_rng(seed).standard_normal((19, DURATION * SFREQ)) * 2e-5
+    if correlated:
+        data[1] = data[0] + data[1] * 0.1
+    info = mne.create_info(list(EAVizConfig.ChannelEnum.TPM.value), SFREQ, 'eeg')
+    return mne.io.RawArray(data, info, verbose='error')
+
+
+def make_spike_raw(n_bursts, seed):
+    """
+    19 通道 500Hz、60s 的随机信号，第 0 通道叠加 n_bursts 个 0.2s、200µV 的正弦波（SpiD-SS 检出的棘波）
+    """
+    data = default_rng(seed).standard_normal((19, 60 * SFREQ)) * 2e-5
+    burst = 2e-4 * numpy.sin(numpy.pi * numpy.arange(100) / 100)
+    for onset in range(2, 2 + 5 * n_bursts, 5):
+        data[0, onset * SFREQ:onset * SFREQ + 100] += burst
+    info = mne.create_info(list(EAVizConfig.ChannelEnum.TPM.value), SFREQ, 'eeg')
+    return mne.io.RawArray(data, info, verbose='error')
+
+
+class ThresholdSegmenter(nn.Module):
+    """
+    分割模型：标准化后第 0 通道超过阈值的采样点判为棘波
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.weight = nn.Parameter(torch.zeros(1))
+
+    def forward(self, x):
+        score = x[:, 0] - 3.
+        return {'seg_out': torch.stack([-score, score], dim=1)}
+
+
+def run_concurrently(func, args_list):
+    """
+    多个线程同时开始运行 func，返回各自的结果
+    """
+    barrier = Barrier(len(args_list))
+
+    def run(args):
+        barrier.wait()
+        return func(*args)
+
+    with ThreadPoolExecutor(max_workers=len(args_list)) as executor:
+        return list(executor.map(run, args_list))
+
+
+def test_spid_tm_concurrent(tmp_path, monkeypatch):
+    monkeypatch.setattr(EAVizConfig.AddressConfig, 'BASE_ROOT', str(tmp_path))
+    cases = [(True, 0), (False, 1)]
+
+    expected = [SPID.tm(make_raw(*case), 0, DURATION, run_id=f'seq-{i}') for i, case in enumerate(cases)]
+    actual = run_concurrently(SPID.tm, [(make_raw(*case), 0, DURATION, False, f'run-{i}')
+                                        for i, case in enumerate(cases)])
+
+    assert actual == expected
+    assert float(expected[0]) > float(expected[1])
+    images = []
+    for i in range(len(cases)):
+        seq_path = EAVizConfig.AddressConfig.get_spid_adr('res', f'seq-{i}')
+        run_path = EAVizConfig.AddressConfig.get_spid_adr('res', f'run-{i}')
+        images.append(imread(run_path))
+        assert_array_equal(images[-1], imread(seq_path))
+    assert images[0].shape != images[1].shape or (images[0] != images[1]).any()
+
+
+def test_plot_topomaps_concurrent(tmp_path):
+    rng = default_rng(2)
+    datasets = [rng.standard_normal((19, 11)) * 10, rng.standard_normal((19, 11)) * 50]
+    titles = [f'{t:0.3f} s' for t in range(11)]
+
+    for i, data in enumerate(datasets):
+        TopomapUtil.plot_topomaps(data, titles, str(tmp_path / f'seq-{i}.png'))
+    run_concurrently(TopomapUtil.plot_topomaps,
+                     [(data, titles, str(tmp_path / f'run-{i}.png')) for i, data in enumerate(datasets)])
+
+    for i in range(len(datasets)):
+        assert_array_equal(imread(tmp_path / f'run-{i}.png'), imread(tmp_path / f'seq-{i}.png'))
+    assert (imread(tmp_path / 'run-0.png') != imread(tmp_path / 'run-1.png')).any()
+
+
+def test_spid_ss_concurrent(tmp_path, monkeypatch):
+    """
+    SpiD-SS（含调试导出的 mat/npz 中间文件）并发运行：结果与单独运行一致，临时目录全部删除
+    """
+    monkeypatch.setattr(EAVizConfig.AddressConfig, 'BASE_ROOT', str(tmp_path))
+    monkeypatch.setattr(EAVizConfig.SpiDConfig, 'DEBUG_EXPORT', True)
+    tmp_dir = tmp_path / 'tmp'
+    tmp_dir.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_dir))
+    model = ThresholdSegmenter().eval()
+    cases = [(10, 0), (4, 1)]
+
+    expected = [SPID.ss(make_spike_raw(*case), model, 0, 60, run_id=f'seq-{i}') for i, case in enumerate(cases)]
+    actual = run_concurrently(SPID.ss, [(make_spike_raw(*case), model, 0, 60, False, None, None, f'run-{i}')
+                                        for i, case in enumerate(cases)])
+
+    assert actual == expected
+    assert float(expected[0]) > float(expected[1]) > 0
+    for i in range(len(cases)):
+        assert_array_equal(imread(EAVizConfig.AddressConfig.get_spid_adr('res', f'run-{i}')),
+                           imread(EAVizConfig.AddressConfig.get_spid_adr('res', f'seq-{i}')))
+    assert list(tmp_dir.iterdir()) == []
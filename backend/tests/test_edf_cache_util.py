@@ -0,0 +1,173 @@
+"""
+EDF 解码缓存：sidecar 在 edf 改写后失效重建，min/max 金字塔各层与原始样本一致，Raw 缓存读时复制
+"""
+from os import stat, utime
+
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+importorskip('edfio')
+importorskip('loguru')
+
+from config.env import EdfCacheConfig  # noqa: E402
+from utils.edf_cache_util import EdfCacheUtil, EdfPyramidUtil, EdfRawCache, RawEdfSidecar  # noqa: E402
+
+SFREQ = 250
+SECONDS = 13  # 3250 个样本点，不是 16 的整数倍，各层最后一个 bin 只覆盖部分样本点
+CH_NAMES = ['Fp1', 'Fp2', 'Cz']
+
+
+def write_edf(edf_path, seed=0):
+    """
+    用 mne 导出合成的 edf，并将 mtime 推后 1 秒，保证改写后 mtime 一定变化
+    """
+    rng = numpy.random.default_rng(seed)
+    data = rng.normal(scale=50e-6, size=(len(CH_NAMES), SECONDS * SFREQ))
+    raw = mne.io.RawArray(data, mne.create_info(CH_NAMES, SFREQ, 'eeg'), verbose='error')
+    mtime_ns = stat(edf_path).st_mtime_ns if edf_path.exists() else 0
+    mne.export.export_raw(str(edf_path), raw, fmt='edf', overwrite=True, verbose='error')
+    utime(edf_path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+    return str(edf_path)
+
+
+def decode(edf_path):
+    return mne.io.read_raw_edf(edf_path, preload=True, verbose='error').get_data()
+
+
+def test_sidecar_matches_edf_and_is_rebuilt_on_rewrite(tmp_path):
+    edf_path = write_edf(tmp_path / 'a.edf')
+    raw = EdfCacheUtil.read_raw(edf_path)
+    assert isinstance(raw, RawEdfSidecar)
+    numpy.testing.assert_allclose(raw.get_data(), decode(edf_path), rtol=1e-6, atol=1e-12)
+    header = EdfCacheUtil.load_sidecar_header(edf_path)
+    assert header['n_times'] == SECONDS * SFREQ and header['ch_names'] == CH_NAMES
+
+    # 改写为同样大小的另一段信号：旧 sidecar 失效，read_raw 重新生成
+    write_edf(tmp_path / 'a.edf', seed=1)
+    assert EdfCacheUtil.load_sidecar_header(edf_path) is None
+    raw = EdfCacheUtil.read_raw(edf_path)
+    assert isinstance(raw, RawEdfSidecar)
+    numpy.testing.assert_allclose(raw.get_data(), decode(edf_path), rtol=1e-6, atol=1e-12)
+    assert EdfCacheUtil.load_sidecar_header(edf_path)['source'] == EdfCacheUtil.get_source_stat(edf_path)
+
+    EdfCacheUtil.remove_sidecar(edf_path)
+    assert not (tmp_path / 'a.edf.sig').exists()
+
+
+def expected_envelope(data, start, end, decimation):
+    """
+    直接对原始样本按 bin（与 0 对齐，每个覆盖 decimation 个样本点，最后一个可能不满）取 min/max，按 min/max 交错排列
+    """
+    bins = range(start // decimation, -(-end // decimation))
+    mins = numpy.stack([data[:, b * decimation:(b + 1) * decimation].min(axis=1) for b in bins], axis=1)
+    maxs = numpy.stack([data[:, b * decimation:(b + 1) * decimation].max(axis=1) for b in bins], axis=1)
+    expected = numpy.empty((data.shape[0], 2 * len(bins)))
+    expected[:, 0::2], expected[:, 1::2] = mins, maxs
+    return expected
+
+
+def test_pyramid_levels_match_raw_min_max(tmp_path, monkeypatch):
+    monkeypatch.setattr(EdfCacheConfig, 'PYRAMID_MIN_BINS', 16)
+    edf_path = write_edf(tmp_path / 'a.edf')
+    data = EdfCacheUtil.read_raw(edf_path).get_data()
+    n_times = data.shape[1]
+
+    meta = EdfPyramidUtil.build_pyramid(edf_path)
+    assert [item['level'] for item in meta['levels']] == [4, 5, 6, 7, 8]
+    assert [item['n_bins'] for item in meta['levels']] == [204, 102, 51, 26, 13]
+
+    for level in (4, 5, 6, 7, 8):
+        decimation = 2 ** level
+        # 整段（含最后一个不满的 bin）及起止点与 bin 不对齐的窗口，像素数使得恰好选中第 level 层
+        for start, end in ((0, n_times), (37, n_times - 5), (1000, 2999)):
+            pixels = (end - start) // decimation
+            if pixels < 1 or (level < 8 and (end - start) / pixels >= 2 * decimation):
+                continue
+            envelope, got_decimation = EdfPyramidUtil.get_envelope(edf_path, start, end, pixels)
+            assert got_decimation == decimation
+            numpy.testing.assert_allclose(envelope, expected_envelope(data, start, end, decimation), rtol=1e-6)
+
+    # 选择并重排通道
+    envelope, decimation = EdfPyramidUtil.get_envelope(edf_path, 0, n_times, 200, ['Cz', 'Fp1'])
+    assert decimation == 16
+    numpy.testing.assert_allclose(envelope, expected_envelope(data[[2, 0]], 0, n_times, 16), rtol=1e-6)
+
+    # 每像素样本数不足最底层时由调用方直接读取原始样本
+    assert EdfPyramidUtil.get_envelope(edf_path, 0, 1000, 100) is None
+
+
+def test_pyramid_rebuilt_when_edf_changes(tmp_path):
+    edf_path = write_edf(tmp_path / 'a.edf')
+    n_times = SECONDS * SFREQ
+    envelope, _ = EdfPyramidUtil.get_envelope(edf_path, 0, n_times, 100)
+    assert EdfPyramidUtil.load_pyramid_meta(edf_path) is not None
+
+    # 只修改 mtime 即视为失效
+    mtime_ns = stat(edf_path).st_mtime_ns + 10 ** 9
+    utime(edf_path, ns=(mtime_ns, mtime_ns))
+    assert EdfPyramidUtil.load_pyramid_meta(edf_path) is None
+
+    # 改写后返回新信号的包络
+    write_edf(tmp_path / 'a.edf', seed=1)
+    rebuilt, decimation = EdfPyramidUtil.get_envelope(edf_path, 0, n_times, 100)
+    data = EdfCacheUtil.read_raw(edf_path).get_data()
+    numpy.testing.assert_allclose(rebuilt, expected_envelope(data, 0, n_times, decimation), rtol=1e-6)
+    assert not numpy.allclose(rebuilt, envelope)
+    assert EdfPyramidUtil.load_pyramid_meta(edf_path)['source'] == EdfCacheUtil.get_source_stat(edf_path)
+
+    EdfPyramidUtil.remove_pyramid(edf_path)
+    assert not (tmp_path / 'a.edf.pyr').exists()
+
+
+def test_raw_cache_copy_on_read(tmp_path):
+    edf_path = write_edf(tmp_path / 'a.edf')
+    raw = mne.io.read_raw_edf(edf_path, preload=True, verbose='error')
+    expected = raw.get_data()
+    cache = EdfRawCache(max_bytes=10 * raw.get_data().nbytes)
+    key = EdfRawCache.make_key(1, edf_path)
+    assert cache.get(key) is None
+    assert cache.put(key, raw)
+
+    # 调用方对取出的 raw 原地修改，不影响缓存中的 raw
+    cached = cache.get(key)
+    cached.crop(tmin=1, tmax=2)
+    cached.pick(['Cz'])
+    cached.set_annotations(mne.Annotations([0.5], [0.1], ['spike'], orig_time=cached.annotations.orig_time))
+    cache.get(key).apply_function(lambda x: x * 0)
+
+    again = cache.get(key)
+    assert again is not raw and again.ch_names == raw.ch_names
+    numpy.testing.assert_array_equal(again.get_data(), expected)
+    assert len(again.annotations) == len(raw.annotations)
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 1
+
+
+def test_raw_cache_invalidated_on_rewrite(tmp_path):
+    edf_path = write_edf(tmp_path / 'a.edf')
+    raw = mne.io.read_raw_edf(edf_path, preload=True, verbose='error')
+    nbytes = raw.get_data().nbytes
+    cache = EdfRawCache(max_bytes=2 * nbytes)
+    old_key = EdfRawCache.make_key(1, edf_path)
+    cache.put(old_key, raw)
+    cache.put(EdfRawCache.make_key(1, edf_path, 'Fp1,Fp2'), raw.copy().pick(['Fp1', 'Fp2']))
+
+    # 改写后键（mtime）变化，不会命中旧版本；放入新版本时移除同一 edf 的所有旧版本
+    write_edf(tmp_path / 'a.edf', seed=1)
+    new_key = EdfRawCache.make_key(1, edf_path)
+    assert new_key != old_key and cache.get(new_key) is None
+    new_raw = mne.io.read_raw_edf(edf_path, preload=True, verbose='error')
+    cache.put(new_key, new_raw)
+    assert cache.get(old_key) is None
+    assert cache.stats()['entries'] == 1 and cache.stats()['current_bytes'] == nbytes
+    numpy.testing.assert_array_equal(cache.get(new_key).get_data(), new_raw.get_data())
+
+    # 超出字节预算时淘汰最久未使用的项
+    cache.put(EdfRawCache.make_key(2, edf_path), new_raw.copy())
+    cache.get(new_key)
+    cache.put(EdfRawCache.make_key(3, edf_path), new_raw.copy())
+    assert cache.get(EdfRawCache.make_key(2, edf_path)) is None and cache.get(new_key) is not None
+    assert cache.stats()['evictions'] == 1
+
+    cache.invalidate(1)
+    assert cache.get(new_key) is None and cache.stats()['entries'] == 1
@@ -0,0 +1,81 @@
+"""
+滤波结果缓存：按块（前后带 FILTER_MARGIN_SECOND）滤波后取出的任意窗口与对整段记录滤波（EdfUtil.normal_filter 等）一致，
+包括 margin 被记录两端截断的首尾窗口
+"""
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+importorskip('edfio')
+importorskip('loguru')
+
+from config.env import EdfCacheConfig  # noqa: E402
+from utils.edf_cache_util import EdfCacheUtil, EdfFilterCache, RawEdfSidecar  # noqa: E402
+from utils.edf_util import EdfUtil  # noqa: E402
+
+SFREQ = 250
+SECONDS = 150  # 默认 60 秒一块：3 块，最后一块不满
+CH_NAMES = ['Fp1', 'Fp2', 'Cz']
+
+
+def write_edf(edf_path):
+    """
+    α 节律 + 50Hz 工频 + 慢漂移 + 噪声，使陷波和带通都有实际作用
+    """
+    rng = numpy.random.default_rng(0)
+    times = numpy.arange(SECONDS * SFREQ) / SFREQ
+    data = (30 * numpy.sin(2 * numpy.pi * 10 * times) + 20 * numpy.sin(2 * numpy.pi * 50 * times) +
+            40 * numpy.sin(2 * numpy.pi * 0.1 * times) + 5 * rng.standard_normal((len(CH_NAMES), times.size))) * 1e-6
+    raw = mne.io.RawArray(data, mne.create_info(CH_NAMES, SFREQ, 'eeg'), verbose='error')
+    mne.export.export_raw(str(edf_path), raw, fmt='edf', verbose='error')
+    return str(edf_path)
+
+
+def whole_record(edf_path, filter_func):
+    """
+    原先的方式：解码整段记录后直接滤波（不经过缓存）
+    """
+    return filter_func(mne.io.read_raw_edf(edf_path, preload=True, verbose='error')).get_data()
+
+
+def assert_filtered_equal(actual, expected):
+    # 缓存以 float32 存储
+    numpy.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6 * numpy.abs(expected).max())
+
+
+def check_windows(tmp_path, monkeypatch, fill_max_blocks):
+    monkeypatch.setattr(EdfCacheConfig, 'FILTER_CACHE_PATH', str(tmp_path / 'filtered'))
+    monkeypatch.setattr(EdfCacheConfig, 'FILTER_FILL_MAX_BLOCKS', fill_max_blocks)
+    edf_path = write_edf(tmp_path / 'a.edf')
+    n_times = SECONDS * SFREQ
+    block = EdfCacheConfig.FILTER_BLOCK_SECOND * SFREQ
+    # 先取中间的窗口使缓存出现不连续的空洞，再取首尾（margin 被截断）、跨块及整段
+    windows = [(block + 100, block + 1350), (0, 1250), (n_times - 1250, n_times), (block - 500, block + 500),
+               (2 * block - 10, n_times), (0, n_times)]
+
+    for spec, filter_func in ((EdfUtil.NORMAL_FILTER_SPEC, EdfUtil.normal_filter),
+                              (EdfUtil.NOTCH_FILTER_SPEC, lambda raw: raw.notch_filter(freqs=50, verbose='error'))):
+        expected = whole_record(edf_path, filter_func)
+        for start, stop in windows:
+            assert_filtered_equal(EdfFilterCache.get_data(edf_path, CH_NAMES, spec, start, stop),
+                                  expected[:, start:stop])
+
+    # EdfUtil 对截取后的 sidecar raw 滤波时经过缓存，结果等同于整段滤波后截取
+    expected = whole_record(edf_path, EdfUtil.normal_filter)
+    for start, stop in windows:
+        raw = EdfCacheUtil.read_raw(edf_path)
+        assert isinstance(raw, RawEdfSidecar)
+        raw.crop(tmin=start / SFREQ, tmax=(stop - 1) / SFREQ)
+        filtered = EdfUtil.normal_filter(raw)
+        assert filtered.info['highpass'] == 1 and filtered.info['lowpass'] == 70
+        assert_filtered_equal(filtered.get_data(), expected[:, start:stop])
+    assert len(list((tmp_path / 'filtered').iterdir())) == 2
+
+
+def test_windows_match_whole_record(tmp_path, monkeypatch):
+    check_windows(tmp_path, monkeypatch, EdfCacheConfig.FILTER_FILL_MAX_BLOCKS)
+
+
+def test_windows_match_whole_record_block_by_block(tmp_path, monkeypatch):
+    # 每次只滤波一块，相邻块各自带 margin 滤波
+    check_windows(tmp_path, monkeypatch, 1)
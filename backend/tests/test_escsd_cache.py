@@ -0,0 +1,49 @@
+"""
+ESC/SD 单窗口结果缓存的淘汰
+"""
+from os import makedirs, path, utime
+from time import time
+
+from pytest import importorskip
+
+importorskip('numpy')
+importorskip('torch')
+importorskip('mne')
+importorskip('seaborn')
+importorskip('cv2')
+importorskip('loguru')
+
+from config.env import EAVizConfig  # noqa: E402
+from eaviz.ESC_SD.escsd import ESCSD  # noqa: E402
+
+
+def make_entry(model_name, key, size, age):
+    result_path = ESCSD.get_adr(model_name, 'result', key)
+    makedirs(path.dirname(result_path), exist_ok=True)
+    with open(result_path, 'w', encoding='utf-8') as f:
+        f.write('{"pad": "' + 'x' * (size - 11) + '"}')
+    mtime = time() - age
+    utime(result_path, (mtime, mtime))
+    return path.dirname(result_path)
+
+
+def test_evict_cache_by_age_and_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(EAVizConfig.AddressConfig, 'BASE_ROOT', str(tmp_path))
+    monkeypatch.setattr(EAVizConfig.ESCSDConfig, 'CACHE_MAX_AGE_SECONDS', 3600)
+    monkeypatch.setattr(EAVizConfig.ESCSDConfig, 'CACHE_MAX_BYTES', 2500)
+
+    expired = make_entry('DSMN-ESS', '1_0_DSMN-ESS', 10, 7200)
+    oldest = make_entry('R3DClassifier', '1_0_R3DClassifier', 1000, 300)
+    older = make_entry('DSMN-ESS', '1_4_DSMN-ESS', 1000, 200)
+    newest = make_entry('R3DClassifier', '1_4_R3DClassifier', 1000, 100)
+    # 尚未写入 result.json 的条目（正在分析）不参与淘汰
+    writing = path.dirname(ESCSD.get_adr('DSMN-ESS', 'result', '1_8_DSMN-ESS'))
+    makedirs(writing)
+
+    # 命中缓存时刷新最近使用时间
+    assert ESCSD.load_cached_result('R3DClassifier', '1_0_R3DClassifier') is not None
+    ESCSD.evict_cache()
+
+    assert not path.exists(expired)
+    assert path.exists(oldest) and not path.exists(older) and path.exists(newest)
+    assert path.exists(writing)
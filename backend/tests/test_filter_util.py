@@ -0,0 +1,103 @@
+"""
+FilterUtil / EdfFilterCache 滤波相关测试
+"""
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+importorskip('scipy')
+mne = importorskip('mne')
+
+from numpy.random import default_rng  # noqa: E402
+from numpy.testing import assert_allclose, assert_array_equal  # noqa: E402
+from scipy.signal import butter, filtfilt  # noqa: E402
+
+from config.env import EAVizConfig  # noqa: E402
+from eaviz.SpiD.edf2mat import filter_2sIIR  # noqa: E402
+from utils.edf_cache_util import EdfFilterCache  # noqa: E402
+from utils.filter_util import FilterUtil  # noqa: E402
+
+
+def test_numpy_scalar_band():
+    """
+    numpy 标量（float32 / int64）作为截止频率时与 Python float 的结果一致，并命中同一个设计缓存
+    """
+    x = default_rng(0).standard_normal((3, 5000))
+    assert_array_equal(FilterUtil.filtfilt(x, 4, numpy.float32(30), 500, 'low'),
+                       FilterUtil.filtfilt(x, 4, 30.0, 500, 'low'))
+    assert_array_equal(FilterUtil.filtfilt(x, 6, (numpy.int64(1), numpy.float32(70.5)), numpy.int64(500)),
+                       FilterUtil.filtfilt(x, 6, (1.0, 70.5), 500.0))
+    assert FilterUtil.get_sos(4, numpy.float32(30), numpy.int64(500), 'low') is FilterUtil.get_sos(4, 30, 500, 'low')
+
+
+def test_update_filter_info_matches_raw_filter():
+    """
+    滤波缓存写回数据后更新的 highpass / lowpass 与 raw.filter 一致
+    """
+    info = mne.create_info(['Fp1', 'Fp2'], 500., 'eeg')
+    data = default_rng(0).standard_normal((2, 5000)) * 1e-5
+    spec = (('notch', 50), ('bandpass', 1, 70))
+
+    cached = EdfFilterCache.update_filter_info(mne.io.RawArray(data, info, verbose='error'), spec)
+    filtered = mne.io.RawArray(data, info, verbose='error').filter(1, 70, verbose='error')
+    assert cached.info['highpass'] == filtered.info['highpass'] == 1.
+    assert cached.info['lowpass'] == filtered.info['lowpass'] == 70.
+
+
+def test_filtfilt_ba_matches_scipy(monkeypatch):
+    """
+    SRD 特征提取（12 阶 80-450Hz 带通，fs=1000）使用的 filtfilt_ba 与原先的 butter + filtfilt(b, a) 一致，
+    按通道分块并行时也一致
+    """
+    monkeypatch.setattr(EAVizConfig.FilterConfig, 'BLOCK_CHANNELS', 4)
+    monkeypatch.setattr(EAVizConfig.FilterConfig, 'MAX_WORKERS', 4)
+    x = default_rng(0).standard_normal((2, 11, 100))
+    b, a = butter(12, [80 / 500, 450 / 500], btype='bandpass')
+    expected = filtfilt(b, a, x)
+    actual = FilterUtil.filtfilt_ba(x, 12, (80, 450), 1000, 'bandpass')
+    assert_allclose(actual, expected, rtol=0, atol=1e-12 * numpy.abs(expected).max())
+
+    # Excellent.bandpass_filter：2 阶 1-70Hz
+    x = default_rng(1).standard_normal((5, 1, 1000))
+    b, a = butter(2, [1 / 500, 70 / 500], btype='band')
+    assert_array_equal(FilterUtil.filtfilt_ba(x, 2, (1., 70.), 1000), filtfilt(b, a, x, axis=-1))
+
+
+def test_sos_matches_ba_low_order():
+    """
+    低阶滤波器（SpiD / 普通滤波使用）下 sos 形式与原先 ba 形式的结果在舍入误差内一致
+    """
+    x = default_rng(2).standard_normal((4, 20000))
+    for order, band, btype in ((2, (0.5, 70.), 'bandpass'), (4, 30., 'low'), (3, 1., 'high')):
+        b, a = butter(order, numpy.asarray(band) / 250, btype)
+        expected = filtfilt(b, a, x)
+        assert_allclose(FilterUtil.filtfilt(x, order, band, 500, btype), expected,
+                        rtol=0, atol=1e-6 * numpy.abs(expected).max())
+
+
+def filter_2sIIR_by_loop(sig, f, fs, n, type='low'):
+    """
+    原先逐通道 butter(ba) + filtfilt 的 filter_2sIIR
+    """
+    sigfilter = numpy.zeros_like(sig)
+    if type.lower() == 'bandpass':
+        b, a = butter(n, f[0] / (fs / 2), 'high')
+        for i in range(sig.shape[0]):
+            sigfilter[i, :] = filtfilt(b, a, sig[i, :], padtype='odd', padlen=3 * (max(len(b), len(a)) - 1))
+        b, a = butter(n, f[-1] / (fs / 2), 'low')
+        for i in range(sigfilter.shape[0]):
+            sigfilter[i, :] = filtfilt(b, a, sigfilter[i, :], padtype='odd', padlen=3 * (max(len(b), len(a)) - 1))
+    else:
+        b, a = butter(n, f / (fs / 2), type)
+        for i in range(sig.shape[0]):
+            sigfilter[i, :] = filtfilt(b, a, sig[i, :])
+    return sigfilter
+
+
+def test_filter_2sIIR_matches_loop():
+    """
+    SpiD 的 0.5-50Hz 6 阶带通（高通 + 低通两次滤波）及单独的高通/低通与原先逐通道的 ba 形式滤波一致
+    """
+    sig = default_rng(3).standard_normal((19, 15000)) * 30
+    for f, type in (([0.5, 50], 'bandpass'), (0.5, 'high'), (50, 'low')):
+        expected = filter_2sIIR_by_loop(sig, f, 500, 6, type)
+        assert_allclose(filter_2sIIR(sig, f, 500, 6, type), expected, rtol=0, atol=1e-6 * numpy.abs(expected).max())
@@ -0,0 +1,30 @@
+"""
+SpiD 模板匹配的滑动相关系数与原先逐窗口 corrcoef 的比对
+"""
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+importorskip('mne')
+importorskip('torch')
+importorskip('loguru')
+
+from numpy.random import default_rng  # noqa: E402
+from numpy.testing import assert_allclose  # noqa: E402
+
+from config.env import EAVizConfig  # noqa: E402
+from eaviz.SpiD.spid import sliding_corr  # noqa: E402
+
+
+def test_sliding_corr_matches_corrcoef(monkeypatch):
+    """
+    按内存预算分块（此处每块仅数个窗口）时与逐窗口 corrcoef 一致
+    """
+    monkeypatch.setattr(EAVizConfig.SpiDConfig, 'CORR_CHUNK_BYTES', 5 * 150 * 8 * 7)
+    rng = default_rng(0)
+    x = rng.standard_normal(20000)
+    y = 0.7 * x + rng.standard_normal(20000)
+    offsets = numpy.arange(0, len(x) - 150, 5)
+
+    expected = numpy.array([numpy.corrcoef(x[o:o + 150], y[o:o + 150])[0, 1] for o in offsets])
+    assert_allclose(sliding_corr(x, y, offsets, 150), expected, rtol=0, atol=1e-12)
+    assert_allclose(sliding_corr(x, y, offsets, 150, chunk=len(offsets)), expected, rtol=0, atol=1e-12)
@@ -0,0 +1,96 @@
+"""
+SpiD 流式模板匹配（按块读取、滤波）、流式棘波分割与 SPID.tm / SPID.ss 的比对
+"""
+from json import loads
+
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+torch = importorskip('torch')
+importorskip('scipy')
+importorskip('matplotlib')
+importorskip('loguru')
+
+from numpy.random import default_rng  # noqa: E402
+from torch import nn  # noqa: E402
+
+from config.env import EAVizConfig  # noqa: E402
+from eaviz.SpiD.Premodel import getlabel_from_segments, split_segments  # noqa: E402
+from eaviz.SpiD.spid import SPID  # noqa: E402
+
+SFREQ = 500
+
+
+def make_raw():
+    """
+    19 通道 500Hz、150s 的随机信号：第 0、1 通道在 [20, 50)、[100, 115) 秒内相同，其余时间相互独立
+    """
+    data = default_rng(0).standard_normal((19, 150 * SFREQ)) * 2e-5
+    for start, stop in ((20, 50), (100, 115)):
+        data[1, start * SFREQ:stop * SFREQ] = data[0, start * SFREQ:stop * SFREQ]
+    info = mne.create_info(list(EAVizConfig.ChannelEnum.TPM.value), SFREQ, 'eeg')
+    return mne.io.RawArray(data, info, verbose='error')
+
+
+def test_stream_tm_matches_tm(tmp_path, monkeypatch):
+    monkeypatch.setattr(EAVizConfig.AddressConfig, 'BASE_ROOT', str(tmp_path))
+    start_time, stop_time = 10, 140
+
+    swi = SPID.tm(make_raw(), start_time, stop_time, run_id='tm')
+    lines = [loads(line) for line in SPID.stream_tm(make_raw(), start_time, stop_time, chunk_seconds=30)]
+
+    assert [line['type'] for line in lines[:-1]] == ['progress'] * (len(lines) - 1)
+    assert lines[-1]['type'] == 'summary'
+    assert lines[-1]['swi'] == swi
+    assert float(swi) > 0
+    onsets = [a[0] for line in lines for a in line['annotations']]
+    assert onsets == sorted(onsets)
+
+
+class ThresholdSegmenter(nn.Module):
+    """
+    分割模型：标准化后第 0 通道超过阈值的采样点判为棘波
+    """
+
+    def __init__(self, threshold=3.):
+        super().__init__()
+        self.weight = nn.Parameter(torch.zeros(1))
+        self.threshold = threshold
+
+    def forward(self, x):
+        score = x[:, 0] - self.threshold
+        return {'seg_out': torch.stack([-score, score], dim=1)}
+
+
+def make_spike_raw():
+    """
+    19 通道 500Hz、150s 的随机信号，第 0 通道每 7 秒叠加一个 0.2s、200µV 的正弦波
+    """
+    data = default_rng(1).standard_normal((19, 150 * SFREQ)) * 2e-5
+    burst = 2e-4 * numpy.sin(numpy.pi * numpy.arange(100) / 100)
+    for onset in range(3, 148, 7):
+        data[0, onset * SFREQ:onset * SFREQ + 100] += burst
+    info = mne.create_info(list(EAVizConfig.ChannelEnum.TPM.value), SFREQ, 'eeg')
+    return mne.io.RawArray(data, info, verbose='error')
+
+
+def test_stream_ss_matches_ss(tmp_path, monkeypatch):
+    monkeypatch.setattr(EAVizConfig.AddressConfig, 'BASE_ROOT', str(tmp_path))
+    monkeypatch.setattr(EAVizConfig.SpiDConfig, 'BATCH_SIZE', 2)
+    start_time, stop_time = 10, 140  # 4 个 30s 片段，尾部 10s 舍去
+    model = ThresholdSegmenter().eval()
+
+    swi = SPID.ss(make_spike_raw(), model, start_time, stop_time, run_id='ss')
+    lines = [loads(line) for line in SPID.stream_ss(make_spike_raw(), model, start_time, stop_time)]
+
+    assert [line['type'] for line in lines] == ['progress', 'progress', 'summary']
+    assert [line['time'] for line in lines[:-1]] == [70., 130.]
+    assert lines[-1]['swi'] == swi
+    assert float(swi) > 0
+    # 逐个棘波与 ss 的预处理 + 分段推理一致
+    record, _ = SPID.ss_preprocess(make_spike_raw().load_data(), start_time, stop_time)
+    expected = [[start / SFREQ + start_time, (end - start) / SFREQ]
+                for start, end in getlabel_from_segments(model, split_segments(record))]
+    assert [a for line in lines for a in line['annotations']] == expected
+    assert lines[-1]['totalAnnotations'] == len(expected) > 0
@@ -0,0 +1,108 @@
+"""
+SRD 流式输出：按窗口读取滤波结果（滤波缓存 / 按块滤波）与原先对整段滤波后一次性分类的结果一致
+"""
+from json import loads
+
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+torch = importorskip('torch')
+mne = importorskip('mne')
+importorskip('edfio')
+importorskip('loguru')
+
+from torch import nn  # noqa: E402
+
+from config.env import EAVizConfig, EdfCacheConfig  # noqa: E402
+from eaviz.SRD.hfo import merged, predicted, preprocess  # noqa: E402
+from eaviz.SRD.srd import SRD  # noqa: E402
+from utils.edf_cache_util import EdfCacheUtil, RawEdfSidecar  # noqa: E402
+from utils.edf_util import EdfUtil  # noqa: E402
+
+SFREQ = 1000
+START_TIME, STOP_TIME = 3, 67
+
+
+class ThresholdClassifier(nn.Module):
+    """
+    分类窗口内幅值超过阈值（µV）即判为 HFO，代替预训练模型
+    """
+
+    def __init__(self, threshold=25.):
+        super().__init__()
+        self.threshold = threshold
+
+    def forward(self, x):
+        score = x.abs().amax(dim=(1, 2)) - self.threshold
+        return torch.stack([-score, score], dim=1)
+
+
+def make_hfo_raw(seconds=70):
+    """
+    2 通道、1000 Hz：背景噪声上每 3 秒在第 0 通道叠加一段 50 ms 的 200 Hz 振荡
+    """
+    rng = numpy.random.default_rng(0)
+    data = rng.normal(scale=3e-6, size=(2, seconds * SFREQ))
+    burst = 60e-6 * numpy.sin(2 * numpy.pi * 200 * numpy.arange(50) / SFREQ)
+    for onset in numpy.arange(1.3, seconds - 1, 3):
+        start = int(onset * SFREQ)
+        data[0, start:start + 50] += burst
+    info = mne.create_info(['EEG A-REF', 'EEG B-REF'], SFREQ, 'eeg')
+    return mne.io.RawArray(data, info, verbose='error')
+
+
+def stream_lines(raw, model):
+    lines = [loads(line) for line in SRD.stream_srd_data(raw, model, START_TIME, STOP_TIME, [0], 5.0)]
+    return [line for line in lines if line['type'] == 'events'], \
+        [line for line in lines if line['type'] == 'data'], lines[-1]
+
+
+def whole_range(raw, model):
+    """
+    原先的实现：对整段记录滤波、分类后再切窗口
+    """
+    raw.pick([0])
+    raw.load_data()
+    raw_low = EdfUtil.normal_filter(raw.copy())
+    raw_high = EdfUtil.filter_by_spec(raw.copy(), EdfUtil.HFO_FILTER_SPEC)
+    EdfUtil.filter_by_spec(raw, EdfUtil.NOTCH_FILTER_SPEC)
+    raw_notch, sliced_data = preprocess(raw, START_TIME, STOP_TIME)
+    annotations = [(ann['onset'], ann['duration'])
+                   for ann in merged(raw_notch, predicted(model, sliced_data), START_TIME).annotations]
+    return annotations, raw_notch.get_data()[0] * 1e6, raw_low.get_data()[0] * 1e6, raw_high.get_data()[0] * 1e6
+
+
+def check_stream(events, windows, summary, expected):
+    annotations, raw_data, low_data, high_data = expected
+    assert len(annotations) == 21
+    summary_annotations = [(ann['onset'], ann['duration']) for ann in summary['annotations']]
+    numpy.testing.assert_allclose(summary_annotations, annotations, atol=1e-9)
+    # 各 events 帧中的标注依次拼接即为汇总
+    assert [ann for line in events for ann in line['annotations']] == summary['annotations']
+
+    assert [line['time'] for line in windows] == list(range(START_TIME, STOP_TIME, 5))
+    for line in windows:
+        start = int(line['time'] * SFREQ)
+        stop = start + len(line['raw']['data'])
+        for name, data in (('raw', raw_data), ('low', low_data), ('high', high_data)):
+            numpy.testing.assert_allclose(line[name]['data'], data[start:stop], rtol=1e-5, atol=1e-4)
+
+
+def test_stream_srd_by_blocks_matches_whole_range(monkeypatch):
+    # 块长不是窗口的整数倍，覆盖窗口跨块的情况
+    monkeypatch.setattr(EAVizConfig.SRDConfig, 'FILTER_BLOCK', 23)
+    model = ThresholdClassifier().eval()
+    check_stream(*stream_lines(make_hfo_raw(), model), whole_range(make_hfo_raw(), model))
+
+
+def test_stream_srd_by_filter_cache_matches_whole_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(EdfCacheConfig, 'FILTER_CACHE_PATH', str(tmp_path / 'filtered'))
+    edf_path = str(tmp_path / 'hfo.edf')
+    mne.export.export_raw(edf_path, make_hfo_raw(), fmt='edf', verbose='error')
+    model = ThresholdClassifier().eval()
+
+    raw = EdfCacheUtil.read_raw(edf_path)
+    assert isinstance(raw, RawEdfSidecar)
+    expected = whole_range(mne.io.read_raw_edf(edf_path, preload=True, verbose='error'), model)
+    check_stream(*stream_lines(raw, model), expected)
+    assert len(list((tmp_path / 'filtered').iterdir())) == 3
@@ -0,0 +1,47 @@
+"""
+ESC/SD 模型输入：数值计算的 stft_to_buffer 与原先基于热力图渲染的 stft_to_buffer_by_heatmap 比对
+"""
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+torch = importorskip('torch')
+importorskip('cv2')
+importorskip('seaborn')
+importorskip('torchvision')
+
+from numpy.random import default_rng  # noqa: E402
+
+from eaviz.ESC_SD.offline_process import stft_to_buffer, stft_to_buffer_by_heatmap  # noqa: E402
+
+# 两种实现的像素差异主要来自热力图单元格边界的抗锯齿，取值范围为 [0, 1]
+MEAN_ABS_ERROR = 0.01
+MAX_ABS_ERROR = 0.2
+
+
+def assert_buffer_close(power):
+    expected = stft_to_buffer_by_heatmap(power)
+    actual = stft_to_buffer(power)
+    assert actual.shape == expected.shape == (1, 3, power.shape[0], 32, 32)
+    error = (actual - expected).abs()
+    assert error.mean().item() < MEAN_ABS_ERROR, error.mean().item()
+    assert error.max().item() < MAX_ABS_ERROR, error.max().item()
+
+
+def test_stft_to_buffer_random_stft():
+    """
+    与 offline_process 一致：21 通道 4s@1000Hz 随机信号的 STFT 幅值，取前 16 个频率点 -> (21,16,40)
+    """
+    data = default_rng(0).standard_normal((21, 4000)) * 1e-5
+    power = abs(mne.time_frequency.stft(data, 200, verbose='error'))[:, 0:16, :]
+    assert_buffer_close(power)
+
+
+def test_stft_to_buffer_random_power():
+    """
+    任意分布的幅值（含重尾分布和常数通道）
+    """
+    rng = default_rng(1)
+    power = rng.lognormal(0, 2, (4, 16, 40))
+    power[1] = 3.
+    assert_buffer_close(power)
@@ -0,0 +1,127 @@
+"""
+流式二进制帧（EVZF，data2stream_frame）：按文档描述的帧格式解码，帧头与数据可还原
+"""
+from json import loads
+from struct import calcsize, unpack_from
+
+from pytest import importorskip, raises
+
+numpy = importorskip('numpy')
+importorskip('openpyxl')
+importorskip('pandas')
+importorskip('sqlalchemy')
+
+from utils.common_util import STREAM_FRAME_MAGIC, STREAM_FRAME_VERSION, data2stream_frame  # noqa: E402
+
+PREFIX = '<4sBII'
+
+
+def parse_frames(stream: bytes):
+    """
+    按前端的方式依次解码拼接在一起的帧：magic | version | header长度 | payload长度 | header(JSON) | payload
+    :return: [(header, data 或 None)]，int16 的 data 已按 scales 还原为物理值
+    """
+    frames, offset = [], 0
+    while offset < len(stream):
+        magic, version, header_len, payload_len = unpack_from(PREFIX, stream, offset)
+        assert magic == STREAM_FRAME_MAGIC and version == STREAM_FRAME_VERSION
+        offset += calcsize(PREFIX)
+        header = loads(stream[offset:offset + header_len].decode('utf-8'))
+        offset += header_len
+        data = None
+        if payload_len:
+            count = payload_len // numpy.dtype(header['dtype']).itemsize
+            data = numpy.frombuffer(stream, dtype=header['dtype'], count=count, offset=offset).reshape(header['shape'])
+            if header['scales'] is not None:
+                data = data * numpy.array(header['scales'])[:, None]
+        offset += payload_len
+        frames.append((header, data))
+    assert offset == len(stream)
+    return frames
+
+
+def make_data():
+    rng = numpy.random.default_rng(0)
+    data = rng.normal(scale=50., size=(3, 1250))
+    data[1] *= 1e-3  # 各行幅值相差很大，int16 按行缩放
+    data[2] = 0.  # 全零行
+    return data
+
+
+def test_float32_frame_round_trip():
+    data = make_data()
+    [(header, decoded)] = parse_frames(data2stream_frame({'type': 'data', 't0': 1.5, 'dt': 0.002}, data))
+    assert header['type'] == 'data' and header['t0'] == 1.5 and header['dt'] == 0.002
+    assert header['shape'] == [3, 1250] and header['dtype'] == '<f4' and header['scales'] is None
+    numpy.testing.assert_array_equal(decoded, data.astype('<f4'))
+
+
+def test_int16_frame_round_trip():
+    data = make_data()
+    [(header, decoded)] = parse_frames(data2stream_frame({'type': 'data'}, data, 'int16'))
+    assert header['dtype'] == '<i2' and len(header['scales']) == 3
+    assert header['scales'][2] == 1.0
+    # 每行的量化误差不超过半个量化步长，且该行幅值最大的点恰为 ±32767
+    for row, scale in enumerate(header['scales']):
+        assert numpy.abs(decoded[row] - data[row]).max() <= scale / 2 + 1e-12
+    numpy.testing.assert_allclose(numpy.abs(decoded[:2]).max(axis=1), numpy.abs(data[:2]).max(axis=1))
+    numpy.testing.assert_array_equal(decoded[2], 0.)
+
+
+def test_header_only_and_concatenated_frames():
+    data = make_data()
+    stream = (data2stream_frame({'type': 'events', 'annotations': [{'onset': 1.0, 'description': 'HFO'}]}) +
+              data2stream_frame({'type': 'data'}, data, 'int16') +
+              data2stream_frame({'type': 'data'}, data[:1]) +
+              data2stream_frame({'type': 'summary', 'totalAnnotations': 0}))
+    frames = parse_frames(stream)
+    assert [header['type'] for header, _ in frames] == ['events', 'data', 'data', 'summary']
+    assert frames[0] == ({'type': 'events', 'annotations': [{'onset': 1.0, 'description': 'HFO'}]}, None)
+    assert frames[3][1] is None and 'shape' not in frames[3][0]
+    assert frames[1][1].shape == (3, 1250) and frames[2][1].shape == (1, 1250)
+
+
+def test_unsupported_dtype():
+    with raises(ValueError):
+        data2stream_frame({'type': 'data'}, make_data(), 'float64')
+
+
+def test_srd_framed_stream_matches_json():
+    """
+    SRD 的 framed 输出解码后与 json 输出一致（float32 / int16，抽取后的时间轴由 t0 + i * dt 还原）
+    """
+    torch = importorskip('torch')
+    mne = importorskip('mne')
+    from eaviz.SRD.srd import SRD
+
+    class ThresholdClassifier(torch.nn.Module):
+        def forward(self, x):
+            score = x.abs().amax(dim=(1, 2)) - 25.
+            return torch.stack([-score, score], dim=1)
+
+    rng = numpy.random.default_rng(0)
+    data = rng.normal(scale=3e-6, size=(1, 30000))
+    for start in range(1300, 29000, 3000):
+        data[0, start:start + 50] += 60e-6 * numpy.sin(2 * numpy.pi * 200 * numpy.arange(50) / 1000)
+    info = mne.create_info(['EEG A-REF'], 1000, 'eeg')
+
+    def stream(**kwargs):
+        raw = mne.io.RawArray(data, info, verbose='error')
+        return b''.join(SRD.stream_srd_data(raw, ThresholdClassifier(), 2, 27, [0], 5.0, decimation=4, **kwargs))
+
+    lines = [loads(line) for line in stream().splitlines()]
+    assert lines[-1]['totalAnnotations'] == 8
+    for dtype in ('float32', 'int16'):
+        frames = parse_frames(stream(wire_format='framed', dtype=dtype))
+        assert [header['type'] for header, _ in frames] == [line['type'] for line in lines]
+        for (header, decoded), line in zip(frames, lines):
+            if line['type'] != 'data':
+                assert (header, decoded) == (line, None)
+                continue
+            assert header['streams'] == ['raw', 'low', 'high'] and header['bias'] == line['bias']
+            times = header['t0'] + numpy.arange(decoded.shape[1]) * header['dt']
+            numpy.testing.assert_allclose(times, line['raw']['times'], atol=1e-9)
+            for row, name in enumerate(header['streams']):
+                expected = numpy.array(line[name]['data'])
+                atol = 1e-4 if dtype == 'float32' else header['scales'][row] / 2 + 1e-9
+                numpy.testing.assert_allclose(decoded[row], expected, rtol=1e-6, atol=atol)
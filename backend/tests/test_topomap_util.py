@@ -0,0 +1,51 @@
+"""
+TopomapUtil 缓存的插值矩阵与 mne plot_topomap 的比对
+"""
+from pytest import importorskip
+
+numpy = importorskip('numpy')
+mne = importorskip('mne')
+importorskip('scipy')
+importorskip('matplotlib')
+
+from matplotlib.pyplot import close, subplots  # noqa: E402
+from numpy.random import default_rng  # noqa: E402
+from numpy.testing import assert_allclose  # noqa: E402
+
+from config.env import EAVizConfig  # noqa: E402
+from utils.topomap_util import TopomapUtil  # noqa: E402
+
+
+def make_info():
+    info = mne.create_info(EAVizConfig.ChannelEnum.TPM.value, 1000., 'eeg')
+    info.set_montage(TopomapUtil.get_montage())
+    return info
+
+
+def test_grid_matches_mne_plot_topomap():
+    """
+    矩阵乘法得到的网格与 mne plot_topomap 直接插值的网格一致（含头外外推），坐标范围也一致
+    """
+    interpolator = TopomapUtil.get_interpolator()
+    info = make_info()
+    data = default_rng(0).standard_normal((info['nchan'], 3)) * 20
+
+    fig, ax = subplots()
+    for k in range(data.shape[1]):
+        ax.clear()
+        im, _ = mne.viz.plot_topomap(data[:, k], info, contours=0, res=TopomapUtil.RES, axes=ax, show=False)
+        expected = numpy.asarray(im.get_array(), dtype=float).ravel()
+        actual = interpolator['matrix'] @ data[:, k]
+        assert_allclose(actual, expected, rtol=0, atol=1e-4 * numpy.nanmax(abs(expected)), equal_nan=True)
+        assert_allclose(im.get_extent(), interpolator['extent'])
+    close(fig)
+
+
+def test_outline_and_clip_path():
+    """
+    头部轮廓、电极位置及裁剪区域取自 mne：电极均在裁剪区域内
+    """
+    interpolator = TopomapUtil.get_interpolator()
+    assert len(interpolator['lines']) >= 1
+    assert interpolator['sensors'].shape == (len(EAVizConfig.ChannelEnum.TPM.value), 2)
+    assert interpolator['clip_path'].contains_points(interpolator['sensors']).all()
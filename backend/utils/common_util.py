@@ -1,4 +1,6 @@
 from io import BytesIO
+from json import dumps
+from numpy import maximum, rint
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, PatternFill
 from openpyxl.utils import get_column_letter
@@ -6,6 +8,7 @@ from openpyxl.worksheet.datavalidation import DataValidation
 from os import path
 from pandas import DataFrame
 from re import sub
+from struct import pack
 from sqlalchemy.engine.row import Row
 from typing import List
 
@@ -217,15 +220,131 @@ def data2bytes_response(data):
     若(19,9000)，每个数据块大小为 3072*19*8 = 466944/1024 = 456KB
     19*9000/(3072*19) ≈ 2.93 个数据块：466944 + 466944 + 434112 = 19*9000*8
     """
-    chunk_size = 3072 * data.shape[0]  # 每次发送的 Float64（样本点） 数量
-    data = data.T.flatten()  # 逐列发送（先把所有通道的第一个样本点都发送完再发送第二个样本点）
-    for i in range(0, len(data), chunk_size):
-        chunk = data[i:i + chunk_size]
-        yield chunk.tobytes()
+    chunk_samples = 3072  # 每次发送 3072 个样本点（3072 * num_channels 个 Float64）
+    # 逐列发送（先把所有通道的第一个样本点都发送完再发送第二个样本点）
+    # 直接对原数组切片后按转置顺序序列化，不生成整个数组的转置副本
+    for i in range(0, data.shape[1], chunk_samples):
+        yield data[:, i:i + chunk_samples].T.tobytes()
         # print(len(chunk.tobytes()))
         # 后端可以确保每次发送的数据块大小，但是前端接收到的数据块大小不一致的原因可能与网络传输、流式处理的机制有关 -> 使用缓冲区来累积接收到的数据，并按固定大小的块进行处理
 
 
+EDF_WIRE_MAGIC = b'EDFW'
+EDF_WIRE_VERSION = 1
+
+
+def get_compressor(compression: str):
+    """
+    工具方法：获取压缩函数（lz4 / zstd 为可选依赖，仅在使用时导入）
+    :param compression: none / lz4 / zstd
+    :return: 压缩函数，none 时返回 None
+    """
+    if compression == 'none':
+        return None
+    if compression == 'lz4':
+        try:
+            from lz4.frame import compress
+        except ImportError:
+            raise ValueError('服务器未安装 lz4，无法使用 lz4 压缩')
+        return compress
+    if compression == 'zstd':
+        try:
+            from zstandard import ZstdCompressor
+        except ImportError:
+            raise ValueError('服务器未安装 zstandard，无法使用 zstd 压缩')
+        return ZstdCompressor(level=3).compress
+    raise ValueError(f'不支持的压缩方式: {compression}')
+
+
+def data2frames_response(data, sfreq: float, ch_names: List[str], dtype: str = 'float32', compression: str = 'none',
+                         decimation: int = 1):
+    """
+    工具方法：带帧头的分块数据传输生成器（edf数据）
+    :param data: edf数据 (num_channels * sampling points)
+    :param sfreq: 采样率
+    :param ch_names: 通道顺序
+    :param dtype: float32 / int16（int16 时按通道缩放，物理值 = int16 * scales[ch]）
+    :param compression: none / lz4 / zstd，逐块压缩
+    :param decimation: 每个样本对应的原始样本点数（envelope 模式下 > 1）
+    :return: 分块数据
+
+    帧格式（小端）：
+        magic 'EDFW'(4B) | version(uint8) | header长度(uint32) | header(JSON, utf-8)
+        之后为若干数据块：块长度(uint32) | 块内容（可能被压缩）
+    块内容与旧格式相同，逐列排列：先发送所有通道的第一个样本点，再发送第二个样本点...
+    参数不合法（如压缩库未安装）时在生成器创建前抛出 ValueError
+    """
+    compress = get_compressor(compression)
+    if dtype == 'float32':
+        wire_dtype, scales = '<f4', None
+    elif dtype == 'int16':
+        wire_dtype = '<i2'
+        scales = maximum(data.max(axis=1), -data.min(axis=1)) / 32767
+        scales[scales == 0] = 1.0
+    else:
+        raise ValueError(f'不支持的数据类型: {dtype}')
+
+    chunk_samples = 3072
+    header = dumps(dict(version=EDF_WIRE_VERSION,
+                        shape=list(data.shape),
+                        dtype=wire_dtype,
+                        sfreq=sfreq,
+                        decimation=decimation,
+                        channels=list(ch_names),
+                        scales=scales.tolist() if scales is not None else None,
+                        compression=compression,
+                        chunk_samples=chunk_samples,
+                        layout='sample-major')).encode('utf-8')
+
+    def generate():
+        yield EDF_WIRE_MAGIC + pack('<BI', EDF_WIRE_VERSION, len(header)) + header
+        for i in range(0, data.shape[1], chunk_samples):
+            block = data[:, i:i + chunk_samples]
+            if scales is not None:
+                block = rint(block / scales[:, None])
+            payload = block.T.astype(wire_dtype).tobytes()
+            if compress is not None:
+                payload = compress(payload)
+            yield pack('<I', len(payload)) + payload
+
+    return generate()
+
+
+STREAM_FRAME_MAGIC = b'EVZF'
+STREAM_FRAME_VERSION = 1
+
+
+def data2stream_frame(header: dict, data=None, dtype: str = 'float32'):
+    """
+    工具方法：流式输出（如 SRD）的单帧二进制数据，JSON 帧头 + 可选的二维数组
+    :param header: 帧头信息（会追加 shape / dtype / scales 字段）
+    :param data: (行数, 样本点数)，为 None 时只有帧头
+    :param dtype: float32 / int16（int16 时按行缩放，物理值 = int16 * scales[行]）
+    :return: 一帧的字节
+
+    帧格式（小端）：
+        magic 'EVZF'(4B) | version(uint8) | header长度(uint32) | payload长度(uint32) | header(JSON, utf-8) | payload
+    payload 按行排列（每行的样本点连续）
+    """
+    payload = b''
+    if data is not None:
+        if dtype == 'float32':
+            wire_dtype, scales = '<f4', None
+            payload = data.astype(wire_dtype).tobytes()
+        elif dtype == 'int16':
+            wire_dtype = '<i2'
+            scales = maximum(data.max(axis=1), -data.min(axis=1)) / 32767
+            scales[scales == 0] = 1.0
+            payload = rint(data / scales[:, None]).astype(wire_dtype).tobytes()
+        else:
+            raise ValueError(f'不支持的数据类型: {dtype}')
+        header = dict(header, shape=list(data.shape), dtype=wire_dtype,
+                      scales=scales.tolist() if scales is not None else None)
+    header_bytes = dumps(header).encode('utf-8')
+    return (STREAM_FRAME_MAGIC + pack('<BII', STREAM_FRAME_VERSION, len(header_bytes), len(payload)) +
+            header_bytes + payload)
+
+
 def export_list2excel(list_data: List):
     """
     工具方法：将需要导出的list数据转化为对应excel的二进制数据
@@ -0,0 +1,621 @@
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import sha1
+from json import dump, dumps, load
+from mne import Annotations, create_info, io
+from mne.filter import filter_data, notch_filter
+from mne.io import BaseRaw
+from numpy import arange, asarray, empty, float32, float64, load as np_load, maximum, memmap, minimum, uint8
+from numpy.lib.format import open_memmap
+from os import getpid, listdir, makedirs, path, rename, stat, utime
+from shutil import rmtree
+from threading import Lock
+from uuid import uuid4
+
+from config.env import EdfCacheConfig
+from utils.log_util import logger
+
+
+class RawEdfSidecar(BaseRaw):
+    """
+    基于 sidecar（float32 按通道连续存储）的 Raw，读取时直接从 np.memmap 切片，不经过 edf 解码
+    """
+
+    def __init__(self, sidecar_dir: str, header: dict):
+        info = create_info(ch_names=header['ch_names'], sfreq=header['sfreq'], ch_types=header['ch_types'],
+                           verbose=False)
+        raw_extras = dict(edf_path=sidecar_dir[:-len(EdfCacheConfig.SIDECAR_SUFFIX)],
+                          data_path=path.join(sidecar_dir, EdfCacheUtil.DATA_FILE),
+                          n_channels=len(header['ch_names']),
+                          n_times=header['n_times'],
+                          dtype=header['dtype'],
+                          scale=header['scale'])
+        super().__init__(info, preload=False, last_samps=[header['n_times'] - 1],
+                         filenames=[raw_extras['data_path']], raw_extras=[raw_extras], orig_format='single',
+                         verbose=False)
+
+        if header.get('meas_date'):
+            self.set_meas_date(datetime.fromisoformat(header['meas_date']))
+        annotations = header.get('annotations')
+        if annotations and annotations['onset']:
+            self.set_annotations(Annotations(onset=annotations['onset'], duration=annotations['duration'],
+                                             description=annotations['description'],
+                                             orig_time=self.info['meas_date']))
+
+    @property
+    def edf_path(self):
+        return self._raw_extras[0]['edf_path']
+
+    def _read_segment_file(self, data, idx, fi, start, stop, cals, mult):
+        """
+        只读取 [start, stop) 内 idx 对应的通道（memmap 按需换页，内存占用与窗口大小成正比）
+        """
+        extras = self._raw_extras[fi]
+        signal = memmap(extras['data_path'], dtype=extras['dtype'], mode='r',
+                        shape=(extras['n_channels'], extras['n_times']))
+        block = asarray(signal[idx, start:stop], dtype=float64)
+        block *= extras['scale']
+        if mult is not None:
+            data[:] = mult @ block
+        else:
+            data[:] = block
+            data *= cals
+
+
+class EdfCacheUtil:
+    """
+    Edf解码缓存工具类
+    """
+    VERSION = 1
+    HEADER_FILE = 'header.json'
+    DATA_FILE = 'data.f32'
+    DTYPE = '<f4'
+    SCALE = 1e-6  # sidecar 中以微伏存储，读取时乘以 SCALE 还原为 mne 的单位（V）
+
+    @classmethod
+    def get_sidecar_dir(cls, edf_path: str):
+        return f'{edf_path}{EdfCacheConfig.SIDECAR_SUFFIX}'
+
+    @staticmethod
+    def get_source_stat(edf_path: str):
+        """
+        以 mtime + size 作为 edf 文件的版本标识
+        """
+        st = stat(edf_path)
+        return dict(mtime_ns=st.st_mtime_ns, size=st.st_size)
+
+    @classmethod
+    def load_sidecar_header(cls, edf_path: str):
+        """
+        读取 sidecar 头信息，sidecar 不存在或已失效时返回 None
+        """
+        header_path = path.join(cls.get_sidecar_dir(edf_path), cls.HEADER_FILE)
+        if not path.exists(header_path):
+            return None
+        try:
+            with open(header_path, 'r', encoding='utf-8') as f:
+                header = load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'EDF sidecar 头信息损坏: {header_path}. Error info: {str(e)}')
+            return None
+        if header.get('version') != cls.VERSION or header.get('source') != cls.get_source_stat(edf_path):
+            return None
+        return header
+
+    @classmethod
+    def build_sidecar(cls, edf_path: str):
+        """
+        按块解码 edf 并写入 sidecar（先写临时目录再重命名，避免并发请求读到半成品）
+        """
+        source = cls.get_source_stat(edf_path)
+        raw = io.read_raw_edf(edf_path, preload=False, verbose='error')
+        n_channels, n_times = raw.info['nchan'], raw.n_times
+        sfreq = raw.info['sfreq']
+
+        sidecar_dir = cls.get_sidecar_dir(edf_path)
+        tmp_dir = cls.make_tmp_dir(sidecar_dir)
+        try:
+            signal = memmap(path.join(tmp_dir, cls.DATA_FILE), dtype=cls.DTYPE, mode='w+',
+                            shape=(n_channels, n_times))
+            block = max(int(sfreq * EdfCacheConfig.SIDECAR_BLOCK_SECOND), 1)
+            for start in range(0, n_times, block):
+                stop = min(start + block, n_times)
+                signal[:, start:stop] = raw.get_data(start=start, stop=stop) / cls.SCALE
+            signal.flush()
+            del signal
+
+            meas_date = raw.info['meas_date']
+            header = dict(version=cls.VERSION,
+                          source=source,
+                          sfreq=float(sfreq),
+                          ch_names=raw.ch_names,
+                          ch_types=raw.get_channel_types(),
+                          n_times=int(n_times),  # 部分 edf 的 n_times 为 numpy 整数，无法直接写入 json
+                          dtype=cls.DTYPE,
+                          scale=cls.SCALE,
+                          meas_date=meas_date.isoformat() if meas_date else None,
+                          annotations=dict(onset=raw.annotations.onset.tolist(),
+                                           duration=raw.annotations.duration.tolist(),
+                                           description=raw.annotations.description.tolist()))
+            with open(path.join(tmp_dir, cls.HEADER_FILE), 'w', encoding='utf-8') as f:
+                dump(header, f, ensure_ascii=False)
+
+            if cls.get_source_stat(edf_path) != source:
+                raise RuntimeError('EDF文件在生成sidecar期间被修改')
+            cls.publish_dir(tmp_dir, sidecar_dir)
+            logger.info(f'EDF sidecar 生成成功: {sidecar_dir}')
+            return header
+        except Exception:
+            rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def make_tmp_dir(target_dir: str):
+        tmp_dir = f'{target_dir}.{getpid()}.{uuid4().hex[:8]}.tmp'
+        makedirs(tmp_dir)
+        return tmp_dir
+
+    @staticmethod
+    def publish_dir(tmp_dir: str, target_dir: str):
+        """
+        用生成完毕的临时目录替换目标目录
+        """
+        if path.exists(target_dir):
+            rmtree(target_dir, ignore_errors=True)
+        try:
+            rename(tmp_dir, target_dir)
+        except OSError:
+            # 其他请求已抢先生成，直接使用对方的结果
+            rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def remove_sidecar(cls, edf_path: str):
+        """
+        删除edf对应的sidecar（edf被删除或重新规范化时调用）
+        """
+        sidecar_dir = cls.get_sidecar_dir(edf_path)
+        if path.exists(sidecar_dir):
+            rmtree(sidecar_dir, ignore_errors=True)
+            logger.info(f'EDF sidecar 已删除: {sidecar_dir}')
+
+    @classmethod
+    def read_raw(cls, edf_path: str):
+        """
+        获取edf的raw（未preload）：优先使用sidecar，sidecar不可用时回退到 mne.io.read_raw_edf
+        """
+        if not EdfCacheConfig.SIDECAR_ENABLED:
+            return io.read_raw_edf(edf_path)
+        try:
+            header = cls.load_sidecar_header(edf_path)
+            if header is None:
+                header = cls.build_sidecar(edf_path)
+            return RawEdfSidecar(cls.get_sidecar_dir(edf_path), header)
+        except Exception as e:
+            logger.warning(f'EDF sidecar 不可用，回退到edf解码: {edf_path}. Error info: {str(e)}')
+            return io.read_raw_edf(edf_path)
+
+
+class EdfPyramidUtil:
+    """
+    Edf多分辨率 min/max 金字塔工具类
+
+    第 k 层（k >= PYRAMID_BASE_LEVEL）每个 bin 覆盖 2**k 个样本点，保存为 L{k}.npy，形状为 (2, 通道数, bin数)，
+    [0] 为 bin 内最小值，[1] 为最大值（float32，单位与 raw.get_data() 一致）。高层由低层两两合并得到。
+    """
+    VERSION = 1
+    META_FILE = 'meta.json'
+
+    @classmethod
+    def get_pyramid_dir(cls, edf_path: str):
+        return f'{edf_path}{EdfCacheConfig.PYRAMID_SUFFIX}'
+
+    @staticmethod
+    def get_level_file(level: int):
+        return f'L{level}.npy'
+
+    @classmethod
+    def load_pyramid_meta(cls, edf_path: str):
+        """
+        读取金字塔元信息，不存在或已失效时返回 None
+        """
+        meta_path = path.join(cls.get_pyramid_dir(edf_path), cls.META_FILE)
+        if not path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'EDF 金字塔元信息损坏: {meta_path}. Error info: {str(e)}')
+            return None
+        if meta.get('version') != cls.VERSION or meta.get('source') != EdfCacheUtil.get_source_stat(edf_path):
+            return None
+        return meta
+
+    @classmethod
+    def build_pyramid(cls, edf_path: str):
+        """
+        按块读取信号生成最底层，再逐层两两合并生成更高的层
+        """
+        source = EdfCacheUtil.get_source_stat(edf_path)
+        raw = EdfCacheUtil.read_raw(edf_path)
+        n_channels, n_times = raw.info['nchan'], int(raw.n_times)  # n_times 可能为 numpy 整数，需转换后写入 json
+        sfreq = raw.info['sfreq']
+
+        pyramid_dir = cls.get_pyramid_dir(edf_path)
+        tmp_dir = EdfCacheUtil.make_tmp_dir(pyramid_dir)
+        try:
+            level = EdfCacheConfig.PYRAMID_BASE_LEVEL
+            factor = 2 ** level
+            n_bins = -(-n_times // factor)
+            envelope = open_memmap(path.join(tmp_dir, cls.get_level_file(level)), mode='w+', dtype=float32,
+                                   shape=(2, n_channels, n_bins))
+            block = factor * max(int(sfreq * EdfCacheConfig.SIDECAR_BLOCK_SECOND) // factor, 1)
+            for start in range(0, n_times, block):
+                stop = min(start + block, n_times)
+                data = raw.get_data(start=start, stop=stop)
+                indices = arange(0, stop - start, factor)
+                first_bin = start // factor
+                envelope[0, :, first_bin:first_bin + len(indices)] = minimum.reduceat(data, indices, axis=1)
+                envelope[1, :, first_bin:first_bin + len(indices)] = maximum.reduceat(data, indices, axis=1)
+            levels = [dict(level=level, n_bins=n_bins)]
+
+            while n_bins > EdfCacheConfig.PYRAMID_MIN_BINS:
+                indices = arange(0, n_bins, 2)
+                level, n_bins = level + 1, len(indices)
+                lower, envelope = envelope, open_memmap(path.join(tmp_dir, cls.get_level_file(level)), mode='w+',
+                                                        dtype=float32, shape=(2, n_channels, n_bins))
+                envelope[0] = minimum.reduceat(lower[0], indices, axis=1)
+                envelope[1] = maximum.reduceat(lower[1], indices, axis=1)
+                lower.flush()
+                del lower
+                levels.append(dict(level=level, n_bins=n_bins))
+            envelope.flush()
+            del envelope
+
+            meta = dict(version=cls.VERSION,
+                        source=source,
+                        sfreq=float(sfreq),
+                        ch_names=raw.ch_names,
+                        n_times=n_times,
+                        levels=levels)
+            with open(path.join(tmp_dir, cls.META_FILE), 'w', encoding='utf-8') as f:
+                dump(meta, f, ensure_ascii=False)
+
+            if EdfCacheUtil.get_source_stat(edf_path) != source:
+                raise RuntimeError('EDF文件在生成金字塔期间被修改')
+            EdfCacheUtil.publish_dir(tmp_dir, pyramid_dir)
+            logger.info(f'EDF 金字塔生成成功: {pyramid_dir}')
+            return meta
+        except Exception:
+            rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    @classmethod
+    def remove_pyramid(cls, edf_path: str):
+        """
+        删除edf对应的金字塔（edf被删除或重新规范化时调用）
+        """
+        pyramid_dir = cls.get_pyramid_dir(edf_path)
+        if path.exists(pyramid_dir):
+            rmtree(pyramid_dir, ignore_errors=True)
+            logger.info(f'EDF 金字塔已删除: {pyramid_dir}')
+
+    @classmethod
+    def get_envelope(cls, edf_path: str, start: int, end: int, pixels: int, ch_names: list = None):
+        """
+        获取 [start, end) 内的 min/max 包络
+
+        按 (end - start) / pixels 选择每个 bin 覆盖样本数不超过该值的最高层，保证返回的 bin 数不少于像素数。
+        :return: (data, decimation)，data 形状为 (通道数, 2 * bin数)，按 [min0, max0, min1, max1, ...] 交错排列；
+                 decimation 为每个 bin 覆盖的样本点数。跨度不足以降采样时返回 None，由调用方直接读取原始样本
+        """
+        samples_per_pixel = (end - start) / max(pixels, 1)
+        if samples_per_pixel < 2 ** EdfCacheConfig.PYRAMID_BASE_LEVEL:
+            return None
+
+        meta = cls.load_pyramid_meta(edf_path)
+        if meta is None:
+            meta = cls.build_pyramid(edf_path)
+        level = max(item['level'] for item in meta['levels'] if 2 ** item['level'] <= samples_per_pixel)
+        decimation = 2 ** level
+
+        envelope = np_load(path.join(cls.get_pyramid_dir(edf_path), cls.get_level_file(level)), mmap_mode='r')
+        picks = [meta['ch_names'].index(ch) for ch in ch_names] if ch_names else list(range(len(meta['ch_names'])))
+        block = envelope[:, picks, start // decimation:-(-end // decimation)]
+        data = empty((len(picks), 2 * block.shape[2]), dtype=float64)
+        data[:, 0::2] = block[0]
+        data[:, 1::2] = block[1]
+        return data, decimation
+
+
+class EdfRawCache:
+    """
+    进程内 Raw 的 LRU 缓存（按字节预算淘汰）
+
+    键为 (edf_id, edf文件mtime, selected_channels)，值为已 load_data 的 raw。
+    读时复制：get 返回 raw.copy()，调用方的 crop / filter / set_annotations 等原地操作不会污染缓存。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (raw, nbytes)
+        self._lock = Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(edf_id: int, edf_path: str, selected_channels: str = None):
+        return edf_id, stat(edf_path).st_mtime_ns, selected_channels or ''
+
+    def get(self, key):
+        """
+        命中时返回缓存 raw 的副本，未命中返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            raw = entry[0]
+        return raw.copy()
+
+    def put(self, key, raw: BaseRaw):
+        """
+        缓存已 load_data 的 raw（调用方之后不应再修改传入的 raw），超出预算的单个 raw 不缓存
+        """
+        nbytes = raw.info['nchan'] * raw.n_times * float64().itemsize  # preload 后 raw 的数据为 float64
+        if nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # 同一 edf 的旧版本（mtime 变化）不会再被命中，直接移除
+            for stale_key in [k for k in self._entries if k[0] == key[0] and k[1] != key[1]]:
+                self.current_bytes -= self._entries.pop(stale_key)[1]
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+            self._entries[key] = (raw, nbytes)
+            self.current_bytes += nbytes
+        return True
+
+    def invalidate(self, edf_id: int):
+        """
+        移除某个edf的所有缓存项（edf被删除时调用）
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == edf_id]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(entries=len(self._entries),
+                        current_bytes=self.current_bytes,
+                        max_bytes=self.max_bytes,
+                        hits=self.hits,
+                        misses=self.misses,
+                        evictions=self.evictions,
+                        hit_rate=round(self.hits / lookups, 4) if lookups else 0.0)
+
+
+class EdfFilterCache:
+    """
+    滤波结果缓存
+
+    以 (edf, 通道集合, 滤波链) 为键，每个缓存项为 caches/filtered/<key>/ 下的 float32 memmap（按通道连续存储）及逐块的填充标记。
+    按需只滤波缺失的块：每块前后额外读取 FILTER_MARGIN_SECOND 的原始信号一起滤波再只写回块本身，
+    因此任意窗口取出的结果与对整段记录滤波一致（记录两端与整段滤波一样由 mne 按 reflect_limited 填充）。
+    滤波链为 (('notch', 50), ('bandpass', 1, 70)) 形式的元组，与 raw.notch_filter / raw.filter 的默认参数一致。
+    """
+    META_FILE = 'meta.json'
+    DATA_FILE = 'data.f32'
+    BLOCKS_FILE = 'blocks.u8'
+
+    @staticmethod
+    def apply_spec(data, sfreq: float, spec: tuple):
+        """
+        对数组按滤波链依次滤波（参数与 mne Raw 的 notch_filter / filter 默认参数一致）
+        """
+        for step in spec:
+            if step[0] == 'notch':
+                data = notch_filter(data, sfreq, step[1], verbose='error')
+            elif step[0] == 'bandpass':
+                data = filter_data(data, sfreq, step[1], step[2], verbose='error')
+            else:
+                raise ValueError(f'不支持的滤波类型: {step[0]}')
+        return data
+
+    @staticmethod
+    def update_filter_info(raw: BaseRaw, spec: tuple):
+        """
+        同 raw.filter：带通滤波后更新 info 中的 highpass / lowpass（陷波不改变）
+        """
+        with raw.info._unlock():
+            for step in spec:
+                if step[0] != 'bandpass':
+                    continue
+                l_freq, h_freq = float(step[1]), float(step[2])
+                if raw.info['highpass'] is None or l_freq > raw.info['highpass']:
+                    raw.info['highpass'] = l_freq
+                if raw.info['lowpass'] is None or h_freq < raw.info['lowpass']:
+                    raw.info['lowpass'] = h_freq
+        return raw
+
+    @staticmethod
+    def apply_spec_to_raw(raw: BaseRaw, spec: tuple):
+        """
+        不经过缓存，直接对 raw 滤波（原地修改）
+        """
+        for step in spec:
+            if step[0] == 'notch':
+                raw.notch_filter(freqs=step[1])
+            elif step[0] == 'bandpass':
+                raw.filter(l_freq=step[1], h_freq=step[2])
+            else:
+                raise ValueError(f'不支持的滤波类型: {step[0]}')
+        return raw
+
+    @classmethod
+    def get_entry_dir(cls, edf_path: str, ch_names: list, spec: tuple):
+        key = sha1(dumps([path.abspath(edf_path), list(ch_names), spec]).encode('utf-8')).hexdigest()
+        return path.join(EdfCacheConfig.FILTER_CACHE_PATH, key)
+
+    @classmethod
+    def open_entry(cls, edf_path: str, ch_names: list, spec: tuple):
+        """
+        打开（不存在或已失效时新建）缓存项
+        """
+        entry_dir = cls.get_entry_dir(edf_path, ch_names, spec)
+        source = EdfCacheUtil.get_source_stat(edf_path)
+        meta = None
+        meta_path = path.join(entry_dir, cls.META_FILE)
+        if path.exists(meta_path):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = load(f)
+            except (OSError, ValueError):
+                meta = None
+            if meta is None or meta.get('source') != source:
+                rmtree(entry_dir, ignore_errors=True)
+                meta = None
+
+        if meta is None:
+            raw = EdfCacheUtil.read_raw(edf_path)
+            sfreq, n_times = float(raw.info['sfreq']), int(raw.n_times)  # n_times 可能为 numpy 整数，需转换后写入 json
+            block = int(sfreq * EdfCacheConfig.FILTER_BLOCK_SECOND)
+            meta = dict(source=source, edf_path=edf_path, ch_names=list(ch_names), spec=spec, sfreq=sfreq,
+                        n_times=n_times, block=block, n_blocks=-(-n_times // block))
+            tmp_dir = EdfCacheUtil.make_tmp_dir(entry_dir)
+            try:
+                memmap(path.join(tmp_dir, cls.DATA_FILE), dtype='<f4', mode='w+',
+                       shape=(len(ch_names), n_times)).flush()
+                memmap(path.join(tmp_dir, cls.BLOCKS_FILE), dtype=uint8, mode='w+', shape=(meta['n_blocks'],)).flush()
+                with open(path.join(tmp_dir, cls.META_FILE), 'w', encoding='utf-8') as f:
+                    dump(meta, f, ensure_ascii=False)
+                rename(tmp_dir, entry_dir)
+            except OSError:
+                # 其他请求已抢先创建
+                rmtree(tmp_dir, ignore_errors=True)
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = load(f)
+            except Exception:
+                rmtree(tmp_dir, ignore_errors=True)
+                raise
+            cls.evict()
+
+        utime(meta_path)  # 以 meta.json 的 mtime 作为最近使用时间
+        return entry_dir, meta
+
+    @classmethod
+    def fill_blocks(cls, entry_dir: str, meta: dict, first_block: int, last_block: int):
+        """
+        滤波 [first_block, last_block) 内的块（前后带 margin）并写入缓存
+        """
+        raw = EdfCacheUtil.read_raw(meta['edf_path'])
+        raw.pick(meta['ch_names'])
+        n_times, block, sfreq = meta['n_times'], meta['block'], meta['sfreq']
+        margin = int(sfreq * EdfCacheConfig.FILTER_MARGIN_SECOND)
+        start, stop = first_block * block, min(last_block * block, n_times)
+        read_start, read_stop = max(start - margin, 0), min(stop + margin, n_times)
+
+        filtered = cls.apply_spec(raw.get_data(start=read_start, stop=read_stop), sfreq, tuple(map(tuple, meta['spec'])))
+        data = memmap(path.join(entry_dir, cls.DATA_FILE), dtype='<f4', mode='r+', shape=(len(meta['ch_names']), n_times))
+        data[:, start:stop] = filtered[:, start - read_start:stop - read_start]
+        data.flush()
+        del data
+        blocks = memmap(path.join(entry_dir, cls.BLOCKS_FILE), dtype=uint8, mode='r+', shape=(meta['n_blocks'],))
+        blocks[first_block:last_block] = 1
+        blocks.flush()
+
+    @classmethod
+    def get_data(cls, edf_path: str, ch_names: list, spec: tuple, start: int, stop: int):
+        """
+        获取 [start, stop) 内的滤波结果（float32），缺失的块先滤波并写入缓存
+        """
+        entry_dir, meta = cls.open_entry(edf_path, ch_names, spec)
+        block = meta['block']
+        first_block, last_block = start // block, -(-stop // block)
+        blocks = memmap(path.join(entry_dir, cls.BLOCKS_FILE), dtype=uint8, mode='r', shape=(meta['n_blocks'],))
+        missing = [b for b in range(first_block, last_block) if not blocks[b]]
+        del blocks
+
+        # 将连续缺失的块合并后分批滤波
+        run_start = None
+        for i, b in enumerate(missing):
+            if run_start is None:
+                run_start = b
+            run_end = b + 1
+            next_missing = missing[i + 1] if i + 1 < len(missing) else None
+            if next_missing != run_end or run_end - run_start >= EdfCacheConfig.FILTER_FILL_MAX_BLOCKS:
+                cls.fill_blocks(entry_dir, meta, run_start, run_end)
+                run_start = None
+
+        data = memmap(path.join(entry_dir, cls.DATA_FILE), dtype='<f4', mode='r', shape=(len(ch_names), meta['n_times']))
+        return asarray(data[:, start:stop])
+
+    @classmethod
+    def apply(cls, raw: BaseRaw, spec: tuple):
+        """
+        按滤波链对 raw 滤波（原地修改并返回 raw），结果等同于对整段记录滤波后取 raw 当前的时间范围。
+        要求传入的 raw 为未经滤波的原始数据；非 sidecar 的 raw 或缓存不可用时直接滤波。
+        """
+        if not EdfCacheConfig.FILTER_CACHE_ENABLED or not isinstance(raw, RawEdfSidecar):
+            return cls.apply_spec_to_raw(raw, spec)
+        try:
+            raw.load_data()
+            start = raw.first_samp
+            raw._data[:] = cls.get_data(raw.edf_path, raw.ch_names, spec, start, start + raw.n_times)
+            return cls.update_filter_info(raw, spec)
+        except Exception as e:
+            logger.warning(f'EDF 滤波缓存不可用，直接滤波: {raw.edf_path}. Error info: {str(e)}')
+            return cls.apply_spec_to_raw(raw, spec)
+
+    @classmethod
+    def remove_entries(cls, edf_path: str):
+        """
+        删除某个edf的所有滤波缓存（edf被删除时调用）
+        """
+        if not path.exists(EdfCacheConfig.FILTER_CACHE_PATH):
+            return
+        edf_path = path.abspath(edf_path)
+        for entry in listdir(EdfCacheConfig.FILTER_CACHE_PATH):
+            meta_path = path.join(EdfCacheConfig.FILTER_CACHE_PATH, entry, cls.META_FILE)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    if path.abspath(load(f)['edf_path']) != edf_path:
+                        continue
+            except (OSError, ValueError, KeyError):
+                continue
+            rmtree(path.join(EdfCacheConfig.FILTER_CACHE_PATH, entry), ignore_errors=True)
+
+    @classmethod
+    def evict(cls):
+        """
+        超出磁盘预算时按最近使用时间淘汰缓存项
+        """
+        entries = []
+        for entry in listdir(EdfCacheConfig.FILTER_CACHE_PATH):
+            entry_dir = path.join(EdfCacheConfig.FILTER_CACHE_PATH, entry)
+            try:
+                size = sum(path.getsize(path.join(entry_dir, name)) for name in listdir(entry_dir))
+                entries.append((path.getmtime(path.join(entry_dir, cls.META_FILE)), size, entry_dir))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= EdfCacheConfig.FILTER_CACHE_MAX_BYTES:
+                break
+            rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            logger.info(f'EDF 滤波缓存已淘汰: {entry_dir}')
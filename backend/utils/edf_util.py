@@ -1,27 +1,35 @@
 from typing import List
-from config.env import EAVizConfig
-from numpy import array
-from mne import channels, io
+from config.env import EAVizConfig, EdfCacheConfig
+from numpy import arange, concatenate, cumsum, einsum, maximum, memmap, sqrt, uint8, zeros
+from mne import io
 from mne.io.edf.edf import RawEDF
+from utils.edf_cache_util import EdfCacheUtil, EdfFilterCache, EdfPyramidUtil
 from utils.log_util import logger
-from os import remove
+from utils.topomap_util import TopomapUtil
+from os import path, remove, replace
 
 
 class EdfUtil:
     """
     Edf工具类
     """
+    # edf头中每个信号的字段及其字节宽度（按该顺序依次存储所有信号的同一字段）
+    EDF_SIGNAL_FIELDS = (('label', 16), ('transducer', 80), ('physical_dimension', 8), ('physical_min', 8),
+                         ('physical_max', 8), ('digital_min', 8), ('digital_max', 8), ('prefiltering', 80),
+                         ('samples_per_record', 8), ('reserved', 32))
+    EDF_ANNOTATIONS_LABEL = 'EDF Annotations'
+    EDF_COPY_BLOCK_BYTES = 64 * 1024 * 1024  # 快速路径每次拷贝的数据记录字节数上限
+    NOTCH_FILTER_SPEC = (('notch', 50),)
+    NORMAL_FILTER_SPEC = (('notch', 50), ('bandpass', 1, 70))
+    HFO_FILTER_SPEC = (('notch', 50), ('bandpass', 80, 450))
+    SRD_NOTCH_FILTER_SPEC = (('notch', 50), ('notch', 50))  # SRD 分类前的第二次 50Hz 陷波（同 hfo.preprocess）
 
     @staticmethod
     def get_montage():
-        position = {}
-        for i in range(19):
-            ch_name = EAVizConfig.ChannelEnum.TPM.value[i]
-            pos = [EAVizConfig.MontageEnum.XPOS.value[i], EAVizConfig.MontageEnum.YPOS.value[i],
-                   EAVizConfig.MontageEnum.ZPOS.value[i]]
-            position[ch_name] = array(pos)
-        montage = channels.make_dig_montage(ch_pos=position)
-        return montage
+        """
+        固定的 19 通道导联（已缓存，返回副本）
+        """
+        return TopomapUtil.get_montage()
 
     @staticmethod
     def map_channels(selected_channels: List, raw_channels: List):
@@ -52,6 +60,139 @@ class EdfUtil:
                     break
         return selected_channels, mapping_list
 
+    @classmethod
+    def read_edf_header(cls, edf_path: str):
+        """
+        读取edf头（主头 256 字节 + 每个信号 256 字节）
+        :return: 主头原始字节、信号数、数据记录数、记录时长、头长度，以及各信号字段的原始字节
+        """
+        with open(edf_path, 'rb') as f:
+            main = f.read(256)
+            ns = int(main[252:256].decode('ascii').strip())
+            signal_header = f.read(256 * ns)
+        fields = {}
+        offset = 0
+        for name, width in cls.EDF_SIGNAL_FIELDS:
+            fields[name] = [signal_header[offset + i * width:offset + (i + 1) * width] for i in range(ns)]
+            offset += width * ns
+        return dict(main=main,
+                    ns=ns,
+                    header_bytes=int(main[184:192].decode('ascii').strip()),
+                    n_records=int(main[236:244].decode('ascii').strip()),
+                    record_duration=float(main[244:252].decode('ascii').strip()),
+                    fields=fields)
+
+    @staticmethod
+    def parse_edf_number(field: bytes):
+        try:
+            return float(field.decode('ascii').strip())
+        except ValueError:
+            return None
+
+    @classmethod
+    def get_edf_meta(cls, edf_path: str):
+        """
+        统计edf的元信息（上传时计算并保存到数据库，分析前据此校验，无需再打开edf）：
+        样本点数、数据记录布局、各通道的物理量范围以及均值/标准差（未滤波信号，微伏）
+        """
+        header = cls.read_edf_header(edf_path)
+        fields = header['fields']
+        signals = {}
+        for i, label in enumerate(fields['label']):
+            ch_name = label.decode('latin-1').strip()
+            if ch_name == cls.EDF_ANNOTATIONS_LABEL:
+                continue
+            signals[ch_name] = dict(physical_min=cls.parse_edf_number(fields['physical_min'][i]),
+                                    physical_max=cls.parse_edf_number(fields['physical_max'][i]),
+                                    physical_dimension=fields['physical_dimension'][i].decode('latin-1').strip(),
+                                    samples_per_record=int(cls.parse_edf_number(fields['samples_per_record'][i])))
+
+        # 分块累加一阶、二阶矩，内存占用与块大小成正比
+        raw = EdfCacheUtil.read_raw(edf_path)
+        sfreq, n_samples = raw.info['sfreq'], raw.n_times
+        total, total_sq = zeros(raw.info['nchan']), zeros(raw.info['nchan'])
+        block = max(int(sfreq * EdfCacheConfig.SIDECAR_BLOCK_SECOND), 1)
+        for start in range(0, n_samples, block):
+            data = raw.get_data(start=start, stop=min(start + block, n_samples)) * 1e6
+            total += data.sum(axis=1)
+            total_sq += einsum('ij,ij->i', data, data)
+        mean = total / n_samples
+        std = sqrt(maximum(total_sq / n_samples - mean ** 2, 0))
+
+        return dict(n_samples=n_samples,
+                    sfreq=sfreq,
+                    n_records=header['n_records'],
+                    record_duration=header['record_duration'],
+                    channels=[dict(name=ch_name, mean=float(mean[i]), std=float(std[i]), **signals.get(ch_name, {}))
+                              for i, ch_name in enumerate(raw.ch_names)])
+
+    @classmethod
+    def normalize_edf_header_only(cls, edf_path: str, selected_channels: List):
+        """
+        规范化快速路径：只改写edf头（通道名、通道数），并按字节拷贝所选通道的数据记录，不解码、不重新导出，
+        因此不会引入 raw.export 的精度误差。保留 EDF Annotations 信号。
+        所选通道每条记录的采样点数不一致（需要重采样）、非连续的 EDF+D、BDF 或文件不完整时返回 None，由调用方走完整流程。
+        """
+        header = cls.read_edf_header(edf_path)
+        main, ns, fields = header['main'], header['ns'], header['fields']
+        n_records, record_duration = header['n_records'], header['record_duration']
+        if main[0:1] != b'0' or main[192:197] == b'EDF+D' or header['header_bytes'] != 256 * (ns + 1) \
+                or n_records <= 0 or record_duration <= 0:
+            return None
+
+        labels = [label.decode('latin-1').strip() for label in fields['label']]
+        samples_per_record = [int(spr.decode('ascii').strip()) for spr in fields['samples_per_record']]
+        data_indices = [i for i, label in enumerate(labels) if label != cls.EDF_ANNOTATIONS_LABEL]
+        annotation_indices = [i for i, label in enumerate(labels) if label == cls.EDF_ANNOTATIONS_LABEL]
+        data_labels = [labels[i] for i in data_indices]
+        if len(set(data_labels)) != len(data_labels):
+            return None
+
+        selected_channels, mapping_list = cls.map_channels(selected_channels, data_labels)
+        if not mapping_list or len(mapping_list) != len(selected_channels):
+            return None
+        order = [data_indices[data_labels.index(ch_name)] for ch_name in mapping_list]
+        if len({samples_per_record[i] for i in order}) != 1:
+            return None
+        order += annotation_indices
+
+        offsets = cumsum([0] + samples_per_record) * 2  # 每个样本点 2 字节
+        record_bytes = int(offsets[-1])
+        if path.getsize(edf_path) < header['header_bytes'] + n_records * record_bytes:
+            return None
+
+        # 新的头：主头只修改头长度和信号数，信号头按新顺序重排，并将通道名改为统一的通道名
+        new_main = bytearray(main)
+        new_main[184:192] = f'{256 * (len(order) + 1):<8}'.encode('ascii')
+        new_main[252:256] = f'{len(order):<4}'.encode('ascii')
+        new_labels = [f'{ch_name:<16}'[:16].encode('ascii') for ch_name in selected_channels]
+        new_signal_header = b''.join(
+            b''.join(new_labels[k] if name == 'label' and k < len(new_labels) else fields[name][i]
+                     for k, i in enumerate(order))
+            for name, _ in cls.EDF_SIGNAL_FIELDS)
+        columns = concatenate([arange(offsets[i], offsets[i + 1]) for i in order])
+
+        tmp_path = f'{edf_path}.tmp'
+        try:
+            records = memmap(edf_path, dtype=uint8, mode='r', offset=header['header_bytes'],
+                             shape=(n_records, record_bytes))
+            block = max(cls.EDF_COPY_BLOCK_BYTES // record_bytes, 1)
+            with open(tmp_path, 'wb') as f:
+                f.write(bytes(new_main))
+                f.write(new_signal_header)
+                for start in range(0, n_records, block):
+                    f.write(records[start:start + block][:, columns].tobytes())
+            del records
+            replace(tmp_path, edf_path)
+        except Exception:
+            if path.exists(tmp_path):
+                remove(tmp_path)
+            raise
+
+        return dict(sfreq=samples_per_record[order[0]] / record_duration,
+                    time=n_records * record_duration,
+                    valid_channels=','.join(selected_channels))
+
     @classmethod
     def normalize_edf(cls, edf_path: str, selected_channels: str = None):
         """
@@ -64,6 +205,18 @@ class EdfUtil:
             else:
                 selected_channels = selected_channels.split(',')
 
+            # 只需重命名/筛选/调整通道顺序时直接改写头并拷贝数据记录，需要重采样等情况再走解码-导出流程
+            try:
+                raw_info = cls.normalize_edf_header_only(edf_path, selected_channels.copy())
+            except Exception as fast_path_error:
+                logger.warning(f'Header-only normalization failed, fall back to export: {edf_path}. '
+                               f'Error info: {str(fast_path_error)}')
+                raw_info = None
+            if raw_info is not None:
+                EdfCacheUtil.remove_sidecar(edf_path)
+                EdfPyramidUtil.remove_pyramid(edf_path)
+                return raw_info
+
             raw = io.read_raw_edf(edf_path, preload=True)
             raw_channels = raw.info['ch_names']
 
@@ -91,6 +244,8 @@ class EdfUtil:
             # 注意：导出后的edf内部的数据会在极小的量级产生误差，但是对最终分析结果影响很小（可忽略）
             # e.g. 900500 -> 901000
             raw.export(edf_path, overwrite=True)
+            EdfCacheUtil.remove_sidecar(edf_path)
+            EdfPyramidUtil.remove_pyramid(edf_path)
 
             _, times = raw[:]
             raw_info = dict(sfreq=raw.info['sfreq'],
@@ -107,8 +262,15 @@ class EdfUtil:
             raise e
 
     @staticmethod
-    def normal_filter(raw: RawEDF):
+    def filter_by_spec(raw: RawEDF, spec: tuple):
+        """
+        按滤波链滤波（原地修改），命中滤波缓存时直接读取缓存结果
+        """
+        return EdfFilterCache.apply(raw, spec)
+
+    @classmethod
+    def normal_filter(cls, raw: RawEDF):
         """
         50Hz、1-70Hz
         """
-        return raw.notch_filter(freqs=50).filter(l_freq=1, h_freq=70)
+        return cls.filter_by_spec(raw, cls.NORMAL_FILTER_SPEC)
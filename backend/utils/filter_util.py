@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from numbers import Real
+from numpy import asarray, concatenate, float32, float64
+from scipy.signal import butter, filtfilt, sosfiltfilt
+from threading import Lock
+
+from config.env import EAVizConfig
+
+
+class FilterUtil:
+    """
+    滤波器组工具类
+
+    以二阶节（sos）形式设计巴特沃斯滤波器并按 (order, band, fs, btype) 缓存设计结果，
+    沿最后一维对整个通道矩阵做零相位滤波，通道较多时按通道分块在线程池中并行（scipy 的 sosfilt 会释放 GIL）。
+    高阶（如 12 阶带通）滤波器在 ba 形式下数值不稳定，sos 形式则不受影响。
+    已训练模型的输入（SRD 的 MKCNN 特征、SpiD 的 Unet34 输入）依赖原先 ba 形式的滤波结果，应使用 filtfilt_ba 以保持输入不变
+    （如 SpiD 的 6 阶 0.5Hz 高通在 ba 形式下的响应与巴特沃斯设计相差明显，但模型是在该响应上训练的）。
+    """
+    _executor = None
+    _executor_lock = Lock()
+
+    @staticmethod
+    def normalize_band(band):
+        """
+        将截止频率统一为 float / float 元组（numpy 标量如 float32、int64 也按数值处理），作为设计缓存的键
+        """
+        if isinstance(band, Real):
+            return float(band)
+        return tuple(float(f) for f in band)
+
+    @classmethod
+    def get_sos(cls, order: int, band, fs: float, btype: str):
+        """
+        设计巴特沃斯滤波器（sos 形式），结果只读
+        :param band: 截止频率（Hz），带通/带阻时为 (low, high)
+        """
+        return cls.design_sos(int(order), cls.normalize_band(band), float(fs), btype)
+
+    @staticmethod
+    @lru_cache(maxsize=EAVizConfig.FilterConfig.SOS_CACHE_SIZE)
+    def design_sos(order: int, band, fs: float, btype: str):
+        sos = butter(order, asarray(band, dtype=float64) / (fs / 2), btype, output='sos')
+        sos.flags.writeable = False
+        return sos
+
+    @classmethod
+    def get_ba(cls, order: int, band, fs: float, btype: str):
+        """
+        设计巴特沃斯滤波器（ba 形式），结果只读
+        :param band: 截止频率（Hz），带通/带阻时为 (low, high)
+        """
+        return cls.design_ba(int(order), cls.normalize_band(band), float(fs), btype)
+
+    @staticmethod
+    @lru_cache(maxsize=EAVizConfig.FilterConfig.SOS_CACHE_SIZE)
+    def design_ba(order: int, band, fs: float, btype: str):
+        b, a = butter(order, asarray(band, dtype=float64) / (fs / 2), btype)
+        b.flags.writeable = False
+        a.flags.writeable = False
+        return b, a
+
+    @staticmethod
+    def get_ba_padlen(order: int, btype: str):
+        """
+        scipy.signal.filtfilt(b, a) 的默认 padlen，用于与原先 ba 形式的结果保持一致
+        """
+        ntaps = (2 * order if btype in ('band', 'bandpass', 'bandstop', 'bs') else order) + 1
+        return 3 * ntaps
+
+    @classmethod
+    def get_executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=EAVizConfig.FilterConfig.MAX_WORKERS,
+                                                   thread_name_prefix='filter')
+            return cls._executor
+
+    @classmethod
+    def filtfilt(cls, data, order: int, band, fs: float, btype: str = 'bandpass', padlen: int = None,
+                 use_float32: bool = False):
+        """
+        零相位巴特沃斯滤波，沿最后一维对整个矩阵滤波
+        :param data: 任意形状的数组，最后一维为时间
+        :param order: 滤波器阶数
+        :param band: 截止频率（Hz），带通/带阻时为 (low, high)
+        :param fs: 采样频率
+        :param btype: 'low' | 'high' | 'bandpass' | 'bandstop'
+        :param padlen: 两端延拓长度，默认与 scipy.signal.filtfilt(b, a) 一致
+        :param use_float32: 是否以 float32 计算（默认 float64）
+        :return: 与 data 形状相同的滤波结果
+        """
+        sos = cls.get_sos(order, band, fs, btype)
+        if padlen is None:
+            padlen = cls.get_ba_padlen(order, btype)
+        dtype = float32 if use_float32 else float64
+        data = asarray(data, dtype=dtype)
+        # 缓存的设计结果只读，而 scipy 的 sosfilt 不接受只读的 sos，传入可写的副本
+        sos = sos.astype(dtype)
+        return cls.apply_by_rows(lambda rows: sosfiltfilt(sos, rows, axis=-1, padlen=padlen), data, dtype)
+
+    @classmethod
+    def filtfilt_ba(cls, data, order: int, band, fs: float, btype: str = 'bandpass', padlen: int = None):
+        """
+        零相位巴特沃斯滤波（ba 形式，与 scipy.signal.filtfilt(b, a, data, padlen=padlen) 的结果逐位一致），沿最后一维对整个矩阵滤波
+        用于已训练模型的输入：高阶或截止频率很低时 ba 形式与 sos 形式的结果不同，模型是在 ba 形式的结果上训练的
+        :param padlen: 两端延拓长度，默认同 scipy.signal.filtfilt
+        :return: 与 data 形状相同的滤波结果（float64）
+        """
+        b, a = cls.get_ba(order, band, fs, btype)
+        data = asarray(data, dtype=float64)
+        return cls.apply_by_rows(lambda rows: filtfilt(b, a, rows, axis=-1, padlen=padlen), data, float64)
+
+    @classmethod
+    def apply_by_rows(cls, func, data, dtype):
+        """
+        将 data 展平为 (行, 时间) 后调用 func，通道较多时按通道分块在线程池中并行
+        """
+        shape = data.shape
+        rows = data.reshape(-1, shape[-1])
+        block = EAVizConfig.FilterConfig.BLOCK_CHANNELS
+        if EAVizConfig.FilterConfig.MAX_WORKERS <= 1 or rows.shape[0] <= block:
+            out = func(rows)
+        else:
+            futures = [cls.get_executor().submit(func, rows[i:i + block]) for i in range(0, rows.shape[0], block)]
+            out = concatenate([future.result() for future in futures], axis=0)
+        return out.astype(dtype, copy=False).reshape(shape)
@@ -186,7 +186,7 @@ class ResponseUtil:
         )
 
     @classmethod
-    def streaming(cls, *, data: Any = None):
+    def streaming(cls, *, data: Any = None, headers: Optional[Dict] = None):
         """
         流式响应方法
 
@@ -214,9 +214,11 @@ class ResponseUtil:
         模式2：前端请求后端发送下一块数据：前端处理完一个数据块后，主动请求后端发送下一块数据。这种模式比较少见，因为它需要额外的请求开销，通常在需要精确控制数据流速率的情况下使用。
 
         :param data: 流式传输的内容
+        :param headers: 可选，附加的响应头
         :return: 流式响应结果
         """
         return StreamingResponse(
             status_code=status.HTTP_200_OK,
-            content=data
+            content=data,
+            headers=headers
         )
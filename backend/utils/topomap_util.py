@@ -0,0 +1,130 @@
+from functools import lru_cache
+from matplotlib.patches import PathPatch
+from matplotlib.pyplot import subplots, close
+from matplotlib.ticker import MaxNLocator
+from mne import channels, create_info
+from mne.viz import plot_topomap
+from numpy import array, asarray, column_stack, empty, eye, float64, linspace, meshgrid, vstack
+from threading import Lock
+
+from config.env import EAVizConfig
+
+
+class TopomapUtil:
+    """
+    地形图工具类
+
+    通道布局固定（ChannelEnum.TPM + MontageEnum），导联及通道位置到网格的插值矩阵只计算一次（启动时预热），
+    之后每张地形图只需一次矩阵乘法再绘图，不再每次经过 EvokedArray.plot_topomap 重新计算插值。
+    插值矩阵、头部轮廓及裁剪区域均取自 mne 的 plot_topomap（默认的投影、头外外推及边界取值），与原先的地形图一致
+    """
+    RES = 64  # 网格分辨率，同 mne plot_topomap 默认值
+    CONTOURS = 6  # 等值线数，同 mne plot_topomap 默认值
+    CMAP = 'RdBu_r'
+
+    _lock = Lock()
+    _interpolator = None
+
+    @staticmethod
+    @lru_cache()
+    def build_montage():
+        position = {}
+        for i, ch_name in enumerate(EAVizConfig.ChannelEnum.TPM.value):
+            position[ch_name] = array([EAVizConfig.MontageEnum.XPOS.value[i], EAVizConfig.MontageEnum.YPOS.value[i],
+                                       EAVizConfig.MontageEnum.ZPOS.value[i]])
+        return channels.make_dig_montage(ch_pos=position)
+
+    @classmethod
+    def get_montage(cls):
+        """
+        获取固定的导联（返回副本，调用方可随意修改）
+        """
+        return cls.build_montage().copy()
+
+    @classmethod
+    def get_interpolator(cls):
+        """
+        :return: dict(matrix (RES*RES, 通道数), extent, xlim, ylim, clip_path 头部裁剪区域（数据坐标）,
+                      lines 头部轮廓 [(x, y, 线型)], sensors (通道数, 2))
+        """
+        if cls._interpolator is None:
+            with cls._lock:
+                if cls._interpolator is None:
+                    cls._interpolator = cls.build_interpolator()
+        return cls._interpolator
+
+    @classmethod
+    def build_interpolator(cls):
+        """
+        mne 的插值对通道值是线性的：以单位矩阵的各列作为通道取值交给 plot_topomap，记录其网格值即得到 网格 × 通道 的插值矩阵
+        """
+        info = create_info(EAVizConfig.ChannelEnum.TPM.value, 1000., 'eeg')
+        info.set_montage(cls.get_montage())
+
+        fig, ax = subplots()
+        columns = []
+        im = None
+        for basis in eye(info['nchan']):
+            ax.clear()
+            im, _ = plot_topomap(basis, info, contours=0, res=cls.RES, axes=ax, show=False)
+            columns.append(asarray(im.get_array(), dtype=float64).ravel())
+
+        # 头部轮廓（及鼻子、耳朵）、电极位置、裁剪区域（转换到数据坐标）及坐标范围
+        lines = [(line.get_xdata(), line.get_ydata(),
+                  dict(color=line.get_color(), linewidth=line.get_linewidth(), linestyle=line.get_linestyle(),
+                       marker=line.get_marker(), markersize=line.get_markersize())) for line in ax.lines]
+        offsets = [collection.get_offsets() for collection in ax.collections]
+        sensors = vstack(offsets) if offsets else empty((0, 2))
+        clip_path = im.get_clip_path().get_fully_transformed_path().transformed(ax.transData.inverted())
+        interpolator = dict(matrix=column_stack(columns), extent=im.get_extent(), xlim=ax.get_xlim(),
+                            ylim=ax.get_ylim(), clip_path=clip_path, lines=lines, sensors=asarray(sensors))
+        close(fig)
+        return interpolator
+
+    @classmethod
+    def plot_topomaps(cls, data, titles, save_path, nrows=3, ncols=4, text_size=16, unit='µV'):
+        """
+        绘制多个时刻的地形图（共用同一色标）并保存
+        :param data: (通道数, 时刻数)，通道顺序同 ChannelEnum.TPM
+        :param titles: 各时刻的标题
+        """
+        interpolator = cls.get_interpolator()
+        images = interpolator['matrix'] @ data  # (RES*RES, 时刻数)
+        vmax = abs(data).max() or 1
+        extent = interpolator['extent']
+        xi, yi = meshgrid(linspace(extent[0], extent[1], cls.RES), linspace(extent[2], extent[3], cls.RES))
+        levels = MaxNLocator(cls.CONTOURS + 1).tick_values(-vmax, vmax)  # 同 mne 的等值线取值
+
+        fig, axes = subplots(nrows, ncols, figsize=(ncols * 2.5, nrows * 2.5))
+        axes = axes.ravel()
+        im = None
+        for k, ax in enumerate(axes[:data.shape[1]]):
+            image = images[:, k].reshape(cls.RES, cls.RES)
+            patch = PathPatch(interpolator['clip_path'], transform=ax.transData)
+            im = ax.imshow(image, origin='lower', extent=extent, cmap=cls.CMAP, vmin=-vmax, vmax=vmax,
+                           interpolation='bilinear')
+            im.set_clip_path(patch)
+            contour = ax.contour(xi, yi, image, levels, colors='k', linewidths=0.5)
+            contour.set_clip_path(patch)
+            # 头部轮廓、鼻子、耳朵及电极位置
+            for x, y, style in interpolator['lines']:
+                ax.plot(x, y, clip_on=False, **style)
+            ax.scatter(interpolator['sensors'][:, 0], interpolator['sensors'][:, 1], s=2, c='k')
+            ax.set_xlim(interpolator['xlim'])
+            ax.set_ylim(interpolator['ylim'])
+            ax.set_aspect('equal')
+            ax.set_title(titles[k], fontsize=text_size)
+            ax.axis('off')
+
+        # 剩余的子图：第一个放色标，其余隐藏
+        rest = axes[data.shape[1]:]
+        for ax in rest:
+            ax.axis('off')
+        if im is not None and len(rest):
+            cbar = fig.colorbar(im, ax=rest[0], fraction=0.6, shrink=0.8)
+            cbar.set_label(unit, fontsize=text_size)
+            cbar.ax.tick_params(labelsize=text_size)
+
+        fig.tight_layout()
+        fig.savefig(save_path, format='png', dpi=300)
+        close(fig)
@@ -3,12 +3,24 @@ import request from '@/utils/request'
 // ESC + SD
 export const escsdAnalyse = (query) => request.post('/eaviz/escsd', query);
 
+// ESC + SD 整段扫描
+export const escsdScan = (query) =>
+  request.post('/eaviz/escsd/scan', query, {
+    timeout: 10 * 60 * 1000, // 整段扫描窗口数较多
+  });
+
 // AD
 export const adAnalyse = (query) =>
   request.post('/eaviz/ad', query, {
     timeout: 5 * 60 * 1000, // AD 请求可能需要较长时间
   });
 
+// AD 多组合集成
+export const adEnsemble = (query) =>
+  request.post('/eaviz/ad/ensemble', query, {
+    timeout: 5 * 60 * 1000,
+  });
+
 // SpiD
 export const spidAnalyse = (query) =>
   request.post('/eaviz/spid', query, {
@@ -145,10 +145,22 @@ export const useSRDStreamStore = defineStore('SRDStream', () => {
    * @param {Object} windowData - 窗口数据对象
    */
   const processWindowData = (windowData) => {
+    if (windowData.type === 'events') {
+      // 每块分类后新确定的标注（在该块的数据之前发送）
+      const newAnnotations = windowData.annotations || [];
+      if (newAnnotations.length > 0) {
+        allAnnotations.value = [...allAnnotations.value, ...newAnnotations];
+        // 立即通知前端更新标注
+        if (annotationsCallback) {
+          annotationsCallback(allAnnotations.value);
+        }
+      }
+      return;
+    }
+
     if (windowData.type === 'summary') {
-      // 汇总信息，包含所有标注（在数据流开始前发送）
+      // 汇总信息，包含所有标注（在数据流结束时发送）
       allAnnotations.value = windowData.annotations || [];
-      // 立即通知前端更新标注（在数据绘制之前）
       if (annotationsCallback) {
         annotationsCallback(allAnnotations.value);
       }